@@ -3,6 +3,10 @@ ASGI config for AdvancedWebDevelopment project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
 
+The server-sent events stream of carpark changes (``carparks.sse``) is
+dispatched here, before Django, so its long-lived connections don't go
+through the request/response cycle. Everything else is handled by Django.
+
 For more information on this file, see
 https://docs.djangoproject.com/en/5.1/howto/deployment/asgi/
 """
@@ -13,4 +17,13 @@ from django.core.asgi import get_asgi_application
 
 os.environ.setdefault("DJANGO_SETTINGS_MODULE", "AdvancedWebDevelopment.settings")
 
-application = get_asgi_application()
+django_application = get_asgi_application()
+
+from carparks import sse  # noqa: E402  (needs the app registry loaded above)
+
+
+async def application(scope, receive, send):
+    if scope["type"] == "http" and scope["path"] == sse.STREAM_PATH:
+        await sse.stream(scope, receive, send)
+    else:
+        await django_application(scope, receive, send)
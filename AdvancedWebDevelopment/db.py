@@ -0,0 +1,112 @@
+"""
+Database helpers shared by the project-level endpoints, and primary/replica
+routing.
+
+With DATABASE_REPLICA_URLS set, ``PrimaryReplicaRouter`` sends reads to a
+random replica alias and every write, migration and read inside a
+transaction on the primary to ``default``. ``ReadYourWritesMiddleware`` runs
+unsafe requests entirely on the primary, then pins that client to the
+primary for DATABASE_PIN_SECONDS via a cookie, so a client never reads a
+replica that has not caught up with its own write. Code outside a request
+can do the same with ``use_primary()``.
+"""
+import random
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import DEFAULT_DB_ALIAS, connections
+
+PIN_COOKIE = "db_pin"
+SAFE_METHODS = frozenset({"GET", "HEAD", "OPTIONS", "TRACE"})
+
+_pinned = ContextVar("db_pinned", default=False)
+
+
+def pool_stats(alias=DEFAULT_DB_ALIAS):
+    """
+    Return usage statistics for the psycopg3 connection pool behind ``alias``.
+
+    Returns None when the alias does not use a pool (SQLite, or Postgres with
+    DB_POOL disabled). ``in_use`` and ``waiting`` are instantaneous gauges;
+    the request/wait counters are cumulative since the pool was opened.
+    """
+    pool = getattr(connections[alias], "pool", None)
+    if pool is None:
+        return None
+    stats = pool.get_stats()
+    size = stats.get("pool_size", 0)
+    available = stats.get("pool_available", 0)
+    queued = stats.get("requests_queued", 0)
+    wait_ms = stats.get("requests_wait_ms", 0)
+    return {
+        "min_size": stats.get("pool_min", 0),
+        "max_size": stats.get("pool_max", 0),
+        "size": size,
+        "available": available,
+        "in_use": size - available,
+        "waiting": stats.get("requests_waiting", 0),
+        "requests": stats.get("requests_num", 0),
+        "requests_queued": queued,
+        "requests_errors": stats.get("requests_errors", 0),
+        "wait_ms_total": wait_ms,
+        "wait_ms_avg": round(wait_ms / queued, 2) if queued else 0.0,
+        "connections_lost": stats.get("connections_lost", 0),
+    }
+
+
+@contextmanager
+def use_primary():
+    """Route reads in this context (thread / task) to the primary."""
+    token = _pinned.set(True)
+    try:
+        yield
+    finally:
+        _pinned.reset(token)
+
+
+class PrimaryReplicaRouter:
+    def db_for_read(self, model, **hints):
+        replicas = settings.DATABASE_REPLICA_ALIASES
+        if not replicas or _pinned.get() or connections[DEFAULT_DB_ALIAS].in_atomic_block:
+            return DEFAULT_DB_ALIAS
+        return random.choice(replicas)
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        return True  # replicas hold the same rows as the primary
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db == DEFAULT_DB_ALIAS
+
+
+def _pin_active(request):
+    try:
+        return float(request.COOKIES.get(PIN_COOKIE, 0)) > time.time()
+    except ValueError:
+        return False
+
+
+class ReadYourWritesMiddleware:
+    """Removed from the chain (MiddlewareNotUsed) when no replica is configured."""
+
+    def __init__(self, get_response):
+        if not settings.DATABASE_REPLICA_ALIASES:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        writing = request.method not in SAFE_METHODS
+        if not writing and not _pin_active(request):
+            return self.get_response(request)
+        with use_primary():
+            response = self.get_response(request)
+        if writing and response.status_code < 400:
+            seconds = settings.DATABASE_PIN_SECONDS
+            response.set_cookie(PIN_COOKIE, f"{time.time() + seconds:.3f}", max_age=seconds,
+                                httponly=True, samesite="Lax")
+        return response
@@ -0,0 +1,151 @@
+"""
+Liveness and readiness probes for Railway/Docker and load balancers.
+
+``liveness`` proves the process can serve a request and touches no I/O.
+``readiness`` checks every dependency with a latency breakdown and returns
+503 when one of them is degraded. Its result is memoised per process for
+HEALTH_CHECK_CACHE_SECONDS so frequent probes don't hammer the database.
+"""
+import logging
+import threading
+import time
+from uuid import uuid4
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.db.migrations.executor import MigrationExecutor
+from django.http import JsonResponse
+
+from AdvancedWebDevelopment.db import pool_stats
+from carparks.metrics import record_cache_access
+
+logger = logging.getLogger(__name__)
+
+SERVICE = "Carpark Management API"
+VERSION = "1.0.0"
+
+_cache_lock = threading.Lock()
+_cached_result = None  # (expires_at, payload, http_status)
+
+
+def _ms(start):
+    return round((time.perf_counter() - start) * 1000, 2)
+
+
+def _check_database(alias=DEFAULT_DB_ALIAS):
+    connection = connections[alias]
+    result = {"status": "ok"}
+    try:
+        start = time.perf_counter()
+        reused = connection.connection is not None
+        connection.ensure_connection()
+        result["connect_ms"] = 0.0 if reused else _ms(start)
+        result["connection_reused"] = reused
+
+        start = time.perf_counter()
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT 1")
+            cursor.fetchone()
+        result["query_ms"] = _ms(start)
+    except Exception as exc:
+        logger.exception("Health check: database %r unreachable", alias)
+        result.update(status="error", error=exc.__class__.__name__)
+    result["pool"] = pool_stats(alias)
+    return result
+
+
+def _check_cache():
+    key = f"health-check:{uuid4().hex}"
+    result = {"status": "ok", "backend": cache.__class__.__name__}
+    try:
+        start = time.perf_counter()
+        cache.set(key, "ok", timeout=10)
+        reachable = cache.get(key) == "ok"
+        cache.delete(key)
+        result["roundtrip_ms"] = _ms(start)
+        if not reachable:
+            result["status"] = "error"
+            result["error"] = "read-after-write failed"
+    except Exception as exc:
+        logger.exception("Health check: cache unreachable")
+        result.update(status="error", error=exc.__class__.__name__)
+    return result
+
+
+def _check_migrations(alias=DEFAULT_DB_ALIAS):
+    try:
+        start = time.perf_counter()
+        executor = MigrationExecutor(connections[alias])
+        plan = executor.migration_plan(executor.loader.graph.leaf_nodes())
+        return {
+            "status": "ok" if not plan else "error",
+            "pending": [f"{migration.app_label}.{migration.name}" for migration, _ in plan],
+            "check_ms": _ms(start),
+        }
+    except Exception as exc:
+        logger.exception("Health check: migration state unavailable")
+        return {"status": "error", "error": exc.__class__.__name__}
+
+
+def _check_dataset():
+    from carparks.models import CarPark
+
+    try:
+        start = time.perf_counter()
+        rows = CarPark.objects.count()
+        return {"status": "ok", "rows": rows, "query_ms": _ms(start)}
+    except Exception as exc:
+        logger.exception("Health check: carpark table unavailable")
+        return {"status": "error", "error": exc.__class__.__name__}
+
+
+def _run_checks():
+    start = time.perf_counter()
+    checks = {"database": _check_database()}
+    for alias in settings.DATABASE_REPLICA_ALIASES:
+        checks[alias] = _check_database(alias)
+    if checks["database"]["status"] == "ok":
+        checks["migrations"] = _check_migrations()
+        checks["dataset"] = _check_dataset()
+    checks["cache"] = _check_cache()
+    healthy = all(check["status"] == "ok" for check in checks.values())
+    payload = {
+        "status": "healthy" if healthy else "degraded",
+        "service": SERVICE,
+        "version": VERSION,
+        "checks": checks,
+        "duration_ms": _ms(start),
+    }
+    return payload, 200 if healthy else 503
+
+
+def liveness(request):
+    """Process is up and able to answer; no database or cache access."""
+    return JsonResponse({"status": "alive", "service": SERVICE, "version": VERSION})
+
+
+def readiness(request):
+    """Deep dependency check, memoised for HEALTH_CHECK_CACHE_SECONDS."""
+    global _cached_result
+    ttl = settings.HEALTH_CHECK_CACHE_SECONDS
+    now = time.monotonic()
+    cached = _cached_result
+    record_cache_access("health", cached is not None and cached[0] > now)
+    if cached is None or cached[0] <= now:
+        with _cache_lock:
+            cached = _cached_result
+            if cached is None or cached[0] <= now:
+                payload, http_status = _run_checks()
+                cached = _cached_result = (time.monotonic() + ttl, payload, http_status)
+    expires_at, payload, http_status = cached
+    response = JsonResponse({**payload, "cached_for_s": round(max(expires_at - time.monotonic(), 0), 2)},
+                            status=http_status)
+    response["Cache-Control"] = "no-store"
+    return response
+
+
+def reset_cache():
+    """Drop the memoised readiness result (used by tests)."""
+    global _cached_result
+    _cached_result = None
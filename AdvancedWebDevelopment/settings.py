@@ -1,5 +1,7 @@
 from pathlib import Path
 import os
+import sys
+import tempfile
 try:
     import dj_database_url  # type: ignore
 except ModuleNotFoundError:
@@ -21,6 +23,8 @@ DJANGO_ENV = (
     or ("production" if os.getenv("GITHUB_ACTIONS") else "development")
 ).strip().lower()
 IS_PROD = DJANGO_ENV == "production"
+# Running under `manage.py test`
+TESTING = sys.argv[1:2] == ["test"]
 
 # ----- Core --------------------------------------------------------------------
 SECRET_KEY = os.getenv("DJANGO_SECRET_KEY") or os.getenv("SECRET_KEY", "change-me-in-prod")
@@ -37,12 +41,17 @@ INSTALLED_APPS = [
     "django.contrib.staticfiles",
     "carparks",
     "rest_framework",
+    "django_filters",
     "corsheaders",
 ]
 
 MIDDLEWARE = [
     "django.middleware.security.SecurityMiddleware",
     "whitenoise.middleware.WhiteNoiseMiddleware",
+    "AdvancedWebDevelopment.db.ReadYourWritesMiddleware",
+    "carparks.middleware.MetricsMiddleware",
+    "carparks.middleware.RequestTimingMiddleware",
+    "carparks.middleware.RateLimitHeadersMiddleware",
     "corsheaders.middleware.CorsMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
@@ -50,6 +59,8 @@ MIDDLEWARE = [
     "django.contrib.auth.middleware.AuthenticationMiddleware",
     "django.contrib.messages.middleware.MessageMiddleware",
     "django.middleware.clickjacking.XFrameOptionsMiddleware",
+    # Last, so request.user is set and only the view and its SQL are profiled
+    "carparks.middleware.ProfilingMiddleware",
 ]
 
 ROOT_URLCONF = "AdvancedWebDevelopment.urls"
@@ -76,6 +87,56 @@ WSGI_APPLICATION = "AdvancedWebDevelopment.wsgi.application"
 db_ssl_required = _to_bool(os.getenv("DB_SSL_REQUIRED"), default=False)
 database_url = os.getenv("DATABASE_URL")
 
+# Persistent connections (one per gunicorn worker thread) are the default.
+# Set DB_POOL=true to use psycopg3's native pool instead; Django requires
+# CONN_MAX_AGE=0 when pooling, so the pool owns connection lifetime.
+DB_CONN_MAX_AGE = int(os.getenv("DB_CONN_MAX_AGE", "600"))
+DB_CONN_HEALTH_CHECKS = _to_bool(os.getenv("DB_CONN_HEALTH_CHECKS"), default=True)
+DB_POOL_ENABLED = _to_bool(os.getenv("DB_POOL"), default=False)
+DB_POOL_OPTIONS = {
+    "min_size": int(os.getenv("DB_POOL_MIN_SIZE", "2")),
+    "max_size": int(os.getenv("DB_POOL_MAX_SIZE", "10")),
+    "timeout": float(os.getenv("DB_POOL_TIMEOUT", "10")),
+}
+
+# SQLite performance profile (opt-in, SQLITE_PERFORMANCE_PROFILE=true) for
+# single-node deployments with several workers: WAL lets readers run while one
+# writer commits, BEGIN IMMEDIATE takes the write lock up front so concurrent
+# writers wait on busy_timeout instead of failing with "database is locked",
+# and synchronous=NORMAL (safe under WAL) drops the fsync per commit. The
+# pragmas run on every new connection; WAL then persists in the database file.
+SQLITE_PERFORMANCE_PROFILE = _to_bool(os.getenv("SQLITE_PERFORMANCE_PROFILE"), default=False)
+SQLITE_TUNED_OPTIONS = {
+    "init_command": ";".join([
+        "PRAGMA journal_mode=WAL",
+        "PRAGMA synchronous=NORMAL",
+        f"PRAGMA mmap_size={int(os.getenv('SQLITE_MMAP_SIZE', str(256 * 1024 * 1024)))}",
+        # Negative cache_size is in KiB
+        f"PRAGMA cache_size=-{int(os.getenv('SQLITE_CACHE_SIZE_KIB', str(64 * 1024)))}",
+        "PRAGMA temp_store=MEMORY",
+    ]),
+    "transaction_mode": "IMMEDIATE",
+    "timeout": float(os.getenv("SQLITE_BUSY_TIMEOUT", "5")),  # seconds, sets busy_timeout
+}
+
+
+def _database_from_url(url):
+    if dj_database_url is None:
+        raise ImproperlyConfigured(
+            "dj-database-url is not installed. Run 'pip install dj-database-url' or add it to your environment."
+        )
+    config = dj_database_url.parse(
+        url,
+        conn_max_age=DB_CONN_MAX_AGE,
+        conn_health_checks=DB_CONN_HEALTH_CHECKS,
+        ssl_require=db_ssl_required,
+    )
+    if DB_POOL_ENABLED and config["ENGINE"] == "django.db.backends.postgresql":
+        config["CONN_MAX_AGE"] = 0
+        config.setdefault("OPTIONS", {})["pool"] = dict(DB_POOL_OPTIONS)
+    return config
+
+
 if IS_PROD:
     # Production MUST have DATABASE_URL (Postgres)
     if not database_url:
@@ -83,31 +144,153 @@ if IS_PROD:
             "DATABASE_URL is required in production. "
             "Set it in Railway (pointing to Postgres)."
         )
-    if dj_database_url is None:
-        raise ImproperlyConfigured(
-            "dj-database-url is not installed. Run 'pip install dj-database-url' or add it to your environment."
-        )
-    DATABASES = {
-        "default": dj_database_url.parse(database_url, conn_max_age=600, ssl_require=db_ssl_required)
-    }
+    DATABASES = {"default": _database_from_url(database_url)}
 else:
     # Development: use DATABASE_URL if present, otherwise SQLite
     if database_url:
-        if dj_database_url is None:
-            raise ImproperlyConfigured(
-                "dj-database-url is not installed. Run 'pip install dj-database-url' or add it to your environment."
-            )
-        DATABASES = {
-            "default": dj_database_url.parse(database_url, conn_max_age=600, ssl_require=db_ssl_required)
-        }
+        DATABASES = {"default": _database_from_url(database_url)}
     else:
         DATABASES = {
             "default": {
                 "ENGINE": "django.db.backends.sqlite3",
                 "NAME": BASE_DIR / "db.sqlite3",
+                "OPTIONS": dict(SQLITE_TUNED_OPTIONS) if SQLITE_PERFORMANCE_PROFILE else {},
             }
         }
 
+# Read replicas: comma-separated URLs, added as aliases replica_1..n (mirrors of
+# default under test). Reads go to a replica; writes, migrations and reads in a
+# transaction stay on default, and a client that wrote is pinned to default for
+# DATABASE_PIN_SECONDS. Locally, "sqlite:///db.sqlite3" gives a second alias
+# over the same file.
+DATABASE_REPLICA_URLS = [url.strip() for url in os.getenv("DATABASE_REPLICA_URLS", "").split(",") if url.strip()]
+for _index, _url in enumerate(DATABASE_REPLICA_URLS, start=1):
+    DATABASES[f"replica_{_index}"] = {**_database_from_url(_url), "TEST": {"MIRROR": "default"}}
+DATABASE_REPLICA_ALIASES = [f"replica_{index}" for index in range(1, len(DATABASE_REPLICA_URLS) + 1)]
+DATABASE_ROUTERS = ["AdvancedWebDevelopment.db.PrimaryReplicaRouter"]
+DATABASE_PIN_SECONDS = float(os.getenv("DATABASE_PIN_SECONDS", "5"))
+
+# ----- Cache -------------------------------------------------------------------
+# Per-process LocMem by default; set REDIS_URL to share the cache between workers.
+REDIS_URL = os.getenv("REDIS_URL")
+if REDIS_URL:
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.redis.RedisCache",
+            "LOCATION": REDIS_URL,
+        }
+    }
+else:
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        }
+    }
+
+# Seconds a /health/ readiness result is reused before dependencies are re-probed
+HEALTH_CHECK_CACHE_SECONDS = float(os.getenv("HEALTH_CHECK_CACHE_SECONDS", "5"))
+
+# ----- Read engine -------------------------------------------------------------
+# "orm" queries the database on every request; "columnar" serves list, filter
+# and aggregate endpoints from a per-worker NumPy snapshot of the CarPark table.
+CARPARK_READ_ENGINE = os.getenv("CARPARK_READ_ENGINE", "orm").strip().lower()
+# How long a worker trusts its last dataset fingerprint before re-checking the DB
+CARPARK_DATASET_VERSION_TTL = float(os.getenv("CARPARK_DATASET_VERSION_TTL", "1.0"))
+# Changes younger than this are left for the next /changes/ pull, so rows from
+# transactions that commit out of timestamp order are never skipped
+CARPARK_CHANGES_SETTLE_SECONDS = float(os.getenv("CARPARK_CHANGES_SETTLE_SECONDS", "2.0"))
+# How long a worker reuses its copy of the latest lot availability before
+# re-reading it (ingestion in the same worker refreshes it immediately)
+AVAILABILITY_CACHE_SECONDS = float(os.getenv("AVAILABILITY_CACHE_SECONDS", "5"))
+# Availability history: how many days each resolution is kept (the daily rollup
+# is kept forever), the expected reading interval (used to size raw queries),
+# and whether ingestion rolls up closed 15-minute buckets itself (inside the
+# first ingest request after a bucket closes, once per bucket per cache, so
+# once per worker without REDIS_URL) instead of leaving it to a scheduled or
+# long-running `manage.py rollup_availability`
+AVAILABILITY_RETENTION_DAYS = {
+    "raw": int(os.getenv("AVAILABILITY_RAW_RETENTION_DAYS", "7")),
+    "15m": int(os.getenv("AVAILABILITY_15M_RETENTION_DAYS", "35")),
+    "1h": int(os.getenv("AVAILABILITY_1H_RETENTION_DAYS", "400")),
+    "1d": None,
+}
+AVAILABILITY_SAMPLE_INTERVAL_SECONDS = int(os.getenv("AVAILABILITY_SAMPLE_INTERVAL_SECONDS", "60"))
+AVAILABILITY_AUTO_ROLLUP = _to_bool(os.getenv("AVAILABILITY_AUTO_ROLLUP"), default=False)
+# CSV import queue (carparks/jobs.py). Uploads are stored in IMPORT_UPLOAD_DIR,
+# which must be shared with the `manage.py process_imports` worker. A running
+# job without a heartbeat for STALE seconds is retried (up to MAX_ATTEMPTS);
+# BATCH_PAUSE leaves room between batches for web writes on a busy database.
+IMPORT_UPLOAD_DIR = os.getenv("IMPORT_UPLOAD_DIR") or (
+    os.path.join(tempfile.gettempdir(), "carpark-imports-test") if TESTING else str(BASE_DIR / "media" / "imports")
+)
+IMPORT_UPLOAD_MAX_BYTES = int(os.getenv("IMPORT_UPLOAD_MAX_BYTES", str(50 * 1024 * 1024)))
+IMPORT_JOB_BATCH_SIZE = int(os.getenv("IMPORT_JOB_BATCH_SIZE", "2000"))
+IMPORT_JOB_BATCH_PAUSE_SECONDS = float(os.getenv("IMPORT_JOB_BATCH_PAUSE_SECONDS", "0"))
+IMPORT_JOB_POLL_SECONDS = float(os.getenv("IMPORT_JOB_POLL_SECONDS", "2"))
+IMPORT_JOB_STALE_SECONDS = int(os.getenv("IMPORT_JOB_STALE_SECONDS", "300"))
+IMPORT_JOB_MAX_ATTEMPTS = int(os.getenv("IMPORT_JOB_MAX_ATTEMPTS", "3"))
+IMPORT_JOB_LIST_LIMIT = int(os.getenv("IMPORT_JOB_LIST_LIMIT", "20"))
+# Server-sent events stream (ASGI only): broker class ("carparks.events.RedisBroker"
+# fans out across workers via REDIS_URL), keepalive interval, and how far a
+# client may fall behind before it is told to resync from the changes feed
+CARPARK_EVENTS_BROKER = os.getenv("CARPARK_EVENTS_BROKER", "carparks.events.LocalBroker")
+CARPARK_EVENTS_HEARTBEAT_SECONDS = float(os.getenv("CARPARK_EVENTS_HEARTBEAT_SECONDS", "15"))
+CARPARK_EVENTS_MAX_QUEUED = int(os.getenv("CARPARK_EVENTS_MAX_QUEUED", "1000"))
+CARPARK_EVENTS_MAX_REPLAY = int(os.getenv("CARPARK_EVENTS_MAX_REPLAY", "10000"))
+# Single-flight recomputation of whole-table lists and aggregates after a
+# dataset change (carparks/singleflight.py): concurrent requests wait up to
+# WAIT seconds for the one computing; with SHARED (default when REDIS_URL is
+# set) workers also coordinate through a LOCK-second lock in the cache and
+# share the value for TTL seconds. STALE_WHILE_REVALIDATE serves the previous
+# version instead of waiting.
+CARPARK_COALESCE_SHARED = _to_bool(os.getenv("CARPARK_COALESCE_SHARED"), default=bool(REDIS_URL))
+CARPARK_COALESCE_WAIT_SECONDS = float(os.getenv("CARPARK_COALESCE_WAIT_SECONDS", "5"))
+CARPARK_COALESCE_LOCK_SECONDS = int(os.getenv("CARPARK_COALESCE_LOCK_SECONDS", "10"))
+CARPARK_COALESCE_TTL = int(os.getenv("CARPARK_COALESCE_TTL", "300"))
+CARPARK_STALE_WHILE_REVALIDATE = _to_bool(os.getenv("CARPARK_STALE_WHILE_REVALIDATE"), default=False)
+# Serve the unfiltered list and types endpoints from bytes rendered (and
+# gzip/brotli compressed) once per dataset version instead of per request
+PRERENDER_ENABLED = _to_bool(os.getenv("PRERENDER_ENABLED"), default=True)
+PRERENDER_GZIP_LEVEL = int(os.getenv("PRERENDER_GZIP_LEVEL", "9"))
+PRERENDER_BROTLI_QUALITY = int(os.getenv("PRERENDER_BROTLI_QUALITY", "9"))
+
+# ----- Performance instrumentation ---------------------------------------------
+# Server-Timing header + "carparks.perf" log line per API request (SQL count/time,
+# view and serialisation time). Disabled middleware is removed from the chain.
+PERF_INSTRUMENTATION_ENABLED = _to_bool(os.getenv("PERF_INSTRUMENTATION"), default=False)
+
+# Request profiling (carparks/profiling.py). Staff users send `X-Profile: cprofile`
+# (or sample/all) or `?_profile=...`; PROFILE_SAMPLE_RATE also profiles that
+# fraction of all requests with the sampling profiler. pstats, collapsed stacks
+# and the SQL are written to PROFILE_DIR, keeping the newest PROFILE_KEEP.
+PROFILING_ENABLED = _to_bool(os.getenv("PROFILING"), default=True)
+PROFILE_SAMPLE_RATE = float(os.getenv("PROFILE_SAMPLE_RATE", "0"))
+PROFILE_SAMPLE_INTERVAL_MS = float(os.getenv("PROFILE_SAMPLE_INTERVAL_MS", "1"))
+PROFILE_DIR = os.getenv("PROFILE_DIR") or os.path.join(tempfile.gettempdir(), "carpark-profiles")
+PROFILE_KEEP = int(os.getenv("PROFILE_KEEP", "200"))
+
+# Prometheus metrics on /metrics. Under gunicorn, point METRICS_MULTIPROC_DIR at
+# a directory shared by all workers (and emptied on server start) so the
+# scrape aggregates every worker instead of whichever one answered.
+METRICS_ENABLED = _to_bool(os.getenv("METRICS_ENABLED"), default=True)
+METRICS_MULTIPROC_DIR = os.getenv("METRICS_MULTIPROC_DIR") or os.getenv("PROMETHEUS_MULTIPROC_DIR") or None
+METRICS_FLUSH_SECONDS = float(os.getenv("METRICS_FLUSH_SECONDS", "5"))
+
+LOGGING = {
+    "version": 1,
+    "disable_existing_loggers": False,
+    "handlers": {
+        "console": {"class": "logging.StreamHandler"},
+    },
+    "loggers": {
+        "carparks.perf": {
+            "handlers": ["console"],
+            "level": os.getenv("PERF_LOG_LEVEL", "INFO"),
+            "propagate": False,
+        },
+    },
+}
+
 # ----- Password validation -----------------------------------------------------
 AUTH_PASSWORD_VALIDATORS = [
     {"NAME": "django.contrib.auth.password_validation.UserAttributeSimilarityValidator"},
@@ -154,6 +337,36 @@ REST_FRAMEWORK = {
         "rest_framework.authentication.BasicAuthentication",
     ],
     "DEFAULT_PERMISSION_CLASSES": ["rest_framework.permissions.AllowAny"],
+    # orjson-backed drop-ins for the stock JSON renderer/parser (same output)
+    "DEFAULT_RENDERER_CLASSES": [
+        "carparks.renderers.ORJSONRenderer",
+        "rest_framework.renderers.BrowsableAPIRenderer",
+    ],
+    "DEFAULT_PARSER_CLASSES": [
+        "carparks.renderers.ORJSONParser",
+        "rest_framework.parsers.FormParser",
+        "rest_framework.parsers.MultiPartParser",
+    ],
+    # Checks API_THROTTLE_ENABLED per request, so it can stay installed
+    "DEFAULT_THROTTLE_CLASSES": ["carparks.throttling.TokenBucketThrottle"],
+    # Proxies in front of the app (nginx) whose X-Forwarded-For entries are trusted
+    "NUM_PROXIES": int(os.getenv("API_NUM_PROXIES")) if os.getenv("API_NUM_PROXIES") else None,
+}
+
+# Per-client token buckets (carparks/throttling.py), shared through REDIS_URL
+# when set. Without REDIS_URL every worker process keeps its own buckets, so a
+# client can get up to (workers x rate) in total. "read" covers
+# GET/HEAD/OPTIONS, "write" everything else; a request
+# costs 1 token unless its view names a cost class below. Off under
+# `manage.py test` unless API_THROTTLE is set explicitly.
+API_THROTTLE_ENABLED = _to_bool(os.getenv("API_THROTTLE"), default=not TESTING)
+API_THROTTLE_RATES = {
+    "read": os.getenv("API_THROTTLE_READ_RATE", "600/min"),
+    "write": os.getenv("API_THROTTLE_WRITE_RATE", "60/min"),
+}
+API_THROTTLE_COSTS = {
+    # Unpaginated list, filter and search responses
+    "unpaginated": int(os.getenv("API_THROTTLE_UNPAGINATED_COST", "5")),
 }
 
 # Extra hardening when NOT DEBUG (usually production)
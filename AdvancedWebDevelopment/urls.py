@@ -15,34 +15,21 @@ Including another URLconf
 """
 from django.contrib import admin
 from django.urls import path, include
-from django.http import JsonResponse
 from django.views.generic import RedirectView
 
-# Health check endpoint for Railway/Docker
-def health_check(request):
-    try:
-        # Try to query the database to ensure it's working
-        from django.db import connection
-        cursor = connection.cursor()
-        cursor.execute("SELECT 1")
-        db_status = "connected"
-    except:
-        db_status = "disconnected"
-    
-    return JsonResponse({
-        "status": "healthy",
-        "service": "Carpark Management API",
-        "version": "1.0.0",
-        "database": db_status
-    })
+from AdvancedWebDevelopment import health
+from carparks.metrics import metrics_view
 
 urlpatterns = [
     # Django admin
     path('admin/', admin.site.urls),
     
-    # Health check endpoint
-    path('health/', health_check, name='health'),
-    path('healthz/', health_check, name='healthz'),  # Alternative for Railway
+    # Health checks: deep readiness (503 when degraded) and I/O-free liveness
+    path('health/', health.readiness, name='health'),
+    path('healthz/', health.liveness, name='healthz'),  # Docker HEALTHCHECK / Railway
+
+    # Prometheus scrape endpoint
+    path('metrics', metrics_view, name='metrics'),
     
     # Root redirect
     path('', RedirectView.as_view(url='/home/', permanent=False)),
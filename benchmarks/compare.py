@@ -0,0 +1,53 @@
+#!/usr/bin/env python
+"""
+Compare two benchmark result files written by benchmarks/run.py.
+
+    python benchmarks/compare.py benchmarks/results/before.json benchmarks/results/after.json
+"""
+import json
+import sys
+
+
+def _index(report):
+    return {
+        (dataset["rows"], endpoint["method"], endpoint["route"]): endpoint
+        for dataset in report["datasets"]
+        for endpoint in dataset["endpoints"]
+    }
+
+
+def _delta(before, after):
+    if not before or after is None:
+        return "n/a"
+    return f"{(after - before) / before * 100:+.1f}%"
+
+
+def compare(before_path, after_path):
+    with open(before_path) as fh:
+        before = json.load(fh)
+    with open(after_path) as fh:
+        after = json.load(fh)
+    print(f"before: {before['meta']['git_commit']} ({before['meta']['db_vendor']})")
+    print(f"after:  {after['meta']['git_commit']} ({after['meta']['db_vendor']})")
+    print(f"{'rows':>8}  {'endpoint':60} {'p50 before':>11} {'p50 after':>11} {'p50':>8} {'p95':>8} {'queries':>9}")
+    after_index = _index(after)
+    for key, old in _index(before).items():
+        new = after_index.get(key)
+        if new is None:
+            continue
+        rows, method, route = key
+        print(f"{rows:>8}  {method + ' /' + route:60} {old['p50_ms']:>11.3f} {new['p50_ms']:>11.3f} "
+              f"{_delta(old['p50_ms'], new['p50_ms']):>8} {_delta(old['p95_ms'], new['p95_ms']):>8} "
+              f"{old['sql_queries']:>4}->{new['sql_queries']:<4}")
+    old_imports = {d["rows"]: d["import"] for d in before["datasets"] if d["import"]}
+    for dataset in after["datasets"]:
+        old = old_imports.get(dataset["rows"])
+        if old and dataset["import"]:
+            print(f"{dataset['rows']:>8}  {'CSV import':60} {old['seconds']:>10.3f}s {dataset['import']['seconds']:>10.3f}s "
+                  f"{_delta(old['seconds'], dataset['import']['seconds']):>8}")
+
+
+if __name__ == "__main__":
+    if len(sys.argv) != 3:
+        sys.exit(__doc__)
+    compare(sys.argv[1], sys.argv[2])
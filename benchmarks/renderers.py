@@ -0,0 +1,113 @@
+#!/usr/bin/env python
+"""
+Compare DRF's stock JSON renderer/parser with the orjson-backed ones in
+carparks/renderers.py on the payload of the full list endpoint.
+
+The rows are synthetic CarParks (see carparks/synthetic.py) passed through
+CarParkSerializer exactly as CarParkListView does, so the timings are the
+rendering share of a /api/v1/carparks/ response. No database is needed: the
+category and town lookups are unsaved instances numbered by OfflineKeys.
+
+    python benchmarks/renderers.py --rows 2244 10000 100000
+"""
+import argparse
+import io
+import os
+import statistics
+import sys
+import time
+
+# Add the project directory to the Python path
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(BASE_DIR)
+
+# Set up Django settings
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "AdvancedWebDevelopment.settings")
+import django  # noqa: E402
+
+django.setup()
+
+from django.utils import timezone  # noqa: E402
+from rest_framework.parsers import JSONParser  # noqa: E402
+from rest_framework.renderers import JSONRenderer  # noqa: E402
+
+from carparks import renderers, synthetic  # noqa: E402
+from carparks.categories import LOOKUP_MODELS  # noqa: E402
+from carparks.importer import row_to_instance  # noqa: E402
+from carparks.models import CarPark  # noqa: E402
+from carparks.serializers import CarParkSerializer  # noqa: E402
+
+CANDIDATES = [
+    ("json (DRF)", JSONRenderer(), JSONParser()),
+    ("orjson", renderers.ORJSONRenderer(), renderers.ORJSONParser()),
+]
+
+
+class OfflineKeys:
+    """Stands in for CategoryKeys without reading or writing the lookup tables."""
+
+    def __init__(self):
+        self.lookups = {field: {} for field in LOOKUP_MODELS}
+
+    def key(self, field, value):
+        lookups = self.lookups[field]
+        name = str(value)
+        if name not in lookups:
+            lookups[name] = LOOKUP_MODELS[field](pk=len(lookups) + 1, name=name)
+        return lookups[name].pk
+
+    def attach(self, instances):
+        """Set the lookup instances on ``instances``, so serializing them needs no query."""
+        by_key = {field: {lookup.pk: lookup for lookup in lookups.values()} for field, lookups in self.lookups.items()}
+        for instance in instances:
+            for field in (*CarPark.CATEGORY_FIELDS, "town"):
+                key = getattr(instance, f"{field}_id")
+                if key is not None:
+                    setattr(instance, field, by_key[field][key])
+
+
+def list_payload(rows, seed):
+    now = timezone.now()
+    keys = OfflineKeys()
+    instances = []
+    for pk, row in enumerate(synthetic.generate_rows(rows, seed), start=1):
+        instance = row_to_instance(row, keys)
+        instance.pk, instance.created_at, instance.updated_at = pk, now, now
+        instances.append(instance)
+    keys.attach(instances)
+    return CarParkSerializer(instances, many=True).data
+
+
+def _time(func, iterations):
+    timings = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        func()
+        timings.append((time.perf_counter() - start) * 1000)
+    return statistics.median(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, nargs="+", default=[2244, 10000], help="list sizes")
+    parser.add_argument("--iterations", type=int, default=10, help="timed runs per measurement (median reported)")
+    parser.add_argument("--seed", type=int, default=0, help="synthetic dataset seed")
+    args = parser.parse_args()
+
+    if renderers.orjson is None:
+        print("orjson is not installed; ORJSONRenderer falls back to the stdlib and both rows will match")
+    for rows in args.rows:
+        data = list_payload(rows, args.seed)
+        body = JSONRenderer().render(data)
+        print(f"== {rows} rows, {len(body) / 1024:.0f} KiB")
+        baseline = None
+        for name, renderer, json_parser in CANDIDATES:
+            render_ms = _time(lambda: renderer.render(data, "application/json"), args.iterations)
+            parse_ms = _time(lambda: json_parser.parse(io.BytesIO(body)), args.iterations)
+            speedup = f"  ({baseline / render_ms:.1f}x)" if baseline else ""
+            baseline = baseline or render_ms
+            print(f"  {name:12} render {render_ms:9.2f} ms{speedup:8}  parse {parse_ms:9.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,148 @@
+#!/usr/bin/env python
+"""
+Multi-process read/write benchmark of SQLite with the default settings versus
+the tuned profile (SQLITE_TUNED_OPTIONS in settings.py: WAL, mmap,
+synchronous=NORMAL, busy timeout, BEGIN IMMEDIATE).
+
+For each profile a fresh database file is migrated and seeded with synthetic
+car parks, then reader processes (GET search and detail) and writer processes
+(POST create, as CarParkCreateView serves it) hit it through the Django test
+client for a fixed time, the way gunicorn workers would share one file.
+Failed requests ("database is locked") are counted, not retried.
+
+    python benchmarks/sqlite_concurrency.py --readers 4 --writers 2 --seconds 10
+"""
+import argparse
+import multiprocessing
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+# Add the project directory to the Python path
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(BASE_DIR)
+
+# Set up Django settings
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "AdvancedWebDevelopment.settings")
+os.environ.setdefault("API_THROTTLE", "false")  # measure the API, not the rate limiter
+import django  # noqa: E402
+
+django.setup()
+
+from django.conf import settings  # noqa: E402
+from django.core.management import call_command  # noqa: E402
+from django.db import connection  # noqa: E402
+
+PROFILES = {
+    "default": {},
+    "tuned": settings.SQLITE_TUNED_OPTIONS,
+}
+READ_PATHS = ["/api/v1/carparks/search/?address=ANG%20MO%20KIO", "/api/v1/carparks/{pk}/"]
+
+
+def _use_database(path, options):
+    connection.close()
+    connection.settings_dict.update(NAME=path, OPTIONS=dict(options))
+
+
+def _prepare(path, options, rows, seed):
+    from carparks import synthetic
+
+    _use_database(path, options)
+    call_command("migrate", verbosity=0)
+    synthetic.seed_database(rows, seed)
+    connection.close()
+
+
+def _worker(role, index, path, options, start_at, seconds, results):
+    from django.test import Client
+    from django.test.utils import setup_test_environment
+
+    from carparks.models import CarPark
+
+    setup_test_environment()
+    _use_database(path, options)
+    client = Client()
+    pks = list(CarPark.objects.order_by("pk").values_list("pk", flat=True)[:500])
+    latencies, errors, counter = [], 0, 0
+    time.sleep(max(0.0, start_at - time.time()))
+    deadline = start_at + seconds
+    while time.time() < deadline:
+        counter += 1
+        start = time.perf_counter()
+        try:
+            if role == "write":
+                response = client.post("/api/v1/carparks/create/", {
+                    "car_park_no": f"W{index}-{counter}",
+                    "address": f"BLK {counter} WRITER {index} ROAD",
+                    "car_park_type": "SURFACE CAR PARK",
+                    "gantry_height": 2.1,
+                }, content_type="application/json")
+            else:
+                path_template = READ_PATHS[counter % len(READ_PATHS)]
+                response = client.get(path_template.format(pk=pks[counter % len(pks)]))
+            ok = response.status_code < 400
+        except Exception:  # OperationalError: database is locked
+            ok = False
+        if ok:
+            latencies.append((time.perf_counter() - start) * 1000)
+        else:
+            errors += 1
+    results.put((role, latencies, errors))
+
+
+def run_profile(name, options, args, workdir):
+    path = os.path.join(workdir, f"{name}.sqlite3")
+    _prepare(path, options, args.rows, args.seed)
+    ctx = multiprocessing.get_context("spawn")
+    results = ctx.Queue()
+    start_at = time.time() + 3  # let every process finish importing Django first
+    roles = ["read"] * args.readers + ["write"] * args.writers
+    processes = [
+        ctx.Process(target=_worker, args=(role, index, path, options, start_at, args.seconds, results))
+        for index, role in enumerate(roles)
+    ]
+    for process in processes:
+        process.start()
+    collected = [results.get() for _ in processes]
+    for process in processes:
+        process.join()
+
+    summary = {}
+    for role in ("read", "write"):
+        latencies = [ms for r, lat, _ in collected if r == role for ms in lat]
+        errors = sum(err for r, _, err in collected if r == role)
+        ordered = sorted(latencies) or [0.0]
+        summary[role] = {
+            "ok_per_second": round(len(latencies) / args.seconds, 1),
+            "errors": errors,
+            "p50_ms": round(statistics.median(ordered), 2),
+            "p95_ms": round(ordered[int(0.95 * (len(ordered) - 1))], 2),
+        }
+    return summary
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--readers", type=int, default=4, help="reader processes")
+    parser.add_argument("--writers", type=int, default=2, help="writer processes")
+    parser.add_argument("--seconds", type=float, default=10.0, help="measured duration per profile")
+    parser.add_argument("--rows", type=int, default=2244, help="seeded car parks")
+    parser.add_argument("--seed", type=int, default=0, help="synthetic dataset seed")
+    args = parser.parse_args()
+
+    if connection.vendor != "sqlite":
+        parser.error("DATABASE_URL points at a non-SQLite database; unset it to benchmark SQLite")
+    workdir = tempfile.mkdtemp(prefix="carpark-sqlite-bench-")
+    print(f"{args.readers} readers, {args.writers} writers, {args.seconds:g} s per profile, {args.rows} rows")
+    for name, options in PROFILES.items():
+        summary = run_profile(name, options, args, workdir)
+        for role, stats in summary.items():
+            print(f"  {name:8} {role:5} {stats['ok_per_second']:9.1f} ok/s  {stats['errors']:6} errors  "
+                  f"p50 {stats['p50_ms']:8.2f} ms  p95 {stats['p95_ms']:8.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
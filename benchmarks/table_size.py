@@ -0,0 +1,126 @@
+#!/usr/bin/env python
+"""
+On-disk size of the CarPark table and its indexes with the categorical
+fields stored as text (migration 0011) versus as keys into lookup tables
+(0014 onwards).
+
+A throwaway test database is migrated back to 0011 and filled with a
+synthetic dataset, measured, migrated forward (which runs the data migration
+into the lookup tables) and measured again. Both measurements are taken
+after VACUUM, so they compare compacted storage.
+
+    python benchmarks/table_size.py --rows 100000
+    DATABASE_URL=postgresql://... python benchmarks/table_size.py --rows 100000
+"""
+import argparse
+import os
+import sys
+import tempfile
+
+# Add the project directory to the Python path
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(BASE_DIR)
+
+# Set up Django settings
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "AdvancedWebDevelopment.settings")
+import django  # noqa: E402
+
+django.setup()
+
+from django.core.management import call_command  # noqa: E402
+from django.db import connection  # noqa: E402
+from django.db.migrations.executor import MigrationExecutor  # noqa: E402
+
+from carparks import synthetic  # noqa: E402
+
+TEXT_MIGRATION = ("carparks", "0011_import_jobs")
+TABLE = "carparks_carpark"
+LOOKUP_TABLES = ("carparks_carparktype", "carparks_parkingsystem", "carparks_shorttermparking", "carparks_freeparking")
+
+
+def _fill_text_schema(rows, seed, batch_size=5000):
+    """Insert synthetic rows through the historical (text column) CarPark model."""
+    CarPark = MigrationExecutor(connection).loader.project_state(TEXT_MIGRATION).apps.get_model("carparks", "CarPark")
+    numeric = {"x_coord": float, "y_coord": float, "gantry_height": float,
+               "car_park_decks": lambda v: int(float(v))}
+    flags = ("night_parking", "car_park_basement")
+    batch = []
+    for row in synthetic.generate_rows(rows, seed):
+        values = {name: convert(row[name]) for name, convert in numeric.items()}
+        values.update({name: row[name].strip().upper() in {"Y", "YES", "TRUE", "T", "1"} for name in flags})
+        text = {name: row[name] for name in ("car_park_no", "address", "car_park_type", "type_of_parking_system",
+                                             "short_term_parking", "free_parking")}
+        batch.append(CarPark(**text, **values))
+        if len(batch) >= batch_size:
+            CarPark.objects.bulk_create(batch)
+            batch = []
+    if batch:
+        CarPark.objects.bulk_create(batch)
+
+
+def _sizes():
+    """{relation: bytes} for the CarPark table, its indexes and the lookup tables."""
+    with connection.cursor() as cursor:
+        if connection.vendor == "sqlite":
+            cursor.execute("VACUUM")
+            cursor.execute(
+                # Lookup tables are reported with their indexes, the CarPark table per index
+                "SELECT CASE WHEN m.tbl_name = %%s THEN s.name ELSE m.tbl_name END, SUM(s.pgsize) "
+                "FROM dbstat s JOIN sqlite_master m ON m.name = s.name "
+                "WHERE m.tbl_name IN (%s) GROUP BY 1" % ", ".join(["%s"] * (1 + len(LOOKUP_TABLES))),
+                [TABLE, TABLE, *LOOKUP_TABLES],
+            )
+            return dict(cursor.fetchall())
+        if connection.vendor == "postgresql":
+            tables = [TABLE, *(t for t in LOOKUP_TABLES if t in connection.introspection.table_names(cursor))]
+            for table in tables:
+                cursor.execute(f"VACUUM FULL ANALYZE {connection.ops.quote_name(table)}")
+            cursor.execute(
+                "SELECT relname, CASE WHEN relname = %s THEN pg_relation_size(relid) "
+                "ELSE pg_total_relation_size(relid) END FROM pg_stat_user_tables WHERE relname = ANY(%s) "
+                "UNION ALL SELECT indexrelname, pg_relation_size(indexrelid) FROM pg_stat_user_indexes "
+                "WHERE relname = %s",
+                [TABLE, tables, TABLE],
+            )
+            return dict(cursor.fetchall())
+    raise SystemExit(f"Size measurement is not implemented for {connection.vendor}")
+
+
+def _report(label, sizes, rows):
+    table = sizes.get(TABLE, 0)
+    lookups = sum(size for name, size in sizes.items() if name in LOOKUP_TABLES)
+    indexes = {name: size for name, size in sizes.items() if name != TABLE and name not in LOOKUP_TABLES}
+    print(f"{label}")
+    print(f"  table      {table / 1024:10.0f} KiB  {table / rows:7.1f} B/row")
+    for name, size in sorted(indexes.items()):
+        print(f"  {name[:60]:<60} {size / 1024:10.0f} KiB")
+    print(f"  indexes    {sum(indexes.values()) / 1024:10.0f} KiB  {sum(indexes.values()) / rows:7.1f} B/row")
+    if lookups:
+        print(f"  lookups    {lookups / 1024:10.0f} KiB (incl. their indexes)")
+    return table, sum(indexes.values())
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=100000, help="synthetic car parks")
+    parser.add_argument("--seed", type=int, default=0, help="synthetic dataset seed")
+    args = parser.parse_args()
+
+    if connection.vendor == "sqlite":
+        # Measure an on-disk file rather than the in-memory test default
+        connection.settings_dict["TEST"]["NAME"] = os.path.join(tempfile.mkdtemp(), "table-size.sqlite3")
+    old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True, keepdb=False)
+    try:
+        call_command("migrate", *TEXT_MIGRATION, verbosity=0)
+        _fill_text_schema(args.rows, args.seed)
+        before = _report(f"text columns ({args.rows} rows, {connection.vendor})", _sizes(), args.rows)
+        call_command("migrate", "carparks", verbosity=0)
+        after = _report("lookup tables", _sizes(), args.rows)
+        print(f"table {100 * (after[0] - before[0]) / before[0]:+.1f}%, "
+              f"indexes {100 * (after[1] - before[1]) / before[1]:+.1f}%")
+    finally:
+        connection.creation.destroy_test_db(old_name, verbosity=0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,298 @@
+"""
+Structured components of HDB car park addresses.
+
+``address`` is free text such as "BLK 98A ALJUNIED CRESCENT" or
+"BLK 301-302,305-308 CLEMENTI AVENUE 4". ``parse`` splits it into the block
+number(s), the street and a derived town, which CarPark stores in indexed
+columns when it is saved or imported (``manage.py backfill_addresses`` fills
+rows written before that), so area questions are equality lookups instead of
+``icontains`` scans.
+
+The town is the HDB town named in the street ("LORONG 3 TOA PAYOH" ->
+TOA PAYOH), else the town of a known estate or street in it ("COMPASSVALE
+ROAD" -> SENGKANG), with abbreviations such as "BT" read as "BUKIT". An
+address naming neither gets no town rather than one made up from its street.
+"""
+import re
+from typing import NamedTuple
+
+from django.db import transaction
+from django.utils import timezone
+
+from . import dataset
+from .categories import CategoryKeys
+from .models import CarPark
+
+TOWNS = (
+    "ANG MO KIO", "BEDOK", "BISHAN", "BUKIT BATOK", "BUKIT MERAH", "BUKIT PANJANG", "BUKIT TIMAH",
+    "CENTRAL AREA", "CHOA CHU KANG", "CLEMENTI", "GEYLANG", "HOUGANG", "JURONG EAST", "JURONG WEST",
+    "KALLANG/WHAMPOA", "MARINE PARADE", "PASIR RIS", "PUNGGOL", "QUEENSTOWN", "SEMBAWANG", "SENGKANG",
+    "SERANGOON", "TAMPINES", "TENGAH", "TOA PAYOH", "WOODLANDS", "YISHUN",
+)
+
+# Estates and localities whose street names don't mention their town
+ESTATE_TOWNS = {
+    "ADMIRALTY": "WOODLANDS",
+    "ALBERT": "CENTRAL AREA",
+    "ALEXANDRA VILLAGE": "BUKIT MERAH",
+    "ALJUNIED": "GEYLANG",
+    "ALKAFF": "TOA PAYOH",
+    "ANCHORVALE": "SENGKANG",
+    "BALAM": "GEYLANG",
+    "BALESTIER": "KALLANG/WHAMPOA",
+    "BANGKIT": "BUKIT PANJANG",
+    "BEACH": "KALLANG/WHAMPOA",
+    "BENDEMEER": "KALLANG/WHAMPOA",
+    "BEO": "BUKIT MERAH",
+    "BIDADARI": "TOA PAYOH",
+    "BOON KENG": "KALLANG/WHAMPOA",
+    "BOON LAY": "JURONG WEST",
+    "BOON TIONG": "BUKIT MERAH",
+    "BRAS BASAH": "CENTRAL AREA",
+    "BRIGHT HILL": "BISHAN",
+    "BUANGKOK": "SENGKANG",
+    "BUFFALO": "KALLANG/WHAMPOA",
+    "BUKIT HO SWEE": "BUKIT MERAH",
+    "BUKIT PURMEI": "BUKIT MERAH",
+    "CAMBRIDGE": "KALLANG/WHAMPOA",
+    "CANBERRA": "SEMBAWANG",
+    "CANTONMENT": "CENTRAL AREA",
+    "CASHEW": "BUKIT PANJANG",
+    "CASSIA": "GEYLANG",
+    "CHAI CHEE": "BEDOK",
+    "CHAMPIONS": "WOODLANDS",
+    "CHANDER": "KALLANG/WHAMPOA",
+    "CHANGI VILLAGE": "PASIR RIS",
+    "CHENG YAN": "CENTRAL AREA",
+    "CHIN SWEE": "CENTRAL AREA",
+    "CIRCUIT": "GEYLANG",
+    "COMMONWEALTH": "QUEENSTOWN",
+    "COMPASSVALE": "SENGKANG",
+    "CORPORATION": "JURONG WEST",
+    "CRAWFORD": "KALLANG/WHAMPOA",
+    "DAKOTA": "GEYLANG",
+    "DAWSON": "QUEENSTOWN",
+    "DEFU": "HOUGANG",
+    "DELTA": "BUKIT MERAH",
+    "DEPOT": "BUKIT MERAH",
+    "DORSET": "KALLANG/WHAMPOA",
+    "DOVER": "QUEENSTOWN",
+    "DURHAM": "KALLANG/WHAMPOA",
+    "EDGEDALE PLAINS": "PUNGGOL",
+    "EDGEFIELD": "PUNGGOL",
+    "ELIAS": "PASIR RIS",
+    "EMPRESS": "BUKIT TIMAH",
+    "ENG HOON": "BUKIT MERAH",
+    "ENG WATT": "BUKIT MERAH",
+    "EUNOS": "GEYLANG",
+    "EVERTON": "BUKIT MERAH",
+    "FAJAR": "BUKIT PANJANG",
+    "FARRER PARK": "KALLANG/WHAMPOA",
+    "FARRER ROAD": "BUKIT TIMAH",
+    "FERNVALE": "SENGKANG",
+    "FRENCH": "KALLANG/WHAMPOA",
+    "GANGES": "BUKIT MERAH",
+    "GANGSA": "BUKIT PANJANG",
+    "GHIM MOH": "QUEENSTOWN",
+    "GLOUCESTER": "KALLANG/WHAMPOA",
+    "GUAN CHUAN": "BUKIT MERAH",
+    "HAIG": "GEYLANG",
+    "HAVELOCK": "BUKIT MERAH",
+    "HENDERSON": "BUKIT MERAH",
+    "HO CHING": "JURONG WEST",
+    "HOLLAND": "QUEENSTOWN",
+    "HONG LIM": "CENTRAL AREA",
+    "HOY FATT": "BUKIT MERAH",
+    "INDUS": "BUKIT MERAH",
+    "JALAN AYER": "GEYLANG",
+    "JALAN BAHAGIA": "KALLANG/WHAMPOA",
+    "JALAN BATU": "GEYLANG",
+    "JALAN DAMAI": "BEDOK",
+    "JALAN DUA": "GEYLANG",
+    "JALAN EMPAT": "GEYLANG",
+    "JALAN KUKOH": "CENTRAL AREA",
+    "JALAN MA'MOR": "KALLANG/WHAMPOA",
+    "JALAN MEMBINA": "BUKIT MERAH",
+    "JALAN MINYAK": "BUKIT MERAH",
+    "JALAN RAJAH": "KALLANG/WHAMPOA",
+    "JALAN RUMAH TINGGI": "BUKIT MERAH",
+    "JALAN SATU": "GEYLANG",
+    "JALAN SULTAN": "KALLANG/WHAMPOA",
+    "JALAN TENAGA": "BEDOK",
+    "JALAN TENTERAM": "KALLANG/WHAMPOA",
+    "JALAN TIGA": "GEYLANG",
+    "JELAPANG": "BUKIT PANJANG",
+    "JELEBU": "BUKIT PANJANG",
+    "JELLICOE": "KALLANG/WHAMPOA",
+    "JOO CHIAT": "GEYLANG",
+    "JOO SENG": "TOA PAYOH",
+    "JURONG GATEWAY": "JURONG EAST",
+    "KALLANG": "KALLANG/WHAMPOA",
+    "KAMPONG ARANG": "GEYLANG",
+    "KAMPONG BAHRU": "BUKIT MERAH",
+    "KANG CHING": "JURONG WEST",
+    "KEAT HONG": "CHOA CHU KANG",
+    "KELANTAN": "KALLANG/WHAMPOA",
+    "KENT": "KALLANG/WHAMPOA",
+    "KIM KEAT": "TOA PAYOH",
+    "KIM PONG": "BUKIT MERAH",
+    "KIM TIAN": "BUKIT MERAH",
+    "KING GEORGE": "KALLANG/WHAMPOA",
+    "KLANG": "KALLANG/WHAMPOA",
+    "KRETA AYER": "CENTRAL AREA",
+    "LENGKOK BAHRU": "BUKIT MERAH",
+    "LENGKONG TIGA": "BEDOK",
+    "LOMPANG": "BUKIT PANJANG",
+    "LORONG AH SOO": "HOUGANG",
+    "LORONG LEW LIAN": "SERANGOON",
+    "LORONG LIMAU": "KALLANG/WHAMPOA",
+    "MACPHERSON": "GEYLANG",
+    "MARGARET": "QUEENSTOWN",
+    "MARINE": "MARINE PARADE",
+    "MARSILING": "WOODLANDS",
+    "MAUDE": "KALLANG/WHAMPOA",
+    "MCNAIR": "KALLANG/WHAMPOA",
+    "MEI CHIN": "QUEENSTOWN",
+    "MEI LING": "QUEENSTOWN",
+    "MOH GUAN": "BUKIT MERAH",
+    "MONTREAL": "SEMBAWANG",
+    "MOULMEIN": "KALLANG/WHAMPOA",
+    "NEW UPPER CHANGI": "BEDOK",
+    "NORTH BRIDGE": "KALLANG/WHAMPOA",
+    "NORTH BUONA VISTA": "QUEENSTOWN",
+    "NORTHSHORE": "PUNGGOL",
+    "OLD AIRPORT": "GEYLANG",
+    "PANDAN GARDENS": "JURONG EAST",
+    "PARK CRESCENT": "CENTRAL AREA",
+    "PAYA LEBAR": "GEYLANG",
+    "PENDING": "BUKIT PANJANG",
+    "PENG NGUAN": "BUKIT MERAH",
+    "PERUMAL": "KALLANG/WHAMPOA",
+    "PETIR": "BUKIT PANJANG",
+    "PIPIT": "GEYLANG",
+    "PLANTATION": "TENGAH",
+    "POTONG PASIR": "TOA PAYOH",
+    "QUEEN'S CLOSE": "QUEENSTOWN",
+    "QUEEN'S ROAD": "BUKIT TIMAH",
+    "QUEENS CLOSE": "QUEENSTOWN",
+    "QUEENSWAY": "QUEENSTOWN",
+    "RACE COURSE": "KALLANG/WHAMPOA",
+    "REDHILL": "BUKIT MERAH",
+    "RIVERVALE": "SENGKANG",
+    "ROWELL": "KALLANG/WHAMPOA",
+    "SAGO": "CENTRAL AREA",
+    "SAINT GEORGE": "KALLANG/WHAMPOA",
+    "SAINT MICHAEL": "KALLANG/WHAMPOA",
+    "SEGAR": "BUKIT PANJANG",
+    "SELEGIE": "CENTRAL AREA",
+    "SENG POH": "BUKIT MERAH",
+    "SENJA": "BUKIT PANJANG",
+    "SHUNFU": "BISHAN",
+    "SIMEI": "TAMPINES",
+    "SIMS": "GEYLANG",
+    "SIN MING": "BISHAN",
+    "SPOONER": "BUKIT MERAH",
+    "SPOTTISWOODE": "CENTRAL AREA",
+    "STIRLING": "QUEENSTOWN",
+    "STRATHMORE": "QUEENSTOWN",
+    "SUMANG": "PUNGGOL",
+    "TAH CHING": "JURONG WEST",
+    "TAMAN HO SWEE": "BUKIT MERAH",
+    "TANGLIN HALT": "QUEENSTOWN",
+    "TANJONG PAGAR": "CENTRAL AREA",
+    "TEBAN GARDENS": "JURONG EAST",
+    "TECK WHYE": "CHOA CHU KANG",
+    "TELOK BLANGAH": "BUKIT MERAH",
+    "TELOK PAKU": "PASIR RIS",
+    "THOMSON": "BISHAN",
+    "TIONG POH": "BUKIT MERAH",
+    "TOH GUAN": "JURONG EAST",
+    "TOH YI": "BUKIT TIMAH",
+    "TOWNER": "KALLANG/WHAMPOA",
+    "UBI": "GEYLANG",
+    "UPPER CROSS": "CENTRAL AREA",
+    "UPPER JURONG": "JURONG WEST",
+    "VEERASAMY": "KALLANG/WHAMPOA",
+    "WATERLOO": "CENTRAL AREA",
+    "WELLINGTON": "SEMBAWANG",
+    "WEST COAST": "CLEMENTI",
+    "WHAMPOA": "KALLANG/WHAMPOA",
+    "WOODLEIGH": "TOA PAYOH",
+    "YONG SIAK": "BUKIT MERAH",
+    "YORK HILL": "BUKIT MERAH",
+    "YUAN CHING": "JURONG WEST",
+    "YUNG AN": "JURONG WEST",
+    "YUNG HO": "JURONG WEST",
+    "YUNG KUANG": "JURONG WEST",
+    "YUNG LOH": "JURONG WEST",
+    "YUNG PING": "JURONG WEST",
+    "YUNG SHENG": "JURONG WEST",
+    "ZION": "BUKIT MERAH",
+}
+
+_AREAS = {**{town: town for town in TOWNS if "/" not in town}, **ESTATE_TOWNS}
+# Longest name first, so "JURONG WEST" wins over a shorter estate in the same street
+_AREA_RE = re.compile(r"\b(%s)\b" % "|".join(re.escape(name) for name in sorted(_AREAS, key=len, reverse=True)))
+
+# "98A", "85/A/B/C", "464A-B"; joined by "-", "/", ",", "&", "TO", "AND" or just a space
+_BLOCK_ITEM = r"\d+[A-Z]?(?:[-/][A-Z]\b)*"
+_ADDRESS_RE = re.compile(
+    r"^(?:(?:BLKS?|BLOCKS?)\.?\s*)?"
+    rf"(?P<block>{_BLOCK_ITEM}(?:(?:\s*(?:[-/,&]|\bTO\b|\bAND\b)\s*|\s+){_BLOCK_ITEM})*)"
+    r"\s*,?\s+(?P<street>[^\d\s,].*)$"
+)
+
+# Abbreviations in street names, read as the words the area names use ("BT BATOK")
+_ABBREVIATIONS = {"BT": "BUKIT", "JLN": "JALAN", "KG": "KAMPONG", "LOR": "LORONG", "TG": "TANJONG", "UPP": "UPPER"}
+_ABBREVIATION_RE = re.compile(r"\b(%s)\b" % "|".join(_ABBREVIATIONS))
+
+
+class ParsedAddress(NamedTuple):
+    block: str
+    street: str
+    town: str  # None when the address names no known town or estate
+
+
+def parse(address):
+    """Split a free-text address into ``ParsedAddress(block, street, town)``."""
+    text = " ".join((address or "").upper().split()).lstrip("-,. ")
+    match = _ADDRESS_RE.match(text)
+    if match:
+        block, street = match["block"], match["street"]
+    else:
+        block, street = "", text
+    area = _AREA_RE.search(_ABBREVIATION_RE.sub(lambda word: _ABBREVIATIONS[word[1]], street))
+    town = _AREAS[area[1]] if area else None
+    return ParsedAddress(block, street, town)
+
+
+def backfill(batch_size=1000, reparse=False, progress=None):
+    """
+    Parse the addresses of rows saved before the components existed (or of
+    every row with ``reparse``, after the rules here change), ``batch_size``
+    rows per transaction, walking the primary key so each batch is an index
+    range scan. ``progress`` is called with the running count after every
+    batch. Returns the number of rows updated.
+    """
+    queryset = CarPark.objects.select_related(None).only("pk", "address").order_by("pk")
+    if not reparse:
+        queryset = queryset.filter(street="").exclude(address="")
+    keys = CategoryKeys()
+    updated, last_pk = 0, 0
+    while True:
+        batch = list(queryset.filter(pk__gt=last_pk)[:batch_size])
+        if not batch:
+            break
+        now = timezone.now()
+        for car_park in batch:
+            car_park.parse_address(keys)
+            car_park.updated_at = now  # so clients mirroring the changes feed pick the new fields up
+        with transaction.atomic():
+            CarPark.objects.bulk_update(batch, ["block", "street", "town", "updated_at"])
+        updated += len(batch)
+        last_pk = batch[-1].pk
+        if progress:
+            progress(updated)
+    if updated:
+        dataset.mark_changed()  # bulk_update sends no post_save
+    return updated
@@ -1,9 +1,18 @@
 from django.contrib import admin
-from .models import CarPark  # Update to CarPark
+from .models import CarPark, ImportJob  # Update to CarPark
 
 
 # Register your models here.
 @admin.register(CarPark)
 class CarParkAdmin(admin.ModelAdmin):
-    list_display = ("address", "car_park_type", "gantry_height", "type_of_parking_system", "free_parking")
-    search_fields = ("address", "car_park_type", "type_of_parking_system")
\ No newline at end of file
+    list_display = ("address", "town", "car_park_type", "gantry_height", "type_of_parking_system", "free_parking")
+    list_filter = ("town",)
+    search_fields = ("address", "car_park_type__name", "type_of_parking_system__name")
+    readonly_fields = ("block", "street", "town")
+
+
+@admin.register(ImportJob)
+class ImportJobAdmin(admin.ModelAdmin):
+    list_display = ("id", "source", "status", "processed", "inserted", "failed", "created_at", "finished_at")
+    list_filter = ("status",)
+    readonly_fields = ("path", "worker", "attempts", "started_at", "heartbeat_at", "finished_at")
@@ -4,3 +4,6 @@ from django.apps import AppConfig
 class CarParksConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "carparks"
+
+    def ready(self):
+        from . import signals  # noqa: F401  (connects model signal receivers)
@@ -0,0 +1,247 @@
+"""
+Live lot availability: ingestion of whole snapshots and the latest-value view.
+
+A snapshot (one reading per car park and lot type, as published every
+minute) is ingested with a fixed number of queries whatever its size: the
+``car_park_no`` -> id map is memoised per dataset version, samples are
+appended with one batched ``INSERT ... ON CONFLICT DO NOTHING`` (re-posted
+readings are ignored by the unique constraint and not counted as stored),
+and the latest-value table is upserted in one query.
+The upsert only replaces a stored value with a newer one (the comparison is
+in its ``ON CONFLICT ... WHERE``, so concurrent ingests can't interleave
+around it); readings older than the stored latest value only go to the
+time series.
+
+Closed 15-minute buckets are rolled up after the ingest commits (see
+``carparks.rollups``).
+
+Readers get the latest values from ``latest_by_carpark()``, memoised per
+process for AVAILABILITY_CACHE_SECONDS and dropped immediately when this
+process ingests. None of this writes to CarPark, so the dataset version and
+every cache keyed on it are left alone.
+"""
+import threading
+import time
+from dataclasses import dataclass, field
+from datetime import timezone as dt_timezone
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from rest_framework import serializers
+
+from . import dataset, rollups
+from .models import AvailabilitySample, CarPark, CarParkAvailability, LotType
+
+BATCH_SIZE = 1000
+MAX_REPORTED_ERRORS = 100
+
+LOT_TYPES = set(LotType.values)
+
+# Same timestamp format as the car park serializer
+_format_time = serializers.DateTimeField().to_representation
+
+
+@dataclass
+class Reading:
+    car_park_no: str
+    lot_type: str
+    total_lots: int
+    available_lots: int
+    observed_at: object  # aware datetime
+
+
+@dataclass
+class IngestResult:
+    received: int = 0
+    stored: int = 0
+    latest_updated: int = 0
+    unknown_car_parks: list = field(default_factory=list)
+    rejected: list = field(default_factory=list)  # (index, message), capped
+
+
+def _parse_time(value):
+    parsed = parse_datetime(value) if isinstance(value, str) else None
+    if parsed is None:
+        raise ValueError(f"invalid observed_at {value!r}")
+    return parsed if timezone.is_aware(parsed) else timezone.make_aware(parsed, dt_timezone.utc)
+
+
+def _parse_count(item, name):
+    value = item.get(name)
+    if isinstance(value, bool) or not isinstance(value, int) or value < 0:
+        raise ValueError(f"{name} must be a non-negative integer")
+    return value
+
+
+def parse_snapshot(payload):
+    """
+    Validate a snapshot: ``{"observed_at": ..., "items": [...]}`` or a bare
+    list of items. Returns (readings, rejected); raises ValueError when the
+    payload itself is malformed.
+    """
+    default_time = None
+    if isinstance(payload, dict):
+        if payload.get("observed_at") is not None:
+            default_time = _parse_time(payload["observed_at"])
+        payload = payload.get("items")
+    if not isinstance(payload, list):
+        raise ValueError("Expected a list of availability items")
+    default_time = default_time or timezone.now()
+    readings, rejected = [], []
+    for index, item in enumerate(payload):
+        try:
+            if not isinstance(item, dict) or not item.get("car_park_no"):
+                raise ValueError("car_park_no is required")
+            lot_type = item.get("lot_type", LotType.CAR)
+            if lot_type not in LOT_TYPES:
+                raise ValueError(f"lot_type must be one of {sorted(LOT_TYPES)}")
+            observed_at = item.get("observed_at")
+            readings.append(Reading(
+                car_park_no=str(item["car_park_no"]),
+                lot_type=lot_type,
+                total_lots=_parse_count(item, "total_lots"),
+                available_lots=_parse_count(item, "available_lots"),
+                observed_at=_parse_time(observed_at) if observed_at is not None else default_time,
+            ))
+        except ValueError as exc:
+            rejected.append((index, str(exc)))
+    return readings, rejected
+
+
+_FIELDS = ("carpark", "lot_type", "total_lots", "available_lots", "observed_at")
+
+
+def _insert(model, rows, on_conflict):
+    """
+    ``INSERT ... ON CONFLICT`` of ``rows`` (unsaved ``model`` instances) in
+    batches; returns the number of rows inserted or updated. SQLite and
+    PostgreSQL take the same syntax.
+    """
+    quote = connection.ops.quote_name
+    fields = [model._meta.get_field(name) for name in _FIELDS]
+    columns = ", ".join(quote(field.column) for field in fields)
+    row_sql = "(%s)" % ", ".join(["%s"] * len(fields))
+    batch_size = min(BATCH_SIZE, connection.ops.bulk_batch_size(fields, rows))
+    changed = 0
+    with connection.cursor() as cursor:
+        for start in range(0, len(rows), batch_size):
+            batch = rows[start:start + batch_size]
+            cursor.execute(
+                f"INSERT INTO {quote(model._meta.db_table)} ({columns}) "
+                f"VALUES {', '.join([row_sql] * len(batch))} {on_conflict}",
+                [field.get_db_prep_save(getattr(row, field.attname), connection) for row in batch for field in fields],
+            )
+            changed += cursor.rowcount
+    return changed
+
+
+def _upsert_latest(rows):
+    """Upsert the latest values, keeping a stored value that is newer; returns the rows written."""
+    quote = connection.ops.quote_name
+    meta = CarParkAvailability._meta
+    updated = ", ".join(
+        f"{column} = excluded.{column}"
+        for column in (quote(meta.get_field(name).column) for name in ("total_lots", "available_lots", "observed_at"))
+    )
+    observed = quote(meta.get_field("observed_at").column)
+    return _insert(CarParkAvailability, rows, (
+        f"ON CONFLICT ({quote(meta.get_field('carpark').column)}, {quote(meta.get_field('lot_type').column)}) "
+        f"DO UPDATE SET {updated} WHERE excluded.{observed} > {quote(meta.db_table)}.{observed}"
+    ))
+
+
+_ids = None  # (dataset version, {car_park_no: id})
+
+
+def carpark_ids():
+    """
+    {car_park_no: id}. ``car_park_no`` is only unique together with the
+    address, type and height, so a number shared by several rows maps to the
+    oldest of them (lowest id), the one ``scripts/remove_duplicates.py`` keeps.
+    """
+    global _ids
+    version = dataset.current_version()
+    memo = _ids
+    if memo is None or memo[0] != version:
+        # Newest first, so the oldest row of a shared number is the one left in the dict
+        memo = (version, dict(CarPark.objects.order_by("-id").values_list("car_park_no", "id")))
+        _ids = memo
+    return memo[1]
+
+
+def ingest(readings, rejected=()):
+    result = IngestResult(received=len(readings) + len(rejected), rejected=list(rejected)[:MAX_REPORTED_ERRORS])
+    ids = carpark_ids()
+    samples, newest = [], {}
+    unknown = set()
+    for reading in readings:
+        carpark_id = ids.get(reading.car_park_no)
+        if carpark_id is None:
+            unknown.add(reading.car_park_no)
+            continue
+        fields = dict(carpark_id=carpark_id, lot_type=reading.lot_type, total_lots=reading.total_lots,
+                      available_lots=reading.available_lots, observed_at=reading.observed_at)
+        samples.append(AvailabilitySample(**fields))
+        key = (carpark_id, reading.lot_type)
+        if key not in newest or newest[key].observed_at < reading.observed_at:
+            newest[key] = CarParkAvailability(**fields)
+    result.unknown_car_parks = sorted(unknown)
+    if not samples:
+        return result
+    with transaction.atomic():
+        result.stored = _insert(AvailabilitySample, samples, "ON CONFLICT DO NOTHING")
+        # One row per key: an upsert may not touch the same row twice
+        result.latest_updated = _upsert_latest(list(newest.values()))
+    mark_changed()
+    if settings.AVAILABILITY_AUTO_ROLLUP:
+        transaction.on_commit(rollups.run_if_due)
+    return result
+
+
+_generation = 0
+_latest = None  # (checked_at, generation, {carpark_id: {lot_type: {...}}})
+_latest_lock = threading.Lock()
+
+
+def mark_changed():
+    global _generation
+    _generation += 1
+
+
+def latest_by_carpark():
+    """{carpark id: {lot type: {"total_lots", "available_lots", "observed_at"}}}."""
+    global _latest
+    memo = _latest
+    now = time.monotonic()
+    if memo is not None and memo[1] == _generation and now - memo[0] < settings.AVAILABILITY_CACHE_SECONDS:
+        return memo[2]
+    with _latest_lock:
+        memo = _latest
+        if memo is not None and memo[1] == _generation and now - memo[0] < settings.AVAILABILITY_CACHE_SECONDS:
+            return memo[2]
+        generation = _generation
+        latest = {}
+        for carpark_id, lot_type, total, available, observed_at in CarParkAvailability.objects.values_list(
+                "carpark_id", "lot_type", "total_lots", "available_lots", "observed_at"):
+            latest.setdefault(carpark_id, {})[lot_type] = {
+                "total_lots": total,
+                "available_lots": available,
+                "observed_at": _format_time(observed_at),
+            }
+        _latest = (now, generation, latest)
+        return latest
+
+
+def embed(rows):
+    """Copies of serialised car park rows with an ``availability`` key added."""
+    latest = latest_by_carpark()
+    return [{**row, "availability": latest.get(row["id"], {})} for row in rows]
+
+
+def reset():
+    """Drop the memoised id map and latest values (used by tests)."""
+    global _ids, _latest
+    _ids = None
+    _latest = None
@@ -0,0 +1,145 @@
+"""
+Idempotent dataset bootstrap for container starts.
+
+The CSV is fingerprinted (SHA-256 of its bytes plus its data row count) and
+compared with the DatasetLoad recorded for the same source. When they match
+and the table is not empty, nothing else is read or written, so a restart
+costs two small queries instead of a pass over every row.
+
+When a load is needed it runs in one transaction, together with recording
+the new fingerprint, using the fastest path for the backend:
+
+* PostgreSQL: the parsed rows are ``COPY``-ed into a temporary staging table
+  and merged with one ``INSERT ... SELECT ... ON CONFLICT DO NOTHING``.
+  Concurrent bootstraps (several replicas starting at once) queue on an
+  advisory lock and then find the fingerprint already recorded.
+* Anything else (SQLite): the batched importer inside a single transaction,
+  so the database syncs to disk once instead of once per batch.
+
+Either way rows are parsed by ``importer.row_to_instance`` and rows whose
+natural key already exists are skipped, exactly as ``import_csv`` does.
+"""
+import csv
+import hashlib
+import io
+import os
+from dataclasses import dataclass
+from pathlib import Path
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.utils import timezone
+
+from . import dataset, importer
+from .models import CarPark, DatasetLoad
+
+DEFAULT_CSV = Path(settings.BASE_DIR) / "dataset" / "HDBCarparkInformation.csv"
+CHUNK_SIZE = 1 << 20
+# Arbitrary application-wide key for pg_advisory_xact_lock
+ADVISORY_LOCK_KEY = 4_206_912_244
+
+
+@dataclass(frozen=True)
+class Fingerprint:
+    sha256: str
+    row_count: int
+
+
+@dataclass
+class BootstrapResult:
+    fingerprint: Fingerprint
+    skipped: bool = False
+    method: str = None  # "copy" or "batched" when loaded
+    import_result: importer.ImportResult = None
+
+
+def fingerprint(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as fh:
+        for chunk in iter(lambda: fh.read(CHUNK_SIZE), b""):
+            digest.update(chunk)
+    with open(path, newline="", encoding="utf-8-sig") as fh:
+        row_count = sum(1 for _ in csv.DictReader(fh))
+    return Fingerprint(digest.hexdigest(), row_count)
+
+
+def is_current(source, fp):
+    recorded = DatasetLoad.objects.filter(source=source).values_list("sha256", "row_count").first()
+    return recorded == (fp.sha256, fp.row_count) and CarPark.objects.exists()
+
+
+def _copy_fields():
+    return [field for field in CarPark._meta.concrete_fields
+            if not field.primary_key and field.name not in ("created_at", "updated_at")]
+
+
+def _copy_merge(reader, result):
+    """Load parsed rows through a COPY staging table (PostgreSQL only)."""
+    fields = _copy_fields()
+    quote = connection.ops.quote_name
+    table = quote(CarPark._meta.db_table)
+    columns = ", ".join(quote(field.column) for field in fields)
+
+    buffer = io.StringIO()
+    writer = csv.writer(buffer, quoting=csv.QUOTE_NONNUMERIC)  # quoted "" stays an empty string, not NULL
+    staged = 0
+    for instance in importer.parse_rows(reader, result):
+        writer.writerow([
+            ("t" if value else "f") if isinstance(value, bool) else value
+            for value in (getattr(instance, field.attname) for field in fields)
+        ])
+        staged += 1
+
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"CREATE TEMPORARY TABLE carpark_stage ON COMMIT DROP AS "
+            f"SELECT {columns} FROM {table} WITH NO DATA"
+        )
+        # None is written as a quoted "" too; FORCE_NULL reads it back as NULL in nullable columns
+        nullable = ", ".join(quote(field.column) for field in fields if field.null)
+        copy_sql = f"COPY carpark_stage ({columns}) FROM STDIN WITH (FORMAT csv" + (
+            f", FORCE_NULL ({nullable}))" if nullable else ")"
+        )
+        if hasattr(cursor.cursor, "copy"):  # psycopg 3
+            with cursor.cursor.copy(copy_sql) as copy:
+                copy.write(buffer.getvalue())
+        else:  # psycopg2
+            buffer.seek(0)
+            cursor.cursor.copy_expert(copy_sql, buffer)
+        # Duplicates within the file are skipped by the same ON CONFLICT
+        cursor.execute(
+            f"INSERT INTO {table} ({columns}, created_at, updated_at) "
+            f"SELECT {columns}, now(), now() FROM carpark_stage ON CONFLICT DO NOTHING"
+        )
+        result.inserted = cursor.rowcount
+    result.duplicates = staged - result.inserted
+
+
+def bootstrap(path, source=None, force=False, batch_size=importer.DEFAULT_BATCH_SIZE):
+    """Load ``path`` unless its fingerprint is already recorded; returns a BootstrapResult."""
+    source = source or os.path.basename(path)
+    fp = fingerprint(path)
+    if not force and is_current(source, fp):
+        return BootstrapResult(fp, skipped=True)
+
+    with open(path, newline="", encoding="utf-8-sig") as fh, transaction.atomic():
+        reader = importer.open_csv(fh)
+        if connection.vendor == "postgresql":
+            with connection.cursor() as cursor:
+                cursor.execute("SELECT pg_advisory_xact_lock(%s)", [ADVISORY_LOCK_KEY])
+            if not force and is_current(source, fp):  # loaded while we waited for the lock
+                return BootstrapResult(fp, skipped=True)
+            result, method = importer.ImportResult(), "copy"
+            _copy_merge(reader, result)
+        else:
+            result, method = importer.import_rows(reader, batch_size=batch_size), "batched"
+        DatasetLoad.objects.update_or_create(source=source, defaults=dict(
+            sha256=fp.sha256,
+            row_count=fp.row_count,
+            inserted=result.inserted,
+            duplicates=result.duplicates,
+            failed=result.failed,
+            loaded_at=timezone.now(),
+        ))
+    dataset.mark_changed()  # neither path sends post_save
+    return BootstrapResult(fp, method=method, import_result=result)
@@ -0,0 +1,50 @@
+"""
+Name <-> key resolution for CarPark's categorical fields.
+
+``car_park_type``, ``type_of_parking_system``, ``short_term_parking`` and
+``free_parking`` (and ``town``, derived from the address) each have a handful
+of distinct values, so they are stored as foreign keys into small lookup
+tables (``CategoryLookup`` subclasses) rather than as text on every row.
+Writers go through this module to turn names into keys: a name not seen
+before gets a new lookup row.
+"""
+from .models import CarParkType, FreeParking, ParkingSystem, ShortTermParking, Town
+
+LOOKUP_MODELS = {
+    "car_park_type": CarParkType,
+    "type_of_parking_system": ParkingSystem,
+    "short_term_parking": ShortTermParking,
+    "free_parking": FreeParking,
+    "town": Town,
+}
+
+
+def _name(value):
+    # The columns used to be CharFields, which stored True as "True"
+    return value if isinstance(value, str) else str(value)
+
+
+def resolve(field, value):
+    """The lookup row for ``value`` of ``field``, created if needed."""
+    return LOOKUP_MODELS[field].objects.get_or_create(name=_name(value))[0]
+
+
+class CategoryKeys:
+    """
+    Name -> key maps for a bulk write (an import run): every lookup table is
+    read once up front, and only names not seen before cost a query.
+    """
+
+    def __init__(self):
+        self._keys = None
+
+    def key(self, field, value):
+        if self._keys is None:
+            self._keys = {
+                name: dict(model.objects.values_list("name", "pk")) for name, model in LOOKUP_MODELS.items()
+            }
+        value = _name(value)
+        keys = self._keys[field]
+        if value not in keys:
+            keys[value] = resolve(field, value).pk
+        return keys[value]
@@ -0,0 +1,156 @@
+"""
+Optional in-memory columnar read engine for the CarPark table.
+
+The whole table is loaded once per worker into compact arrays: NumPy arrays
+for numeric and boolean fields, integer category codes for the low
+cardinality text fields, and the already-serialised rows (so responses are
+byte-for-byte what CarParkSerializer produces). Filters, ranges and
+aggregates then run as vectorised boolean masks instead of SQL.
+
+Enable with CARPARK_READ_ENGINE=columnar (requires NumPy). A snapshot is
+tagged with the dataset version it was built from (see ``carparks.dataset``).
+When the version moves, the first request rebuilds it off to the side and
+swaps the reference in one assignment; concurrent requests that find the
+snapshot stale while the rebuild runs are served by the ORM.
+"""
+import threading
+
+from django.conf import settings
+
+from . import dataset
+from .models import CarPark
+from .serializers import CarParkSerializer
+
+try:
+    import numpy as np
+except ImportError:  # the engine is optional; views fall back to the ORM
+    np = None
+
+CATEGORICAL_FIELDS = ("car_park_type", "type_of_parking_system", "short_term_parking", "free_parking", "town")
+NUMERIC_FIELDS = {
+    "x_coord": "float64",
+    "y_coord": "float64",
+    "gantry_height": "float64",
+    "car_park_decks": "int16",
+    "night_parking": "bool",
+    "car_park_basement": "bool",
+}
+
+# Values of free_parking that mean "no free parking" (see FreeParkingView)
+NOT_FREE_VALUES = ("NO", "FALSE")
+
+
+class ColumnarSnapshot:
+    def __init__(self, version, rows, numeric, codes, categories, address_upper):
+        self.version = version
+        self.rows = rows
+        self.numeric = numeric
+        self.codes = codes
+        self.categories = categories
+        self.address_upper = address_upper
+
+    @classmethod
+    def build(cls, version):
+        instances = list(CarPark.objects.all())
+        rows = [dict(row) for row in CarParkSerializer(instances, many=True).data]
+        numeric = {
+            name: np.fromiter((getattr(obj, name) for obj in instances), dtype=dtype, count=len(instances))
+            for name, dtype in NUMERIC_FIELDS.items()
+        }
+        codes, categories = {}, {}
+        for name in CATEGORICAL_FIELDS:
+            # "" stands for no value (town is optional); it is never a group or a distinct value
+            values = np.array([getattr(getattr(obj, name), "name", "") for obj in instances], dtype=object)
+            uniques, inverse = np.unique(values, return_inverse=True)
+            categories[name] = [str(value) for value in uniques]
+            codes[name] = inverse.astype(np.min_scalar_type(max(len(uniques) - 1, 0)))
+        address_upper = np.array([obj.address.upper() for obj in instances], dtype=str)
+        return cls(version, rows, numeric, codes, categories, address_upper)
+
+    def __len__(self):
+        return len(self.rows)
+
+    # -- masks ---------------------------------------------------------------
+    def all(self):
+        return np.ones(len(self), dtype=bool)
+
+    def category_mask(self, field, values):
+        """Case-insensitive membership of a categorical field in ``values``."""
+        wanted = {value.upper() for value in values}
+        matching = [code for code, category in enumerate(self.categories[field]) if category.upper() in wanted]
+        return np.isin(self.codes[field], matching)
+
+    def free_parking_mask(self):
+        return ~self.category_mask("free_parking", NOT_FREE_VALUES)
+
+    def range_mask(self, field, low=None, high=None):
+        column = self.numeric[field]
+        mask = self.all()
+        if low is not None:
+            mask &= column >= low
+        if high is not None:
+            mask &= column <= high
+        return mask
+
+    def address_mask(self, query):
+        return np.char.find(self.address_upper, query.upper()) >= 0
+
+    # -- results -------------------------------------------------------------
+    def rows_where(self, mask):
+        rows = self.rows
+        return [rows[i] for i in np.flatnonzero(mask)]
+
+    def group_counts(self, field):
+        counts = np.bincount(self.codes[field], minlength=len(self.categories[field]))
+        return [
+            {field: category, "total": int(total)}
+            for category, total in zip(self.categories[field], counts)
+            if total and category
+        ]
+
+    def distinct(self, field):
+        return [category for category in self.categories[field] if category]
+
+    def mean(self, field):
+        column = self.numeric[field]
+        return float(column.mean()) if len(column) else None
+
+
+_snapshot = None
+_build_lock = threading.Lock()
+
+
+def enabled():
+    return np is not None and getattr(settings, "CARPARK_READ_ENGINE", "orm") == "columnar"
+
+
+def get_snapshot():
+    """
+    Return a snapshot matching the current dataset version, or None when the
+    engine is disabled or the snapshot is stale and another thread is
+    rebuilding it (callers then use the ORM).
+    """
+    global _snapshot
+    if not enabled():
+        return None
+    version = dataset.current_version()
+    snapshot = _snapshot
+    if snapshot is not None and snapshot.version == version:
+        return snapshot
+    if not _build_lock.acquire(blocking=False):
+        return None
+    try:
+        snapshot = _snapshot
+        if snapshot is None or snapshot.version != version:
+            snapshot = ColumnarSnapshot.build(version)
+            _snapshot = snapshot
+        return snapshot
+    finally:
+        _build_lock.release()
+
+
+def reset():
+    """Drop the current snapshot and version memo (used by tests)."""
+    global _snapshot
+    _snapshot = None
+    dataset.mark_changed()
@@ -0,0 +1,47 @@
+"""
+Dataset version tracking for per-process read caches.
+
+``current_version()`` fingerprints the CarPark table with one aggregate query
+(row count, highest id, latest ``updated_at``). Caches built from the table
+store the version they were built from and are considered stale as soon as
+the fingerprint moves.
+
+The fingerprint is memoised for CARPARK_DATASET_VERSION_TTL seconds so hot
+endpoints don't pay the aggregate on every request. Writes made by this
+process call ``mark_changed()`` (via model signals, or explicitly after bulk
+operations that bypass them), which drops the memo immediately; writes made
+by other processes are picked up within the TTL.
+"""
+import time
+
+from django.conf import settings
+from django.db.models import Count, Max
+
+from .models import CarPark
+
+_generation = 0
+_memo = None  # (checked_at, generation, version)
+
+
+def mark_changed():
+    """Invalidate the memoised version after a write from this process."""
+    global _generation
+    _generation += 1
+
+
+def current_version():
+    global _memo
+    memo = _memo
+    now = time.monotonic()
+    if (
+        memo is not None
+        and memo[1] == _generation
+        and now - memo[0] < settings.CARPARK_DATASET_VERSION_TTL
+    ):
+        return memo[2]
+    generation = _generation
+    stats = CarPark.objects.order_by().aggregate(rows=Count("id"), last_id=Max("id"), last_update=Max("updated_at"))
+    last_update = stats["last_update"].timestamp() if stats["last_update"] else 0
+    version = f"{stats['rows']}-{stats['last_id'] or 0}-{last_update:.6f}"
+    _memo = (now, generation, version)
+    return version
@@ -0,0 +1,182 @@
+"""
+Push notifications of CarPark changes for the server-sent events stream.
+
+Every committed create/update publishes an ``upsert`` event and every delete
+a ``delete`` event carrying the same payloads as the changes feed. The event
+id is the row's change token (see ``carparks.changes``), so a client that
+reconnects with ``Last-Event-ID`` is caught up from the changes feed before
+live events resume.
+
+Events go through a broker chosen by CARPARK_EVENTS_BROKER:
+
+* ``LocalBroker`` (default) fans events out to the subscribers of this
+  process only. Enough for a single worker, or when every worker serves its
+  own subscribers and writes come through the API of the same worker.
+* ``RedisBroker`` publishes on a Redis channel (REDIS_URL) and fans out what
+  it receives to local subscribers, so a write in any worker reaches every
+  subscriber.
+
+A custom broker only needs ``wants_events()`` and ``publish(event)``
+(callable from any thread) and ``subscribe()`` / ``unsubscribe(subscription)``
+(called on the event loop). Subscribers are asyncio queues, so idle
+subscribers hold no thread.
+
+Bulk writes that bypass model signals (``carparks.importer``) are not pushed;
+they reach clients through the changes feed on their next reconnect.
+"""
+import asyncio
+import logging
+import threading
+from dataclasses import dataclass
+
+from django.conf import settings
+from django.db import transaction
+from django.utils.module_loading import import_string
+
+from .changes import encode_token
+from .renderers import ORJSONRenderer
+from .serializers import CarParkSerializer, CarParkTombstoneSerializer
+
+logger = logging.getLogger(__name__)
+
+OVERFLOW = object()  # queued once for a subscriber that fell too far behind
+
+
+@dataclass(frozen=True)
+class Event:
+    id: str
+    type: str
+    data: bytes  # JSON
+
+    def encode(self):
+        """The event as an SSE frame."""
+        return b"id: %s\nevent: %s\ndata: %s\n\n" % (self.id.encode(), self.type.encode(), self.data)
+
+
+def upsert_event(carpark):
+    data = ORJSONRenderer().render(CarParkSerializer(carpark).data)
+    return Event(encode_token(carpark.updated_at, carpark.pk), "upsert", data)
+
+
+def delete_event(tombstone):
+    data = ORJSONRenderer().render(CarParkTombstoneSerializer(tombstone).data)
+    return Event(encode_token(tombstone.deleted_at, tombstone.carpark_id), "delete", data)
+
+
+class Subscription:
+    def __init__(self, loop, max_queued):
+        self.loop = loop
+        self.queue = asyncio.Queue()
+        self.max_queued = max_queued
+        self.overflowed = False
+
+    def deliver(self, event):
+        """Queue ``event``; runs on the subscriber's loop."""
+        if self.overflowed:
+            return
+        if self.queue.qsize() >= self.max_queued:
+            self.overflowed = True
+            event = OVERFLOW
+        self.queue.put_nowait(event)
+
+
+class LocalBroker:
+    def __init__(self):
+        self._subscriptions = set()
+        self._lock = threading.Lock()
+
+    def subscribe(self):
+        subscription = Subscription(asyncio.get_running_loop(), settings.CARPARK_EVENTS_MAX_QUEUED)
+        with self._lock:
+            self._subscriptions.add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            self._subscriptions.discard(subscription)
+
+    def wants_events(self):
+        """False lets writers skip building events nobody would receive."""
+        return bool(self._subscriptions)
+
+    def publish(self, event):
+        self.fan_out(event)
+
+    def fan_out(self, event):
+        with self._lock:
+            subscriptions = list(self._subscriptions)
+        for subscription in subscriptions:
+            try:
+                subscription.loop.call_soon_threadsafe(subscription.deliver, event)
+            except RuntimeError:  # loop closed under a subscriber that never unsubscribed
+                self.unsubscribe(subscription)
+
+
+class RedisBroker(LocalBroker):
+    CHANNEL = "carparks:events"
+
+    def __init__(self):
+        super().__init__()
+        import redis
+
+        self._client = redis.Redis.from_url(settings.REDIS_URL)
+        self._listener = None
+
+    def subscribe(self):
+        if self._listener is None or self._listener.done():
+            self._listener = asyncio.get_running_loop().create_task(self._listen())
+        return super().subscribe()
+
+    def wants_events(self):
+        return True  # subscribers may be in other processes
+
+    def publish(self, event):
+        self._client.publish(self.CHANNEL, event.encode())
+
+    async def _listen(self):
+        import redis.asyncio
+
+        client = redis.asyncio.Redis.from_url(settings.REDIS_URL)
+        async with client.pubsub() as pubsub:
+            await pubsub.subscribe(self.CHANNEL)
+            async for message in pubsub.listen():
+                if message["type"] == "message":
+                    self.fan_out(_decode_frame(message["data"]))
+
+
+def _decode_frame(frame):
+    fields = dict(line.split(b": ", 1) for line in frame.strip().split(b"\n"))
+    return Event(fields[b"id"].decode(), fields[b"event"].decode(), fields[b"data"])
+
+
+_broker = None
+_broker_lock = threading.Lock()
+
+
+def get_broker():
+    global _broker
+    if _broker is None:
+        with _broker_lock:
+            if _broker is None:
+                _broker = import_string(settings.CARPARK_EVENTS_BROKER)()
+    return _broker
+
+
+def publish_on_commit(build_event):
+    """Publish ``build_event()`` once the surrounding transaction commits."""
+
+    def publish():
+        try:
+            broker = get_broker()
+            if broker.wants_events():
+                broker.publish(build_event())
+        except Exception:  # a broker outage must never fail the write
+            logger.exception("Failed to publish carpark event")
+
+    transaction.on_commit(publish)
+
+
+def reset():
+    """Drop the broker and its subscribers (used by tests)."""
+    global _broker
+    _broker = None
@@ -0,0 +1,193 @@
+"""
+Facet counts for the filtered list endpoints (``?facets=``).
+
+Each facet counts the results per value of one field, under every filter in
+the request except the facet's own: with ``type=BASEMENT CAR PARK`` the
+``car_park_type`` facet still lists every type, each with the number of
+results picking it instead would give. That is what a dropdown or a set of
+checkboxes next to the results needs.
+
+All requested facets come from one grouped query. The rows matching the
+non-facet filters are grouped by the facet columns (a few hundred distinct
+combinations at most), and each facet's counts are summed from those groups
+in Python, skipping groups its sibling facet filters rule out. With the
+columnar engine on, the counts come from the snapshot's arrays instead and
+no query runs at all. Unfiltered counts, which every page load asks for to
+fill its dropdowns, are cached per dataset version through singleflight.
+
+Gantry heights are counted in HEIGHT_BUCKETS: ``min`` inclusive, ``max``
+exclusive, ``None`` for an open end.
+"""
+from bisect import bisect_right
+from collections import Counter
+
+from django.db.models import Count
+from django_filters.constants import EMPTY_VALUES
+
+FACETS = ("car_park_type", "type_of_parking_system", "night_parking", "car_park_basement", "gantry_height")
+
+# Query parameters (CarParkFilter filters) that select within each facet
+FACET_FILTERS = {
+    "car_park_type": ("type",),
+    "type_of_parking_system": ("parking_system",),
+    "night_parking": ("night_parking",),
+    "car_park_basement": ("car_park_basement",),
+    "gantry_height": ("min_height", "max_height"),
+}
+
+# Grouped-query column of each facet
+_COLUMNS = {
+    "car_park_type": "car_park_type__name",
+    "type_of_parking_system": "type_of_parking_system__name",
+    "night_parking": "night_parking",
+    "car_park_basement": "car_park_basement",
+    "gantry_height": "gantry_height",
+}
+
+HEIGHT_EDGES = (1.8, 2.0, 2.2, 4.5)
+HEIGHT_BUCKETS = tuple(zip((None, *HEIGHT_EDGES), (*HEIGHT_EDGES, None)))
+
+
+def requested(value):
+    """Facet names from a ``facets`` parameter ("all" for every one); raises ValueError."""
+    names = [name.strip() for name in (value or "").split(",") if name.strip()]
+    if names == ["all"]:
+        return list(FACETS)
+    unknown = [name for name in names if name not in FACETS]
+    if unknown:
+        raise ValueError(f"Unknown facet: {', '.join(unknown)}. Choose from {', '.join(FACETS)} or all")
+    return [name for name in FACETS if name in names]
+
+
+def _selected(filterset):
+    """{facet: {filter name: value}} for the facet filters present in the request."""
+    cleaned = filterset.form.cleaned_data
+    return {
+        facet: {name: cleaned[name] for name in names if cleaned.get(name) not in EMPTY_VALUES}
+        for facet, names in FACET_FILTERS.items()
+    }
+
+
+def _matches(facet, value, chosen):
+    if facet == "gantry_height":
+        low, high = chosen.get("min_height"), chosen.get("max_height")
+        return (low is None or value >= low) and (high is None or value <= high)
+    (wanted,) = chosen.values()
+    return value.upper() == wanted.upper() if isinstance(wanted, str) else value == wanted
+
+
+def _bucket(height):
+    return bisect_right(HEIGHT_EDGES, height)
+
+
+def _format(facet, counts):
+    if facet == "gantry_height":
+        return [
+            {"min": low, "max": high, "count": counts.get(index, 0)}
+            for index, (low, high) in enumerate(HEIGHT_BUCKETS)
+        ]
+    if facet in ("night_parking", "car_park_basement"):
+        return [{"value": value, "count": counts.get(value, 0)} for value in (True, False)]
+    return [{"value": value, "count": count} for value, count in sorted(counts.items())]
+
+
+def counts(filterset, facets):
+    """``{facet: [{value, count}, ...]}`` for a bound, valid CarParkFilter."""
+    from . import singleflight
+
+    cleaned = filterset.form.cleaned_data
+    if all(value in EMPTY_VALUES for name, value in cleaned.items() if name != "ordering"):
+        return singleflight.get(f"facets:{','.join(facets)}", lambda: _counts(filterset, facets))
+    return _counts(filterset, facets)
+
+
+def _counts(filterset, facets):
+    from . import columnar
+
+    selected = _selected(filterset)
+    snapshot = columnar.get_snapshot()
+    if snapshot is not None:
+        result = _snapshot_counts(snapshot, filterset, facets, selected)
+        if result is not None:
+            return result
+
+    # Every filter except the facet ones runs in SQL, as CarParkFilter.qs would
+    queryset = filterset.queryset
+    skipped = {name for names in FACET_FILTERS.values() for name in names} | {"ordering"}
+    for name, value in filterset.form.cleaned_data.items():
+        if name not in skipped:
+            queryset = filterset.filters[name].filter(queryset, value)
+
+    grouped = [facet for facet in FACETS if facet in facets or selected[facet]]
+    columns = [_COLUMNS[facet] for facet in grouped]
+    totals = {facet: Counter() for facet in facets}
+    for row in queryset.order_by().values_list(*columns).annotate(total=Count("pk")):
+        values = dict(zip(grouped, row))
+        for facet in facets:
+            if all(_matches(other, values[other], selected[other])
+                   for other in grouped if other != facet and selected[other]):
+                value = values[facet]
+                totals[facet][_bucket(value) if facet == "gantry_height" else value] += row[-1]
+    return {facet: _format(facet, totals[facet]) for facet in facets}
+
+
+def _snapshot_base_mask(snapshot, filterset):
+    """Mask of the non-facet filters, or None when one has no snapshot equivalent."""
+    mask = snapshot.all()
+    for name, value in filterset.form.cleaned_data.items():
+        if value in EMPTY_VALUES or name == "ordering" or any(name in names for names in FACET_FILTERS.values()):
+            continue
+        if name == "free_parking":
+            free = snapshot.free_parking_mask()
+            mask &= free if value else ~free
+        elif name in ("short_term_parking", "town"):
+            mask &= snapshot.category_mask(name, [value])
+        elif name == "min_decks":
+            mask &= snapshot.range_mask("car_park_decks", low=float(value))
+        elif name == "max_decks":
+            mask &= snapshot.range_mask("car_park_decks", high=float(value))
+        elif name == "address":
+            mask &= snapshot.address_mask(value)
+        else:
+            return None
+    return mask
+
+
+def _snapshot_facet_mask(snapshot, facet, chosen):
+    if facet == "gantry_height":
+        low, high = chosen.get("min_height"), chosen.get("max_height")
+        return snapshot.range_mask(
+            "gantry_height", None if low is None else float(low), None if high is None else float(high)
+        )
+    (wanted,) = chosen.values()
+    if isinstance(wanted, str):
+        return snapshot.category_mask(facet, [wanted])
+    return snapshot.numeric[facet] == wanted
+
+
+def _snapshot_counts(snapshot, filterset, facets, selected):
+    import numpy as np
+
+    base = _snapshot_base_mask(snapshot, filterset)
+    if base is None:
+        return None
+    masks = {facet: _snapshot_facet_mask(snapshot, facet, chosen) for facet, chosen in selected.items() if chosen}
+    result = {}
+    for facet in facets:
+        mask = base.copy()
+        for other, other_mask in masks.items():
+            if other != facet:
+                mask &= other_mask
+        if facet == "gantry_height":
+            buckets = np.searchsorted(HEIGHT_EDGES, snapshot.numeric[facet][mask], side="right")
+            found = Counter(dict(enumerate(np.bincount(buckets, minlength=len(HEIGHT_BUCKETS)).tolist())))
+        elif facet in ("night_parking", "car_park_basement"):
+            flags = snapshot.numeric[facet][mask]
+            found = Counter({True: int(flags.sum()), False: int((~flags).sum())})
+        else:
+            codes = np.bincount(snapshot.codes[facet][mask], minlength=len(snapshot.categories[facet]))
+            found = Counter({
+                category: int(count) for category, count in zip(snapshot.categories[facet], codes) if count
+            })
+        result[facet] = _format(facet, found)
+    return result
@@ -0,0 +1,83 @@
+"""
+Composable filters for the carpark query endpoint.
+
+Every predicate of the single-purpose filter views (type, free parking,
+gantry height range, address search) plus town, night parking, basement,
+parking system and deck ranges can be combined in one request and is
+compiled into a single SQL query.
+
+Categorical values are matched case-insensitively against the name in the
+field's lookup table (``UPPER(name) = UPPER(value)``); the lookup tables hold
+a handful of rows, and car parks are then found through the foreign key.
+"""
+import django_filters
+from django_filters.constants import EMPTY_VALUES
+from django.db.models import CharField
+from django.db.models.functions import Upper
+
+from .models import CarPark, Town
+
+CharField.register_lookup(Upper)
+
+# Values of free_parking that mean "no free parking" (see FreeParkingView)
+NOT_FREE_VALUES = ("NO", "FALSE")
+
+
+class UpperCharFilter(django_filters.CharFilter):
+    """Case-insensitive exact match that can use an index on UPPER(column)."""
+
+    def filter(self, qs, value):
+        if value in EMPTY_VALUES:
+            return qs
+        return super().filter(qs, value.upper())
+
+
+class StableOrderingFilter(django_filters.OrderingFilter):
+    """Append the primary key so pagination is deterministic for equal sort keys."""
+
+    def filter(self, qs, value):
+        qs = super().filter(qs, value)
+        ordering = list(qs.query.order_by) or list(qs.model._meta.ordering)
+        if "pk" not in ordering and "id" not in ordering:
+            qs = qs.order_by(*ordering, "pk")
+        return qs
+
+
+class CarParkFilter(django_filters.FilterSet):
+    type = UpperCharFilter(field_name="car_park_type__name", lookup_expr="upper")
+    parking_system = UpperCharFilter(field_name="type_of_parking_system__name", lookup_expr="upper")
+    short_term_parking = UpperCharFilter(field_name="short_term_parking__name", lookup_expr="upper")
+    town = django_filters.CharFilter(method="filter_town")
+    free_parking = django_filters.BooleanFilter(method="filter_free_parking")
+    night_parking = django_filters.BooleanFilter()
+    car_park_basement = django_filters.BooleanFilter()
+    min_height = django_filters.NumberFilter(field_name="gantry_height", lookup_expr="gte")
+    max_height = django_filters.NumberFilter(field_name="gantry_height", lookup_expr="lte")
+    min_decks = django_filters.NumberFilter(field_name="car_park_decks", lookup_expr="gte")
+    max_decks = django_filters.NumberFilter(field_name="car_park_decks", lookup_expr="lte")
+    address = django_filters.CharFilter(field_name="address", lookup_expr="icontains")
+    ordering = StableOrderingFilter(
+        fields=(
+            "address",
+            "car_park_no",
+            ("car_park_type__name", "car_park_type"),
+            ("town__name", "town"),
+            "gantry_height",
+            "car_park_decks",
+            "created_at",
+            "updated_at",
+        )
+    )
+
+    class Meta:
+        model = CarPark
+        fields = []
+
+    def filter_free_parking(self, queryset, name, value):
+        condition = {"free_parking__name__upper__in": NOT_FREE_VALUES}
+        return queryset.exclude(**condition) if value else queryset.filter(**condition)
+
+    def filter_town(self, queryset, name, value):
+        # IN (ids from the tiny Town table) probes the town_id index; a join
+        # on UPPER(name) lets SQLite scan every car park instead
+        return queryset.filter(town__in=Town.objects.filter(name__iexact=value))
@@ -0,0 +1,163 @@
+"""
+Batched importer for HDB car park CSV rows.
+
+Rows are processed in batches: one query fetches the natural keys of the
+batch that already exist, one ``bulk_create`` inserts the rest. The number of
+queries therefore grows with the number of batches, not the number of rows
+(plus one per category lookup table, and one per category name not seen
+before).
+"""
+import csv
+from dataclasses import dataclass, field
+
+from django.db import transaction
+
+from . import dataset
+from .categories import CategoryKeys
+from .models import CarPark
+
+REQUIRED_COLUMNS = [
+    "car_park_no",
+    "address",
+    "x_coord",
+    "y_coord",
+    "car_park_type",
+    "type_of_parking_system",
+    "short_term_parking",
+    "free_parking",
+    "night_parking",
+    "car_park_decks",
+    "gantry_height",
+    "car_park_basement",
+]
+
+# Mirrors CarPark.Meta.unique_together (categories by key)
+NATURAL_KEY = ("car_park_no", "address", "car_park_type_id", "gantry_height", "type_of_parking_system_id")
+
+DEFAULT_BATCH_SIZE = 1000
+MAX_REPORTED_ERRORS = 100
+
+_TRUTHY = {"Y", "YES", "TRUE", "T", "1"}
+
+
+@dataclass
+class ImportResult:
+    inserted: int = 0
+    duplicates: int = 0
+    failed: int = 0
+    errors: list = field(default_factory=list)  # (line number, message), capped
+
+    @property
+    def processed(self):
+        return self.inserted + self.duplicates + self.failed
+
+
+def _to_bool(value):
+    return str(value).strip().upper() in _TRUTHY
+
+
+def row_to_instance(row, keys=None):
+    """
+    Build an unsaved CarPark from a CSV row; raises ValueError on bad values.
+    ``keys`` maps category names to lookup keys; share one across a run.
+    """
+    instance = CarPark(
+        car_park_no=row["car_park_no"],
+        address=row["address"],
+        x_coord=float(row["x_coord"]),
+        y_coord=float(row["y_coord"]),
+        night_parking=_to_bool(row["night_parking"]),
+        car_park_decks=int(float(row["car_park_decks"])),
+        gantry_height=float(row["gantry_height"]),
+        car_park_basement=_to_bool(row["car_park_basement"]),
+    )
+    # After the numeric fields, so rows that fail to parse add no lookup rows
+    keys = keys or CategoryKeys()
+    for name in CarPark.CATEGORY_FIELDS:
+        setattr(instance, f"{name}_id", keys.key(name, row[name]))
+    instance.parse_address(keys)  # bulk_create skips save()
+    return instance
+
+
+def _natural_key(instance):
+    return tuple(getattr(instance, name) for name in NATURAL_KEY)
+
+
+def _import_batch(instances, result):
+    existing = set(
+        CarPark.objects.filter(car_park_no__in={obj.car_park_no for obj in instances})
+        .order_by()
+        .values_list(*NATURAL_KEY)
+    )
+    new = []
+    for obj in instances:
+        key = _natural_key(obj)
+        if key in existing:
+            result.duplicates += 1
+            continue
+        existing.add(key)  # also drops duplicates within the batch
+        new.append(obj)
+    if not new:
+        return
+    with transaction.atomic():
+        CarPark.objects.bulk_create(new)
+    dataset.mark_changed()  # bulk_create sends no post_save
+    result.inserted += len(new)
+
+
+def parse_rows(rows, result):
+    """
+    Yield a CarPark per CSV-row dict. Rows that fail to parse are counted in
+    ``result`` and reported with their line number (header is line 1).
+    """
+    keys = CategoryKeys()
+    for line, row in enumerate(rows, start=2):
+        try:
+            yield row_to_instance(row, keys)
+        except (KeyError, TypeError, ValueError) as exc:
+            result.failed += 1
+            if len(result.errors) < MAX_REPORTED_ERRORS:
+                result.errors.append((line, f"{exc.__class__.__name__}: {exc}"))
+
+
+def import_rows(rows, batch_size=DEFAULT_BATCH_SIZE, progress=None):
+    """
+    Import an iterable of CSV-row dicts, skipping rows whose natural key exists.
+
+    ``progress`` is called with the running ImportResult after every batch.
+    Rows that fail to parse are counted and reported (see ``parse_rows``)
+    instead of aborting the import.
+    """
+    result = ImportResult()
+    batch = []
+    for instance in parse_rows(rows, result):
+        batch.append(instance)
+        if len(batch) >= batch_size:
+            _import_batch(batch, result)
+            batch = []
+            if progress:
+                progress(result)
+    if batch:
+        _import_batch(batch, result)
+        if progress:
+            progress(result)
+    return result
+
+
+def missing_columns(fieldnames):
+    return [column for column in REQUIRED_COLUMNS if column not in (fieldnames or [])]
+
+
+def open_csv(fh):
+    """A DictReader over ``fh``; raises ValueError on missing columns."""
+    reader = csv.DictReader(fh)
+    missing = missing_columns(reader.fieldnames)
+    if missing:
+        raise ValueError(f"Missing required columns in CSV: {', '.join(missing)}")
+    return reader
+
+
+def import_csv(file_path, batch_size=DEFAULT_BATCH_SIZE, progress=None):
+    """Stream a CSV file through import_rows; raises ValueError on missing columns."""
+    with open(file_path, newline="", encoding="utf-8-sig") as fh:
+        return import_rows(open_csv(fh), batch_size=batch_size, progress=progress)
@@ -0,0 +1,151 @@
+"""
+Database-backed queue of CSV import jobs.
+
+The upload endpoint only streams the file to IMPORT_UPLOAD_DIR and inserts a
+queued ImportJob; the import itself runs in ``manage.py process_imports``, a
+separate process, so no web worker is tied up while millions of rows load.
+
+Workers claim the oldest queued job with a conditional UPDATE (``status``
+still ``queued``), which is atomic on every backend, so any number of
+workers can poll the same table. The importer's progress callback writes the
+running counts and a heartbeat after every batch; a running job whose
+heartbeat is older than IMPORT_JOB_STALE_SECONDS (its worker died) is queued
+again, up to IMPORT_JOB_MAX_ATTEMPTS. Re-running a job is safe because the
+importer skips rows whose natural key already exists.
+
+Each batch is its own short transaction, and IMPORT_JOB_BATCH_PAUSE_SECONDS
+can leave gaps between them so web requests writing to the same database
+(SQLite especially) are not queued behind the import.
+"""
+import csv
+import logging
+import os
+import socket
+import time
+import uuid
+from datetime import timedelta
+
+from django.conf import settings
+from django.db.models import F
+from django.utils import timezone
+
+from . import importer
+from .models import ImportJob
+
+logger = logging.getLogger(__name__)
+
+COPY_CHUNK_SIZE = 1 << 20
+
+
+def enqueue(upload):
+    """Store an uploaded file and queue its import; returns the ImportJob."""
+    os.makedirs(settings.IMPORT_UPLOAD_DIR, exist_ok=True)
+    path = os.path.join(settings.IMPORT_UPLOAD_DIR, f"{uuid.uuid4().hex}.csv")
+    with open(path, "wb") as fh:
+        for chunk in upload.chunks(COPY_CHUNK_SIZE):
+            fh.write(chunk)
+    return ImportJob.objects.create(source=os.path.basename(upload.name)[:255], path=path, size_bytes=upload.size)
+
+
+def worker_name():
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+def requeue_stale(now=None):
+    """Give jobs whose worker stopped sending heartbeats back to the queue (or fail them)."""
+    now = now or timezone.now()
+    stale = ImportJob.objects.filter(
+        status=ImportJob.Status.RUNNING,
+        heartbeat_at__lt=now - timedelta(seconds=settings.IMPORT_JOB_STALE_SECONDS),
+    )
+    failed = stale.filter(attempts__gte=settings.IMPORT_JOB_MAX_ATTEMPTS).update(
+        status=ImportJob.Status.FAILED, finished_at=now, error="Worker stopped responding",
+    )
+    requeued = stale.update(status=ImportJob.Status.QUEUED, worker="")
+    return requeued, failed
+
+
+def claim(worker=None, now=None):
+    """Take the oldest queued job for ``worker``; None when the queue is empty."""
+    now = now or timezone.now()
+    requeue_stale(now)
+    candidates = ImportJob.objects.filter(status=ImportJob.Status.QUEUED).order_by("created_at", "pk")
+    for job_id in candidates.values_list("pk", flat=True)[:10]:
+        claimed = ImportJob.objects.filter(pk=job_id, status=ImportJob.Status.QUEUED).update(
+            status=ImportJob.Status.RUNNING,
+            worker=worker or worker_name(),
+            attempts=F("attempts") + 1,
+            started_at=now,
+            heartbeat_at=now,
+            finished_at=None,
+        )
+        if claimed:  # another worker may have won the race for this one
+            return ImportJob.objects.get(pk=job_id)
+    return None
+
+
+def _count_rows(path):
+    with open(path, newline="", encoding="utf-8-sig") as fh:
+        return sum(1 for _ in csv.DictReader(fh))
+
+
+def _counts(result):
+    return dict(
+        processed=result.processed,
+        inserted=result.inserted,
+        duplicates=result.duplicates,
+        failed=result.failed,
+        errors=[{"line": line, "message": message} for line, message in result.errors],
+    )
+
+
+def process(job):
+    """Run a claimed job to completion, recording progress as it goes."""
+    def progress(result):
+        ImportJob.objects.filter(pk=job.pk).update(heartbeat_at=timezone.now(), **_counts(result))
+        if settings.IMPORT_JOB_BATCH_PAUSE_SECONDS:
+            time.sleep(settings.IMPORT_JOB_BATCH_PAUSE_SECONDS)
+
+    try:
+        job.total_rows = _count_rows(job.path)
+        ImportJob.objects.filter(pk=job.pk).update(total_rows=job.total_rows, heartbeat_at=timezone.now())
+        with open(job.path, newline="", encoding="utf-8-sig") as fh:
+            result = importer.import_rows(
+                importer.open_csv(fh), batch_size=settings.IMPORT_JOB_BATCH_SIZE, progress=progress,
+            )
+    except Exception as exc:  # recorded on the job; the worker moves on to the next one
+        logger.exception("Import job %s failed", job.pk)
+        ImportJob.objects.filter(pk=job.pk).update(
+            status=ImportJob.Status.FAILED, error=f"{exc.__class__.__name__}: {exc}", finished_at=timezone.now(),
+        )
+    else:
+        ImportJob.objects.filter(pk=job.pk).update(
+            status=ImportJob.Status.SUCCEEDED, finished_at=timezone.now(), **_counts(result),
+        )
+        try:
+            os.remove(job.path)
+        except OSError:
+            pass
+    job.refresh_from_db()
+    return job
+
+
+def run_worker(once=False, poll_interval=None, stdout=None):
+    """Process jobs until interrupted (or, with ``once``, until the queue is empty)."""
+    poll_interval = settings.IMPORT_JOB_POLL_SECONDS if poll_interval is None else poll_interval
+    worker = worker_name()
+    while True:
+        job = claim(worker)
+        if job is None:
+            if once:
+                return
+            time.sleep(poll_interval)
+            continue
+        if stdout:
+            stdout.write(f"Importing job {job.pk} ({job.source})")
+        job = process(job)
+        if stdout:
+            stdout.write(
+                f"Job {job.pk} {job.status}: {job.inserted} inserted, {job.duplicates} duplicates, "
+                f"{job.failed} failed" + (f" ({job.error})" if job.error else "")
+            )
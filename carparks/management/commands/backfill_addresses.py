@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+
+from carparks import addresses
+
+
+class Command(BaseCommand):
+    help = "Fill block, street and town from the address of car parks saved before they were parsed."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=1000, help="Rows updated per transaction")
+        parser.add_argument("--all", action="store_true", help="Re-parse every row, not only unparsed ones")
+
+    def handle(self, *args, **options):
+        updated = addresses.backfill(
+            batch_size=options["batch_size"],
+            reparse=options["all"],
+            progress=lambda count: self.stdout.write(f"{count} rows updated"),
+        )
+        self.stdout.write(self.style.SUCCESS(f"Backfilled address components of {updated} car parks."))
@@ -0,0 +1,28 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from carparks import bootstrap
+
+
+class Command(BaseCommand):
+    help = "Load the car park CSV unless the same file (by content hash and row count) was already loaded."
+
+    def add_arguments(self, parser):
+        parser.add_argument("path", nargs="?", default=str(bootstrap.DEFAULT_CSV), help="CSV file to load")
+        parser.add_argument("--force", action="store_true", help="Load even if the fingerprint is unchanged")
+
+    def handle(self, *args, **options):
+        try:
+            outcome = bootstrap.bootstrap(options["path"], force=options["force"])
+        except (OSError, ValueError) as exc:
+            raise CommandError(f"Dataset bootstrap failed: {exc}") from exc
+        fp = outcome.fingerprint
+        if outcome.skipped:
+            self.stdout.write(f"Dataset unchanged ({fp.row_count} rows, sha256 {fp.sha256[:12]}); skipping load.")
+            return
+        result = outcome.import_result
+        for line, message in result.errors:
+            self.stderr.write(f"Skipped line {line}: {message}")
+        self.stdout.write(self.style.SUCCESS(
+            f"Loaded {fp.row_count} rows via {outcome.method}: {result.inserted} inserted, "
+            f"{result.duplicates} duplicates skipped, {result.failed} failed."
+        ))
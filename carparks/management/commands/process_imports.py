@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand
+
+from carparks import jobs
+
+
+class Command(BaseCommand):
+    help = "Run queued CSV import jobs (uploaded through /api/v1/carparks/imports/)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--once", action="store_true", help="Exit when the queue is empty instead of polling")
+        parser.add_argument("--poll-interval", type=float, default=None,
+                            help="Seconds between polls of an empty queue (default IMPORT_JOB_POLL_SECONDS)")
+
+    def handle(self, *args, **options):
+        try:
+            jobs.run_worker(once=options["once"], poll_interval=options["poll_interval"], stdout=self.stdout)
+        except KeyboardInterrupt:
+            self.stdout.write("Stopped.")
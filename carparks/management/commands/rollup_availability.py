@@ -0,0 +1,32 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from carparks import rollups
+
+
+class Command(BaseCommand):
+    help = "Roll availability samples up into 15-minute, hourly and daily buckets and apply retention."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--no-prune", action="store_true", help="Skip deleting data past its retention")
+        parser.add_argument("--interval", type=float, default=None,
+                            help="Keep running, every this many seconds (default: run once and exit)")
+
+    def handle(self, *args, **options):
+        try:
+            while True:
+                self._run(options["no_prune"])
+                if options["interval"] is None:
+                    return
+                time.sleep(options["interval"])
+        except KeyboardInterrupt:
+            self.stdout.write("Stopped.")
+
+    def _run(self, no_prune):
+        written = rollups.run(prune_expired=False)
+        for name, count in written.items():
+            self.stdout.write(f"{name}: {count} buckets written")
+        if not no_prune:
+            for name, count in rollups.prune().items():
+                self.stdout.write(f"{name}: {count} rows past retention deleted")
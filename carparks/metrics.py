@@ -0,0 +1,231 @@
+"""
+Prometheus-format metrics for the carparks API.
+
+Samples are written to per-thread shards, so recording a request never takes
+a lock: each thread only ever mutates its own dictionaries, and readers take
+a (GIL-atomic) copy of every shard when exposing metrics.
+
+Gunicorn runs several worker processes, each with its own memory. When
+METRICS_MULTIPROC_DIR is set, every process periodically dumps its merged
+snapshot to ``<dir>/metrics-<pid>-<token>.json`` (write to a temp file, then
+atomic rename) and ``/metrics`` sums all snapshot files. Files of exited
+workers are kept so counters stay monotonic; clear the directory when the
+whole server restarts, as with prometheus_client's multiprocess mode.
+"""
+import json
+import os
+import threading
+import time
+from bisect import bisect_left
+from uuid import uuid4
+
+from django.conf import settings
+from django.http import HttpResponse
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+QUERY_BUCKETS = (0, 1, 2, 3, 5, 10, 25, 50, 100)
+
+# name -> (type, help, buckets or None)
+METRICS = {
+    "carpark_http_requests_total": (
+        "counter", "Requests served, by route, method and status.", None),
+    "carpark_http_request_duration_seconds": (
+        "histogram", "Request latency in seconds, by route and method.", LATENCY_BUCKETS),
+    "carpark_http_response_size_bytes": (
+        "histogram", "Response body size in bytes, by route.", SIZE_BUCKETS),
+    "carpark_db_queries_per_request": (
+        "histogram", "SQL queries executed per request, by route.", QUERY_BUCKETS),
+    "carpark_cache_requests_total": (
+        "counter", "Cache lookups, by cache and result (hit/miss).", None),
+}
+
+
+class _Shard:
+    __slots__ = ("counters", "histograms")
+
+    def __init__(self):
+        self.counters = {}
+        self.histograms = {}
+
+
+_local = threading.local()
+_shards = []
+_shards_lock = threading.Lock()  # taken once per thread, when its shard is created
+_flush_lock = threading.Lock()
+_next_flush = 0.0
+_process_token = uuid4().hex[:8]
+
+
+def _shard():
+    try:
+        return _local.shard
+    except AttributeError:
+        shard = _local.shard = _Shard()
+        with _shards_lock:
+            _shards.append(shard)
+        return shard
+
+
+def inc(name, labels, value=1):
+    """Add ``value`` to a counter; ``labels`` is a tuple of (key, value) pairs."""
+    counters = _shard().counters
+    key = (name, labels)
+    counters[key] = counters.get(key, 0) + value
+
+
+def observe(name, labels, value):
+    """Record ``value`` in a histogram declared in METRICS."""
+    histograms = _shard().histograms
+    key = (name, labels)
+    buckets = METRICS[name][2]
+    state = histograms.get(key)
+    if state is None:
+        # one slot per bucket, +Inf, then sum and count
+        state = histograms[key] = [0] * (len(buckets) + 1) + [0.0, 0]
+    state[bisect_left(buckets, value)] += 1
+    state[-2] += value
+    state[-1] += 1
+
+
+def record_cache_access(cache_name, hit):
+    inc("carpark_cache_requests_total", (("cache", cache_name), ("result", "hit" if hit else "miss")))
+
+
+def record_request(route, method, status_code, duration, size, queries):
+    inc("carpark_http_requests_total", (("route", route), ("method", method), ("status", str(status_code))))
+    observe("carpark_http_request_duration_seconds", (("route", route), ("method", method)), duration)
+    if size is not None:
+        observe("carpark_http_response_size_bytes", (("route", route),), size)
+    observe("carpark_db_queries_per_request", (("route", route),), queries)
+    maybe_flush()
+
+
+def _merge_into(counters, histograms, shard_counters, shard_histograms):
+    for key, value in shard_counters.items():
+        counters[key] = counters.get(key, 0) + value
+    for key, state in shard_histograms.items():
+        total = histograms.get(key)
+        if total is None:
+            histograms[key] = list(state)
+        else:
+            for i, value in enumerate(state):
+                total[i] += value
+
+
+def local_snapshot():
+    """Merge all thread shards of this process."""
+    counters, histograms = {}, {}
+    for shard in list(_shards):
+        _merge_into(counters, histograms, shard.counters.copy(),
+                    {key: list(state) for key, state in shard.histograms.copy().items()})
+    return counters, histograms
+
+
+def _multiproc_dir():
+    return getattr(settings, "METRICS_MULTIPROC_DIR", None)
+
+
+def flush():
+    """Write this process's snapshot to METRICS_MULTIPROC_DIR (no-op when unset)."""
+    directory = _multiproc_dir()
+    if not directory:
+        return
+    counters, histograms = local_snapshot()
+    payload = {
+        "counters": [[name, labels, value] for (name, labels), value in counters.items()],
+        "histograms": [[name, labels, state] for (name, labels), state in histograms.items()],
+    }
+    path = os.path.join(directory, f"metrics-{os.getpid()}-{_process_token}.json")
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w") as fh:
+        json.dump(payload, fh, separators=(",", ":"))
+    os.replace(tmp_path, path)
+
+
+def maybe_flush():
+    """Flush at most every METRICS_FLUSH_SECONDS; never blocks a request."""
+    global _next_flush
+    if not _multiproc_dir() or time.monotonic() < _next_flush:
+        return
+    if not _flush_lock.acquire(blocking=False):
+        return
+    try:
+        _next_flush = time.monotonic() + settings.METRICS_FLUSH_SECONDS
+        flush()
+    finally:
+        _flush_lock.release()
+
+
+def collect():
+    """Aggregate samples of every worker process (or just this one)."""
+    directory = _multiproc_dir()
+    if not directory:
+        return local_snapshot()
+    flush()
+    counters, histograms = {}, {}
+    for filename in sorted(os.listdir(directory)):
+        if not (filename.startswith("metrics-") and filename.endswith(".json")):
+            continue
+        try:
+            with open(os.path.join(directory, filename)) as fh:
+                payload = json.load(fh)
+        except (OSError, ValueError):
+            continue  # being replaced or truncated; picked up on the next scrape
+        _merge_into(
+            counters,
+            histograms,
+            {(name, tuple(map(tuple, labels))): value for name, labels, value in payload["counters"]},
+            {(name, tuple(map(tuple, labels))): state for name, labels, state in payload["histograms"]},
+        )
+    return counters, histograms
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(labels):
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{key}="{_escape(value)}"' for key, value in labels) + "}"
+
+
+def _number(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+def render(counters, histograms):
+    lines = []
+    for name, (kind, help_text, buckets) in METRICS.items():
+        lines.append(f"# HELP {name} {help_text}")
+        lines.append(f"# TYPE {name} {kind}")
+        if kind == "counter":
+            for (metric, labels), value in sorted(counters.items()):
+                if metric == name:
+                    lines.append(f"{name}{_labels(labels)} {_number(value)}")
+            continue
+        for (metric, labels), state in sorted(histograms.items()):
+            if metric != name:
+                continue
+            cumulative = 0
+            for bound, count in zip((*buckets, "+Inf"), state[:-2]):
+                cumulative += count
+                le = bound if bound == "+Inf" else _number(bound)
+                lines.append(f"{name}_bucket{_labels(labels + (('le', le),))} {cumulative}")
+            lines.append(f"{name}_sum{_labels(labels)} {_number(state[-2])}")
+            lines.append(f"{name}_count{_labels(labels)} {state[-1]}")
+    return "\n".join(lines) + "\n"
+
+
+def metrics_view(request):
+    return HttpResponse(render(*collect()), content_type=CONTENT_TYPE)
+
+
+def reset():
+    """Drop all samples recorded by this process (used by tests)."""
+    for shard in list(_shards):
+        shard.counters.clear()
+        shard.histograms.clear()
@@ -0,0 +1,210 @@
+"""
+Request-level performance instrumentation for the carparks API.
+
+``MetricsMiddleware`` feeds the Prometheus counters and histograms in
+``carparks.metrics`` for every request (METRICS_ENABLED, on by default).
+
+``RequestTimingMiddleware`` records, for every request routed to
+``carparks.views``, the number of SQL queries, time spent in SQL, time in
+the view, time spent rendering the response body and the total. The figures
+are emitted as a ``Server-Timing`` header and a structured log line on the
+``carparks.perf`` logger.
+
+Enabled with PERF_INSTRUMENTATION=true; when disabled the middleware raises
+MiddlewareNotUsed so Django drops it from the chain entirely.
+
+``RateLimitHeadersMiddleware`` copies the rate limit state computed by
+``carparks.throttling`` onto the response as ``RateLimit-*`` headers
+(API_THROTTLE_ENABLED).
+
+``ProfilingMiddleware`` profiles requests on demand for staff users, or a
+random PROFILE_SAMPLE_RATE fraction of all requests (``carparks.profiling``).
+"""
+import json
+import logging
+import random
+import time
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from django.http import HttpResponse
+
+from carparks import metrics, profiling
+
+logger = logging.getLogger("carparks.perf")
+
+INSTRUMENTED_MODULES = ("carparks.views",)
+
+
+class RequestTimings:
+    """Per-request accumulator filled by the SQL wrapper and middleware hooks."""
+
+    __slots__ = ("sql_count", "sql_time", "view_start", "view_end", "render_start", "render_end", "view_name")
+
+    def __init__(self):
+        self.sql_count = 0
+        self.sql_time = 0.0
+        self.view_start = None
+        self.view_end = None
+        self.render_start = None
+        self.render_end = None
+        self.view_name = None
+
+    def __call__(self, execute, sql, params, many, context):
+        # Signature required by connection.execute_wrapper()
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.sql_time += time.perf_counter() - start
+            self.sql_count += 1
+
+    def mark_view_end(self):
+        if self.view_end is None:
+            self.view_end = time.perf_counter()
+
+    def mark_render_end(self, response):
+        self.render_end = time.perf_counter()
+
+
+def _ms(seconds):
+    return round(seconds * 1000, 2)
+
+
+class RequestTimingMiddleware:
+    def __init__(self, get_response):
+        if not getattr(settings, "PERF_INSTRUMENTATION_ENABLED", False):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        timings = RequestTimings()
+        request.perf_timings = timings
+        start = time.perf_counter()
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(timings))
+            response = self.get_response(request)
+        total = time.perf_counter() - start
+
+        if timings.view_start is None:
+            return response
+        timings.mark_view_end()
+        record = {
+            "view": timings.view_name,
+            "method": request.method,
+            "path": request.path,
+            "status": response.status_code,
+            "sql_queries": timings.sql_count,
+            "sql_ms": _ms(timings.sql_time),
+            "view_ms": _ms(timings.view_end - timings.view_start),
+            "render_ms": _ms(timings.render_end - timings.render_start) if timings.render_end else 0.0,
+            "total_ms": _ms(total),
+        }
+        response["Server-Timing"] = ", ".join([
+            f'sql;dur={record["sql_ms"]};desc="{record["sql_queries"]} queries"',
+            f'view;dur={record["view_ms"]}',
+            f'render;dur={record["render_ms"]};desc="serialisation"',
+            f'total;dur={record["total_ms"]}',
+        ])
+        logger.info("request_timing %s", json.dumps(record, separators=(",", ":")))
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        if view_func.__module__ in INSTRUMENTED_MODULES:
+            timings = request.perf_timings
+            timings.view_name = getattr(view_func, "view_class", view_func).__name__
+            timings.view_start = time.perf_counter()
+        return None
+
+    def process_template_response(self, request, response):
+        # DRF responses are rendered after this hook; time it via a post-render callback
+        timings = request.perf_timings
+        if timings.view_start is not None:
+            timings.mark_view_end()
+            timings.render_start = time.perf_counter()
+            response.add_post_render_callback(timings.mark_render_end)
+        return response
+
+
+class _QueryCounter:
+    __slots__ = ("count",)
+
+    def __init__(self):
+        self.count = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        self.count += 1
+        return execute(sql, params, many, context)
+
+
+class MetricsMiddleware:
+    def __init__(self, get_response):
+        if not getattr(settings, "METRICS_ENABLED", False):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        counter = _QueryCounter()
+        start = time.perf_counter()
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(counter))
+            response = self.get_response(request)
+        duration = time.perf_counter() - start
+
+        match = request.resolver_match
+        route = match.route if match is not None else "<unmatched>"
+        if response.has_header("Content-Length"):
+            size = int(response["Content-Length"])
+        elif response.streaming:
+            size = None
+        else:
+            size = len(response.content)
+        metrics.record_request(route, request.method, response.status_code, duration, size, counter.count)
+        return response
+
+
+class RateLimitHeadersMiddleware:
+    def __init__(self, get_response):
+        if not getattr(settings, "API_THROTTLE_ENABLED", False):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        response = self.get_response(request)
+        ratelimit = getattr(request, "ratelimit", None)
+        if ratelimit is not None:
+            for name, value in ratelimit.headers().items():
+                response[name] = value
+        return response
+
+
+class ProfilingMiddleware:
+    def __init__(self, get_response):
+        if not getattr(settings, "PROFILING_ENABLED", False):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        mode, fmt = profiling.pop_request_options(request)
+        if mode is not None and not profiling.is_staff(request):
+            mode = None
+        if mode is None:
+            rate = settings.PROFILE_SAMPLE_RATE
+            if not rate or random.random() >= rate:
+                return self.get_response(request)
+            mode, fmt = "sample", None
+
+        response, profile = profiling.run(mode, lambda: self.get_response(request))
+        profile.request = {"method": request.method, "path": request.path, "status": response.status_code}
+        profile.save()
+        logger.info("request_profile %s", json.dumps(
+            {key: value for key, value in profile.summary().items() if key != "sql"}, separators=(",", ":")
+        ))
+        if fmt is not None:
+            response = HttpResponse(profile.artifact(fmt) or b"", content_type=profiling.FORMATS[fmt])
+        response["X-Profile-Id"] = profile.id
+        return response
@@ -0,0 +1,30 @@
+# Generated by Django 5.2.18 on 2026-10-19 14:15
+
+import django.db.models.functions.text
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('carparks', '0005_alter_carpark_options_carpark_created_at_and_more'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='carpark',
+            index=models.Index(django.db.models.functions.text.Upper('car_park_type'), models.F('gantry_height'), name='carpark_type_height_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='carpark',
+            index=models.Index(django.db.models.functions.text.Upper('type_of_parking_system'), name='carpark_parking_system_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='carpark',
+            index=models.Index(fields=['gantry_height'], name='carpark_gantry_height_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='carpark',
+            index=models.Index(fields=['car_park_decks'], name='carpark_decks_idx'),
+        ),
+    ]
@@ -0,0 +1,35 @@
+# Generated by Django 5.2.18 on 2026-10-19 14:25
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('carparks', '0006_carpark_filter_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CarParkTombstone',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('carpark_id', models.BigIntegerField(help_text='Primary key the deleted car park had')),
+                ('car_park_no', models.CharField(help_text='Car park number the deleted car park had', max_length=100)),
+                ('deleted_at', models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+            options={
+                'verbose_name': 'Car Park Tombstone',
+                'verbose_name_plural': 'Car Park Tombstones',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='carpark',
+            index=models.Index(fields=['updated_at', 'id'], name='carpark_updated_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='carparktombstone',
+            index=models.Index(fields=['deleted_at', 'carpark_id'], name='tombstone_deleted_idx'),
+        ),
+    ]
@@ -0,0 +1,47 @@
+# Generated by Django 5.2.18 on 2026-10-19 14:29
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('carparks', '0007_changes_feed'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AvailabilitySample',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('lot_type', models.CharField(choices=[('C', 'Car'), ('Y', 'Motorcycle'), ('H', 'Heavy vehicle')], default='C', max_length=1)),
+                ('total_lots', models.PositiveIntegerField()),
+                ('available_lots', models.PositiveIntegerField()),
+                ('observed_at', models.DateTimeField()),
+                ('carpark', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='availability_samples', to='carparks.carpark')),
+            ],
+            options={
+                'verbose_name': 'Availability Sample',
+                'verbose_name_plural': 'Availability Samples',
+                'indexes': [models.Index(fields=['observed_at'], name='availability_observed_idx')],
+                'constraints': [models.UniqueConstraint(fields=('carpark', 'lot_type', 'observed_at'), name='availability_sample_unique')],
+            },
+        ),
+        migrations.CreateModel(
+            name='CarParkAvailability',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('lot_type', models.CharField(choices=[('C', 'Car'), ('Y', 'Motorcycle'), ('H', 'Heavy vehicle')], default='C', max_length=1)),
+                ('total_lots', models.PositiveIntegerField()),
+                ('available_lots', models.PositiveIntegerField()),
+                ('observed_at', models.DateTimeField()),
+                ('carpark', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='availability', to='carparks.carpark')),
+            ],
+            options={
+                'verbose_name': 'Car Park Availability',
+                'verbose_name_plural': 'Car Park Availability',
+                'constraints': [models.UniqueConstraint(fields=('carpark', 'lot_type'), name='availability_latest_unique')],
+            },
+        ),
+    ]
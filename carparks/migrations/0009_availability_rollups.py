@@ -0,0 +1,35 @@
+# Generated by Django 5.2.18 on 2026-10-19 14:31
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('carparks', '0008_availability'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AvailabilityRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('lot_type', models.CharField(choices=[('C', 'Car'), ('Y', 'Motorcycle'), ('H', 'Heavy vehicle')], default='C', max_length=1)),
+                ('resolution', models.CharField(choices=[('15m', '15 minutes'), ('1h', '1 hour'), ('1d', '1 day')], max_length=3)),
+                ('bucket_start', models.DateTimeField()),
+                ('samples', models.PositiveIntegerField()),
+                ('sum_available', models.BigIntegerField()),
+                ('min_available', models.PositiveIntegerField()),
+                ('max_available', models.PositiveIntegerField()),
+                ('total_lots', models.PositiveIntegerField()),
+                ('carpark', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='availability_rollups', to='carparks.carpark')),
+            ],
+            options={
+                'verbose_name': 'Availability Rollup',
+                'verbose_name_plural': 'Availability Rollups',
+                'indexes': [models.Index(fields=['resolution', 'bucket_start'], name='availability_rollup_bucket_idx')],
+                'constraints': [models.UniqueConstraint(fields=('carpark', 'lot_type', 'resolution', 'bucket_start'), name='availability_rollup_unique')],
+            },
+        ),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 5.2.18 on 2026-10-19 14:35
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('carparks', '0009_availability_rollups'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DatasetLoad',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('source', models.CharField(max_length=255, unique=True)),
+                ('sha256', models.CharField(max_length=64)),
+                ('row_count', models.PositiveIntegerField()),
+                ('inserted', models.PositiveIntegerField(default=0)),
+                ('duplicates', models.PositiveIntegerField(default=0)),
+                ('failed', models.PositiveIntegerField(default=0)),
+                ('loaded_at', models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+            options={
+                'verbose_name': 'Dataset Load',
+                'verbose_name_plural': 'Dataset Loads',
+            },
+        ),
+    ]
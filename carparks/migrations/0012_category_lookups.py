@@ -0,0 +1,69 @@
+# Categorical CarPark columns move into lookup tables in three steps (schema,
+# data, schema) so Postgres never alters a table with pending FK checks.
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+CATEGORIES = [
+    ("car_park_type", "CarParkType", 150),
+    ("type_of_parking_system", "ParkingSystem", 150),
+    ("short_term_parking", "ShortTermParking", 100),
+    ("free_parking", "FreeParking", 100),
+]
+
+
+def _lookup_model(name):
+    return migrations.CreateModel(
+        name=name,
+        fields=[
+            ('id', models.SmallAutoField(primary_key=True, serialize=False)),
+            ('name', models.CharField(max_length=150, unique=True)),
+        ],
+        options={
+            'ordering': ['name'],
+            'abstract': False,
+        },
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('carparks', '0011_import_jobs'),
+    ]
+
+    operations = [
+        *(_lookup_model(model) for _, model, _ in CATEGORIES),
+        migrations.AlterUniqueTogether(
+            name='carpark',
+            unique_together=set(),
+        ),
+        migrations.RemoveIndex(
+            model_name='carpark',
+            name='carpark_type_height_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='carpark',
+            name='carpark_parking_system_idx',
+        ),
+        # Nullable for now, so the text columns can be restored when migrating back
+        *(
+            migrations.AlterField(
+                model_name='carpark',
+                name=field,
+                field=models.CharField(max_length=max_length, null=True),
+            )
+            for field, _, max_length in CATEGORIES
+        ),
+        *(
+            migrations.AddField(
+                model_name='carpark',
+                name=f'{field}_ref',
+                field=models.ForeignKey(
+                    db_index=False, null=True, on_delete=django.db.models.deletion.PROTECT,
+                    related_name='+', to=f'carparks.{model.lower()}',
+                ),
+            )
+            for field, model, _ in CATEGORIES
+        ),
+    ]
@@ -0,0 +1,38 @@
+from django.db import migrations
+
+CATEGORIES = [
+    ("car_park_type", "CarParkType"),
+    ("type_of_parking_system", "ParkingSystem"),
+    ("short_term_parking", "ShortTermParking"),
+    ("free_parking", "FreeParking"),
+]
+
+
+def fill_lookups(apps, schema_editor):
+    """One lookup row per distinct value, then one UPDATE per value."""
+    CarPark = apps.get_model("carparks", "CarPark")
+    for field, model_name in CATEGORIES:
+        Lookup = apps.get_model("carparks", model_name)
+        names = CarPark.objects.order_by().values_list(field, flat=True).distinct()
+        for name in list(names):
+            lookup = Lookup.objects.create(name=name)
+            CarPark.objects.filter(**{field: name}).update(**{f"{field}_ref": lookup})
+
+
+def restore_text(apps, schema_editor):
+    CarPark = apps.get_model("carparks", "CarPark")
+    for field, model_name in CATEGORIES:
+        Lookup = apps.get_model("carparks", model_name)
+        for lookup in Lookup.objects.all():
+            CarPark.objects.filter(**{f"{field}_ref": lookup}).update(**{field: lookup.name})
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('carparks', '0012_category_lookups'),
+    ]
+
+    operations = [
+        migrations.RunPython(fill_lookups, restore_text),
+    ]
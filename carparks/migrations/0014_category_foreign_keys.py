@@ -0,0 +1,47 @@
+import django.db.models.deletion
+from django.db import migrations, models
+
+CATEGORY_FIELDS = ["car_park_type", "type_of_parking_system", "short_term_parking", "free_parking"]
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('carparks', '0013_fill_category_lookups'),
+    ]
+
+    operations = [
+        *(migrations.RemoveField(model_name='carpark', name=field) for field in CATEGORY_FIELDS),
+        *(
+            migrations.RenameField(model_name='carpark', old_name=f'{field}_ref', new_name=field)
+            for field in CATEGORY_FIELDS
+        ),
+        migrations.AlterField(
+            model_name='carpark',
+            name='car_park_type',
+            field=models.ForeignKey(db_index=False, help_text='Type of car park (e.g., SURFACE CAR PARK, MULTI-STOREY CAR PARK)', on_delete=django.db.models.deletion.PROTECT, related_name='car_parks', to='carparks.carparktype'),
+        ),
+        migrations.AlterField(
+            model_name='carpark',
+            name='type_of_parking_system',
+            field=models.ForeignKey(help_text='Type of parking system used', on_delete=django.db.models.deletion.PROTECT, related_name='car_parks', to='carparks.parkingsystem'),
+        ),
+        migrations.AlterField(
+            model_name='carpark',
+            name='short_term_parking',
+            field=models.ForeignKey(help_text='Short term parking availability (e.g., WHOLE DAY, 7AM-7PM, NO)', on_delete=django.db.models.deletion.PROTECT, related_name='car_parks', to='carparks.shorttermparking'),
+        ),
+        migrations.AlterField(
+            model_name='carpark',
+            name='free_parking',
+            field=models.ForeignKey(help_text='Free parking availability (e.g., NO, SUN & PH FR 7AM-10.30PM)', on_delete=django.db.models.deletion.PROTECT, related_name='car_parks', to='carparks.freeparking'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='carpark',
+            unique_together={('car_park_no', 'address', 'car_park_type', 'gantry_height', 'type_of_parking_system')},
+        ),
+        migrations.AddIndex(
+            model_name='carpark',
+            index=models.Index(fields=['car_park_type', 'gantry_height'], name='carpark_type_height_idx'),
+        ),
+    ]
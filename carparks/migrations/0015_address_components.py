@@ -0,0 +1,42 @@
+# Generated by Django 5.2.18 on 2026-10-19 14:59
+# Existing rows get their components from manage.py backfill_addresses, in
+# batches, rather than here in one long transaction.
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('carparks', '0014_category_foreign_keys'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Town',
+            fields=[
+                ('id', models.SmallAutoField(primary_key=True, serialize=False)),
+                ('name', models.CharField(max_length=150, unique=True)),
+            ],
+            options={
+                'ordering': ['name'],
+                'abstract': False,
+            },
+        ),
+        migrations.AddField(
+            model_name='carpark',
+            name='block',
+            field=models.CharField(blank=True, default='', help_text='Block number(s) from the address (e.g., 98A, 301-302)', max_length=100),
+        ),
+        migrations.AddField(
+            model_name='carpark',
+            name='street',
+            field=models.CharField(blank=True, default='', help_text='Street from the address, without the block', max_length=255),
+        ),
+        migrations.AddField(
+            model_name='carpark',
+            name='town',
+            field=models.ForeignKey(blank=True, help_text='HDB town or area derived from the address', null=True, on_delete=django.db.models.deletion.PROTECT, related_name='car_parks', to='carparks.town'),
+        ),
+    ]
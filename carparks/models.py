@@ -1,7 +1,70 @@
-from django.db import models
+from django.db import models, transaction
+from django.utils import timezone
 from django.core.validators import MinValueValidator, MaxValueValidator
 
 
+class CategoryLookup(models.Model):
+    """
+    One distinct value of a categorical CarPark field. Car parks reference
+    these rows by a small integer key instead of repeating the text (see
+    ``carparks.categories``); the API still reads and writes the names.
+    """
+
+    id = models.SmallAutoField(primary_key=True)  # keeps the referencing columns small too
+    name = models.CharField(max_length=150, unique=True)
+
+    class Meta:
+        abstract = True
+        ordering = ["name"]
+
+    def __str__(self):
+        return self.name
+
+
+class CarParkType(CategoryLookup):
+    """e.g. SURFACE CAR PARK, MULTI-STOREY CAR PARK."""
+
+
+class ParkingSystem(CategoryLookup):
+    """e.g. ELECTRONIC PARKING, COUPON PARKING."""
+
+
+class ShortTermParking(CategoryLookup):
+    """e.g. WHOLE DAY, 7AM-7PM, NO."""
+
+
+class FreeParking(CategoryLookup):
+    """e.g. NO, SUN & PH FR 7AM-10.30PM."""
+
+
+class Town(CategoryLookup):
+    """e.g. ANG MO KIO, TOA PAYOH; derived from the address (see ``carparks.addresses``)."""
+
+
+class CarParkQuerySet(models.QuerySet):
+    def delete(self):
+        """Delete as usual, writing the rows' tombstones in one batch (see ``signals``)."""
+        from .signals import batched_tombstones
+
+        with transaction.atomic(using=self.db, savepoint=False), batched_tombstones():
+            return super().delete()
+
+
+class CarParkManager(models.Manager):
+    def get_queryset(self):
+        # Serialising a car park needs the names of its categories; join them up front
+        return CarParkQuerySet(self.model, using=self._db).select_related(*CarPark.CATEGORY_FIELDS, "town")
+
+    def create_with_names(self, **fields):
+        """``create()`` taking categorical fields by name, adding names not seen before."""
+        from .categories import resolve
+
+        for name in CarPark.CATEGORY_FIELDS:
+            if name in fields and not isinstance(fields[name], CategoryLookup):
+                fields[name] = resolve(name, fields[name])
+        return self.create(**fields)
+
+
 class CarPark(models.Model):
     """
     Model representing a car park with all its attributes and features.
@@ -15,26 +78,56 @@ class CarPark(models.Model):
         max_length=255,
         help_text="Full address of the car park"
     )
+    # Parsed from address on save and import (see parse_address)
+    block = models.CharField(
+        max_length=100,
+        blank=True,
+        default="",
+        help_text="Block number(s) from the address (e.g., 98A, 301-302)"
+    )
+    street = models.CharField(
+        max_length=255,
+        blank=True,
+        default="",
+        help_text="Street from the address, without the block"
+    )
+    town = models.ForeignKey(
+        Town,
+        on_delete=models.PROTECT,
+        related_name="car_parks",
+        null=True,
+        blank=True,
+        help_text="HDB town or area derived from the address"
+    )
     x_coord = models.FloatField(
         help_text="X coordinate of the car park location"
     )
     y_coord = models.FloatField(
         help_text="Y coordinate of the car park location"
     )
-    car_park_type = models.CharField(
-        max_length=150,
+    car_park_type = models.ForeignKey(
+        CarParkType,
+        on_delete=models.PROTECT,
+        related_name="car_parks",
+        db_index=False,  # carpark_type_height_idx leads with it
         help_text="Type of car park (e.g., SURFACE CAR PARK, MULTI-STOREY CAR PARK)"
     )
-    type_of_parking_system = models.CharField(
-        max_length=150,
+    type_of_parking_system = models.ForeignKey(
+        ParkingSystem,
+        on_delete=models.PROTECT,
+        related_name="car_parks",
         help_text="Type of parking system used"
     )
-    short_term_parking = models.CharField(
-        max_length=100,
+    short_term_parking = models.ForeignKey(
+        ShortTermParking,
+        on_delete=models.PROTECT,
+        related_name="car_parks",
         help_text="Short term parking availability (e.g., WHOLE DAY, 7AM-7PM, NO)"
     )
-    free_parking = models.CharField(
-        max_length=100,
+    free_parking = models.ForeignKey(
+        FreeParking,
+        on_delete=models.PROTECT,
+        related_name="car_parks",
         help_text="Free parking availability (e.g., NO, SUN & PH FR 7AM-10.30PM)"
     )
     night_parking = models.BooleanField(
@@ -57,21 +150,246 @@ class CarPark(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    # Fields stored as keys into a CategoryLookup table
+    CATEGORY_FIELDS = ("car_park_type", "type_of_parking_system", "short_term_parking", "free_parking")
+
+    objects = CarParkManager()
+
     class Meta:
         unique_together = ("car_park_no", "address", "car_park_type", "gantry_height", "type_of_parking_system")
         ordering = ["address", "car_park_no"]
+        indexes = [
+            # Type filters resolve the (tiny) lookup table, then probe by key
+            models.Index(fields=["car_park_type", "gantry_height"], name="carpark_type_height_idx"),
+            models.Index(fields=["gantry_height"], name="carpark_gantry_height_idx"),
+            models.Index(fields=["car_park_decks"], name="carpark_decks_idx"),
+            # Keyset pagination of the changes feed: (updated_at, id) > token
+            models.Index(fields=["updated_at", "id"], name="carpark_updated_idx"),
+        ]
         verbose_name = "Car Park"
         verbose_name_plural = "Car Parks"
 
     def __str__(self):
         return f"Car Park {self.car_park_no} at {self.address} ({self.car_park_type})"
+
+    def save(self, *args, **kwargs):
+        update_fields = kwargs.get("update_fields")
+        if update_fields is None or "address" in update_fields:
+            self.parse_address()
+            if update_fields is not None:
+                kwargs["update_fields"] = {*update_fields, "block", "street", "town"}
+        super().save(*args, **kwargs)
+
+    def parse_address(self, keys=None):
+        """
+        Fill block, street and town from the address. ``keys`` (a
+        CategoryKeys) resolves the town without a query per row in bulk writes.
+        """
+        from .addresses import parse
+        from .categories import resolve
+
+        block, street, town = parse(self.address)
+        self.block = block[:self._meta.get_field("block").max_length]
+        self.street = street[:self._meta.get_field("street").max_length]
+        if town is None:
+            self.town = None
+        elif keys is not None:
+            self.town_id = keys.key("town", town)
+        elif self.town_id is None or self.town.name != town:
+            self.town = resolve("town", town)
     
     @property
     def has_free_parking(self):
         """Returns True if the car park offers any free parking."""
-        return self.free_parking.upper() not in ["NO", "FALSE"]
+        return self.free_parking.name.upper() not in ["NO", "FALSE"]
     
     @property
     def location(self):
         """Returns the coordinates as a tuple."""
         return (self.x_coord, self.y_coord)
+
+
+class CarParkTombstone(models.Model):
+    """
+    Record of a deleted car park, so the changes feed can tell clients
+    keeping a local mirror to drop it.
+    """
+
+    carpark_id = models.BigIntegerField(
+        help_text="Primary key the deleted car park had"
+    )
+    car_park_no = models.CharField(
+        max_length=100,
+        help_text="Car park number the deleted car park had"
+    )
+    deleted_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["deleted_at", "carpark_id"], name="tombstone_deleted_idx"),
+        ]
+        verbose_name = "Car Park Tombstone"
+        verbose_name_plural = "Car Park Tombstones"
+
+    def __str__(self):
+        return f"Deleted car park {self.car_park_no} (id {self.carpark_id})"
+
+
+class LotType(models.TextChoices):
+    CAR = "C", "Car"
+    MOTORCYCLE = "Y", "Motorcycle"
+    HEAVY_VEHICLE = "H", "Heavy vehicle"
+
+
+class AvailabilitySample(models.Model):
+    """
+    One observation of free lots at a car park. Append-only time series,
+    kept apart from CarPark so minute-by-minute updates never touch (or
+    invalidate caches of) the static car park rows.
+    """
+
+    carpark = models.ForeignKey(CarPark, on_delete=models.CASCADE, related_name="availability_samples")
+    lot_type = models.CharField(max_length=1, choices=LotType.choices, default=LotType.CAR)
+    total_lots = models.PositiveIntegerField()
+    available_lots = models.PositiveIntegerField()
+    observed_at = models.DateTimeField()
+
+    class Meta:
+        constraints = [
+            # Re-posting a snapshot is a no-op
+            models.UniqueConstraint(fields=["carpark", "lot_type", "observed_at"], name="availability_sample_unique"),
+        ]
+        indexes = [
+            models.Index(fields=["observed_at"], name="availability_observed_idx"),
+        ]
+        verbose_name = "Availability Sample"
+        verbose_name_plural = "Availability Samples"
+
+    def __str__(self):
+        return (f"{self.available_lots}/{self.total_lots} {self.lot_type} lots at car park {self.carpark_id} "
+                f"({self.observed_at})")
+
+
+class CarParkAvailability(models.Model):
+    """
+    Latest known availability per car park and lot type.
+    """
+
+    carpark = models.ForeignKey(CarPark, on_delete=models.CASCADE, related_name="availability")
+    lot_type = models.CharField(max_length=1, choices=LotType.choices, default=LotType.CAR)
+    total_lots = models.PositiveIntegerField()
+    available_lots = models.PositiveIntegerField()
+    observed_at = models.DateTimeField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["carpark", "lot_type"], name="availability_latest_unique"),
+        ]
+        verbose_name = "Car Park Availability"
+        verbose_name_plural = "Car Park Availability"
+
+    def __str__(self):
+        return f"{self.available_lots}/{self.total_lots} {self.lot_type} lots at car park {self.carpark_id}"
+
+
+class AvailabilityRollup(models.Model):
+    """
+    Availability aggregated over a fixed time bucket. ``sum_available`` and
+    ``samples`` (rather than an average) let coarser buckets be built exactly
+    from finer ones.
+    """
+
+    class Resolution(models.TextChoices):
+        QUARTER_HOUR = "15m", "15 minutes"
+        HOUR = "1h", "1 hour"
+        DAY = "1d", "1 day"
+
+    carpark = models.ForeignKey(CarPark, on_delete=models.CASCADE, related_name="availability_rollups")
+    lot_type = models.CharField(max_length=1, choices=LotType.choices, default=LotType.CAR)
+    resolution = models.CharField(max_length=3, choices=Resolution.choices)
+    bucket_start = models.DateTimeField()
+    samples = models.PositiveIntegerField()
+    sum_available = models.BigIntegerField()
+    min_available = models.PositiveIntegerField()
+    max_available = models.PositiveIntegerField()
+    total_lots = models.PositiveIntegerField()
+
+    class Meta:
+        constraints = [
+            # Also the index for one car park's history at one resolution
+            models.UniqueConstraint(
+                fields=["carpark", "lot_type", "resolution", "bucket_start"], name="availability_rollup_unique"
+            ),
+        ]
+        indexes = [
+            # Watermarks and retention pruning per resolution
+            models.Index(fields=["resolution", "bucket_start"], name="availability_rollup_bucket_idx"),
+        ]
+        verbose_name = "Availability Rollup"
+        verbose_name_plural = "Availability Rollups"
+
+    def __str__(self):
+        return f"{self.resolution} availability of car park {self.carpark_id} from {self.bucket_start}"
+
+
+class DatasetLoad(models.Model):
+    """
+    Fingerprint of the last CSV loaded from a source, so container starts
+    can skip re-importing an unchanged dataset (see ``carparks.bootstrap``).
+    """
+
+    source = models.CharField(max_length=255, unique=True)
+    sha256 = models.CharField(max_length=64)
+    row_count = models.PositiveIntegerField()
+    inserted = models.PositiveIntegerField(default=0)
+    duplicates = models.PositiveIntegerField(default=0)
+    failed = models.PositiveIntegerField(default=0)
+    loaded_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        verbose_name = "Dataset Load"
+        verbose_name_plural = "Dataset Loads"
+
+    def __str__(self):
+        return f"{self.source} ({self.row_count} rows, {self.sha256[:12]})"
+
+
+class ImportJob(models.Model):
+    """
+    A CSV upload waiting for, or being processed by, the import worker
+    (``manage.py process_imports``, see ``carparks.jobs``).
+    """
+
+    class Status(models.TextChoices):
+        QUEUED = "queued", "Queued"
+        RUNNING = "running", "Running"
+        SUCCEEDED = "succeeded", "Succeeded"
+        FAILED = "failed", "Failed"
+
+    status = models.CharField(max_length=10, choices=Status.choices, default=Status.QUEUED)
+    source = models.CharField(max_length=255)  # uploaded file name
+    path = models.CharField(max_length=500)  # stored upload, shared with the worker
+    size_bytes = models.BigIntegerField(default=0)
+    total_rows = models.PositiveIntegerField(null=True, blank=True)
+    processed = models.PositiveIntegerField(default=0)
+    inserted = models.PositiveIntegerField(default=0)
+    duplicates = models.PositiveIntegerField(default=0)
+    failed = models.PositiveIntegerField(default=0)
+    errors = models.JSONField(default=list, blank=True)  # [{"line", "message"}], capped
+    error = models.TextField(blank=True)  # why the whole job failed
+    attempts = models.PositiveSmallIntegerField(default=0)
+    worker = models.CharField(max_length=255, blank=True)
+    created_at = models.DateTimeField(default=timezone.now)
+    started_at = models.DateTimeField(null=True, blank=True)
+    heartbeat_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        verbose_name = "Import Job"
+        verbose_name_plural = "Import Jobs"
+        indexes = [
+            models.Index(fields=["status", "created_at"], name="import_job_queue_idx"),
+        ]
+
+    def __str__(self):
+        return f"Import {self.pk} of {self.source} ({self.status})"
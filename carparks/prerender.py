@@ -0,0 +1,172 @@
+"""
+Pre-rendered responses for the unfiltered list endpoints.
+
+The full carpark list and the ``types`` list are the same bytes for every
+caller until the dataset changes, so instead of serialising and encoding them
+per request they are rendered once per dataset version (see
+``carparks.dataset``) and negotiated format (JSON, or the bulk formats in
+``carparks.renderers``), compressed with gzip and, when the ``brotli``
+package is installed, brotli, and kept per worker.
+
+Requests are answered from those bytes directly: the encoding is negotiated
+from Accept-Encoding, and each representation carries its own strong ETag so
+conditional requests get a 304 without a body. Only requests without filtering
+query parameters or media type parameters (``; indent=4``) qualify, and the
+browsable API is never pre-rendered; everything else takes the normal DRF
+path.
+"""
+import gzip
+import hashlib
+import json
+
+from django.conf import settings
+from django.http import HttpResponse, HttpResponseNotModified
+from django.utils.cache import patch_vary_headers
+
+from . import dataset, singleflight
+from .metrics import record_cache_access
+
+try:
+    import brotli
+except ImportError:  # brotli is optional; gzip and identity are always available
+    brotli = None
+
+# Query parameters that only select a renderer and don't change the data
+RENDERER_PARAMS = {"format"}
+# Renderer formats whose output depends on nothing but the data
+FORMATS = {"json", "columns", "msgpack"}
+
+
+class PrerenderedResponse(HttpResponse):
+    """
+    A plain HttpResponse around pre-rendered bytes. For JSON payloads,
+    ``data`` decodes the body when accessed, for code that expects a DRF
+    Response.
+    """
+
+    def __init__(self, payload, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._payload = payload
+
+    @property
+    def data(self):
+        return json.loads(self._payload.encodings["identity"])
+
+
+class RenderedPayload:
+    def __init__(self, version, content_type, encodings):
+        self.version = version
+        self.content_type = content_type
+        # encoding ("identity", "br", "gzip") -> bytes
+        self.encodings = encodings
+        self.etag = hashlib.blake2b(encodings["identity"], digest_size=12).hexdigest()
+
+    @classmethod
+    def build(cls, version, data, renderer):
+        body = renderer.render(data, renderer.media_type, {})
+        content_type = renderer.media_type
+        if renderer.charset:
+            content_type = f"{content_type}; charset={renderer.charset}"
+        encodings = {"identity": body, "gzip": gzip.compress(body, compresslevel=settings.PRERENDER_GZIP_LEVEL, mtime=0)}
+        if brotli is not None:
+            encodings["br"] = brotli.compress(body, quality=settings.PRERENDER_BROTLI_QUALITY)
+        return cls(version, content_type, encodings)
+
+    def etag_for(self, encoding):
+        return f'"{self.etag}"' if encoding == "identity" else f'"{self.etag}-{encoding}"'
+
+    def matches(self, if_none_match):
+        """True when an If-None-Match header names any representation of this payload."""
+        if if_none_match.strip() == "*":
+            return True
+        for tag in if_none_match.split(","):
+            tag = tag.strip().removeprefix("W/").strip('"')
+            if tag.split("-", 1)[0] == self.etag:
+                return True
+        return False
+
+    def as_response(self, request):
+        encoding = choose_encoding(request.META.get("HTTP_ACCEPT_ENCODING", ""), self.encodings)
+        if_none_match = request.META.get("HTTP_IF_NONE_MATCH")
+        if if_none_match and self.matches(if_none_match):
+            response = HttpResponseNotModified()
+        else:
+            body = self.encodings[encoding]
+            response = PrerenderedResponse(self, body, content_type=self.content_type)
+            response["Content-Length"] = str(len(body))
+            if encoding != "identity":
+                response["Content-Encoding"] = encoding
+        response["ETag"] = self.etag_for(encoding)
+        patch_vary_headers(response, ["Accept", "Accept-Encoding"])
+        return response
+
+
+def choose_encoding(accept_encoding, available):
+    """Pick the best of ``available`` for an Accept-Encoding header (br > gzip > identity)."""
+    weights = {}
+    for item in accept_encoding.split(","):
+        coding, _, params = item.strip().partition(";")
+        coding = coding.strip().lower()
+        if not coding:
+            continue
+        quality = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                quality = float(params[2:])
+            except ValueError:
+                quality = 0.0
+        weights[coding] = quality
+    for coding in ("br", "gzip"):
+        if coding in available and weights.get(coding, weights.get("*", 0.0)) > 0:
+            return coding
+    return "identity"
+
+
+def enabled():
+    return getattr(settings, "PRERENDER_ENABLED", True)
+
+
+def can_serve(request):
+    """True when ``request`` asks for a plain, unfiltered rendering in one of FORMATS."""
+    renderer = getattr(request, "accepted_renderer", None)
+    return (
+        enabled()
+        and renderer is not None
+        and renderer.format in FORMATS
+        and ";" not in request.accepted_media_type
+        and set(request.query_params) <= RENDERER_PARAMS
+    )
+
+
+_payloads = {}
+
+
+def get_payload(name, build_data, renderer):
+    """
+    Return the payload ``name`` in ``renderer``'s format for the current
+    dataset version, rendering it from ``build_data()`` if needed. Concurrent
+    requests for a stale payload share one render (see
+    ``carparks.singleflight``).
+    """
+    version = dataset.current_version()
+    key = (name, renderer.format)
+    payload = _payloads.get(key)
+    if payload is not None and payload.version == version:
+        record_cache_access("prerender", True)
+        return payload
+    record_cache_access("prerender", False)
+
+    def build():
+        rendered = RenderedPayload.build(version, build_data(), renderer)
+        _payloads[key] = rendered
+        return rendered
+
+    if payload is not None and settings.CARPARK_STALE_WHILE_REVALIDATE:
+        return singleflight.coalesce(("prerender", *key, version), build, stale=payload)
+    return singleflight.coalesce(("prerender", *key, version), build)
+
+
+def reset():
+    """Drop every pre-rendered payload (used by tests)."""
+    _payloads.clear()
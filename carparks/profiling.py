@@ -0,0 +1,231 @@
+"""
+On-demand request profiling (see ``ProfilingMiddleware``).
+
+A request is profiled when a staff user asks for it, with an ``X-Profile``
+header or a ``_profile`` query parameter, or at random for a
+PROFILE_SAMPLE_RATE fraction of requests. Modes:
+
+* ``cprofile``: deterministic cProfile of the request, saved as pstats
+  (load with ``python -m pstats`` or snakeviz).
+* ``sample``: a background thread snapshots the request thread's stack every
+  PROFILE_SAMPLE_INTERVAL_MS and counts identical stacks, saved in collapsed
+  format (one ``frame;frame;frame count`` line per stack, ready for
+  flamegraph.pl or speedscope). Cheap enough for the random sampling.
+* ``all`` (or ``1``): both at once.
+
+Every profile also records the SQL run by the request. Profiles are written
+to PROFILE_DIR as ``<id>.pstats``, ``<id>.collapsed`` and ``<id>.json``
+(request, timings, SQL), keeping the newest PROFILE_KEEP; the response
+carries the id in ``X-Profile-Id``. A staff request can instead get one
+artifact back as the response body with ``X-Profile-Format`` or
+``_profile_format`` set to ``pstats``, ``collapsed`` or ``json``.
+
+Requests that trigger nothing cost one header lookup and one substring check.
+"""
+import cProfile
+import json
+import marshal
+import os
+import secrets
+import sys
+import threading
+import time
+from collections import Counter
+from contextlib import ExitStack
+from dataclasses import dataclass, field
+from urllib.parse import urlencode
+
+from django.conf import settings
+from django.db import connections
+
+MODES = {"cprofile": {"cprofile"}, "sample": {"sample"}, "all": {"cprofile", "sample"}, "1": {"cprofile", "sample"}}
+FORMATS = {
+    "pstats": "application/octet-stream",
+    "collapsed": "text/plain; charset=utf-8",
+    "json": "application/json",
+}
+
+
+def pop_request_options(request):
+    """
+    Return the ``(mode, format)`` asked for by ``request``, or ``(None, None)``.
+    The ``_profile`` query parameters are removed so the view sees the request
+    exactly as it would unprofiled.
+    """
+    mode = request.META.get("HTTP_X_PROFILE")
+    fmt = request.META.get("HTTP_X_PROFILE_FORMAT")
+    if "_profile" in request.META.get("QUERY_STRING", ""):
+        query = request.GET.copy()
+        mode = query.pop("_profile", [mode])[-1]
+        fmt = query.pop("_profile_format", [fmt])[-1]
+        request.GET = query
+        request.META["QUERY_STRING"] = urlencode(list(query.lists()), doseq=True)
+    if mode is None:
+        return None, None
+    mode = mode.strip().lower()
+    return (mode if mode in MODES else None), (fmt if fmt in FORMATS else None)
+
+
+def is_staff(request):
+    """Staff check that also understands HTTP Basic credentials, which DRF only reads inside the view."""
+    user = getattr(request, "user", None)
+    if user is not None and user.is_authenticated:
+        return user.is_staff
+    from rest_framework.authentication import BasicAuthentication
+    from rest_framework.exceptions import AuthenticationFailed
+
+    try:
+        credentials = BasicAuthentication().authenticate(request)
+    except AuthenticationFailed:
+        return False
+    return credentials is not None and credentials[0].is_staff
+
+
+def _frame_label(frame):
+    code = frame.f_code
+    return f"{frame.f_globals.get('__name__', '?')}:{getattr(code, 'co_qualname', code.co_name)}"
+
+
+class StackSampler:
+    """Counts the distinct stacks of one thread, sampled from a background thread."""
+
+    def __init__(self, interval, thread_id=None, root_code=None):
+        self.interval = interval
+        self.thread_id = thread_id or threading.get_ident()
+        self.root_code = root_code  # frames from here up (the server) are left out
+        self.counts = Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="carparks-profiler", daemon=True)
+
+    def _stack(self, frame):
+        labels = []
+        while frame is not None and frame.f_code is not self.root_code:
+            labels.append(_frame_label(frame))
+            frame = frame.f_back
+        return ";".join(reversed(labels))
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is not None:
+                stack = self._stack(frame)
+                if stack:
+                    self.counts[stack] += 1
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self._stop.set()
+        self._thread.join()
+
+    def collapsed(self):
+        return "".join(f"{stack} {count}\n" for stack, count in self.counts.most_common())
+
+
+class _SQLRecorder:
+    def __init__(self):
+        self.queries = []
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.queries.append({
+                "alias": context["connection"].alias,
+                "sql": sql,
+                "many": many,
+                "ms": round((time.perf_counter() - start) * 1000, 3),
+            })
+
+
+@dataclass
+class Profile:
+    id: str
+    mode: str
+    duration_ms: float = 0.0
+    pstats: bytes = None
+    collapsed: str = None
+    sql: list = field(default_factory=list)
+    request: dict = field(default_factory=dict)
+
+    def summary(self):
+        return {
+            "id": self.id,
+            "mode": self.mode,
+            "duration_ms": self.duration_ms,
+            "request": self.request,
+            "sql_queries": len(self.sql),
+            "sql_ms": round(sum(query["ms"] for query in self.sql), 3),
+            "sql": self.sql,
+        }
+
+    def artifact(self, fmt):
+        if fmt == "pstats":
+            return self.pstats
+        if fmt == "collapsed":
+            return self.collapsed
+        return json.dumps(self.summary())
+
+    def save(self, directory=None):
+        directory = directory or settings.PROFILE_DIR
+        os.makedirs(directory, exist_ok=True)
+        for fmt in FORMATS:
+            body = self.artifact(fmt)
+            if body is not None:
+                mode = "wb" if isinstance(body, bytes) else "w"
+                with open(os.path.join(directory, f"{self.id}.{fmt}"), mode) as fh:
+                    fh.write(body)
+        _prune(directory, settings.PROFILE_KEEP)
+
+
+def _prune(directory, keep):
+    ids = sorted({name.split(".", 1)[0] for name in os.listdir(directory) if name.endswith(".json")})
+    for stale in ids[:max(0, len(ids) - keep)]:
+        for fmt in FORMATS:
+            try:
+                os.remove(os.path.join(directory, f"{stale}.{fmt}"))
+            except FileNotFoundError:
+                pass
+
+
+def _new_id():
+    # Sorts by creation time, which _prune relies on
+    return f"{time.strftime('%Y%m%dT%H%M%S', time.gmtime())}-{secrets.token_hex(4)}"
+
+
+def _call(func):
+    return func()
+
+
+def run(mode, func):
+    """Call ``func()`` under the profilers named by ``mode``; returns ``(result, Profile)``."""
+    kinds = MODES[mode]
+    profile = Profile(_new_id(), mode)
+    recorder = _SQLRecorder()
+    profiler = cProfile.Profile() if "cprofile" in kinds else None
+    with ExitStack() as stack:
+        for connection in connections.all():
+            stack.enter_context(connection.execute_wrapper(recorder))
+        sampler = None
+        if "sample" in kinds:
+            interval = settings.PROFILE_SAMPLE_INTERVAL_MS / 1000
+            sampler = stack.enter_context(StackSampler(interval, root_code=_call.__code__))
+        start = time.perf_counter()
+        if profiler is not None:
+            profiler.enable()
+        try:
+            result = _call(func)
+        finally:
+            if profiler is not None:
+                profiler.disable()
+            profile.duration_ms = round((time.perf_counter() - start) * 1000, 3)
+    if profiler is not None:
+        profiler.create_stats()
+        profile.pstats = marshal.dumps(profiler.stats)
+    if sampler is not None:
+        profile.collapsed = sampler.collapsed()
+    profile.sql = recorder.queries
+    return result, profile
@@ -0,0 +1,124 @@
+"""
+orjson-backed JSON renderer and parser for DRF, plus compact renderers for
+bulk consumers of the list endpoints.
+
+Drop-in replacements for ``rest_framework.renderers.JSONRenderer`` and
+``rest_framework.parsers.JSONParser`` (configured in REST_FRAMEWORK in
+settings.py). Output matches the stock renderer byte for byte: compact
+separators, UTF-8 without ASCII escaping, U+2028/U+2029 escaped, and
+datetimes, decimals, lazy strings, querysets and other non-JSON types encoded
+by DRF's own ``JSONEncoder``. The differences are the spelling of floats
+that need an exponent (``1e16`` rather than ``1e+16``), which parse to the
+same values, and NaN/Infinity, which render as ``null`` where the stock
+renderer raises. On the parsing side, integers wider than 64 bits in request
+bodies are read as floats (no CarPark field holds one).
+
+Anything orjson cannot handle the same way (indents other than 2,
+``UNICODE_JSON``/``COMPACT_JSON``/``STRICT_JSON`` turned off, rendering
+integers wider than 64 bits, non UTF-8 request bodies) is handed to the stdlib
+implementation, as is everything when orjson isn't installed.
+
+The list endpoints additionally negotiate two bulk formats that drop JSON's
+per-row key repetition (see BULK_RENDERER_CLASSES):
+
+* ``application/msgpack`` (``?format=msgpack``): the same rows as MessagePack,
+  when the ``msgpack`` package is installed.
+* ``application/vnd.carpark.columns+json`` (``?format=columns``): one array
+  per field, ``{"count": n, "columns": {"id": [...], "address": [...]}}``.
+"""
+import codecs
+import io
+
+from rest_framework.parsers import JSONParser, get_encoding
+from rest_framework.renderers import BaseRenderer, JSONRenderer
+
+try:
+    import orjson
+except ImportError:  # optional; the stdlib json module is used instead
+    orjson = None
+
+try:
+    import msgpack
+except ImportError:  # optional; the MessagePack format is simply not offered
+    msgpack = None
+
+if orjson is not None:
+    OPTIONS = orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_PASSTHROUGH_DATACLASS | orjson.OPT_NON_STR_KEYS
+    INDENT_OPTIONS = {None: OPTIONS, 2: OPTIONS | orjson.OPT_INDENT_2}
+else:
+    INDENT_OPTIONS = {}
+
+
+class ORJSONRenderer(JSONRenderer):
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b""
+        indent = self.get_indent(accepted_media_type, renderer_context or {})
+        if indent not in INDENT_OPTIONS or self.ensure_ascii or not self.compact or not self.strict:
+            return super().render(data, accepted_media_type, renderer_context)
+        try:
+            ret = orjson.dumps(data, default=self.encoder_class().default, option=INDENT_OPTIONS[indent])
+        except orjson.JSONEncodeError:
+            # e.g. integers wider than 64 bits; let the stdlib render or raise
+            return super().render(data, accepted_media_type, renderer_context)
+        # Same strict-javascript-subset escaping as the stock renderer
+        return ret.replace(b"\xe2\x80\xa8", b"\\u2028").replace(b"\xe2\x80\xa9", b"\\u2029")
+
+
+class ORJSONParser(JSONParser):
+    renderer_class = ORJSONRenderer
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        parser_context = parser_context or {}
+        encoding = get_encoding(parser_context)
+        if orjson is None or not self.strict or codecs.lookup(encoding).name != "utf-8":
+            return super().parse(stream, media_type, parser_context)
+        body = stream.read()
+        try:
+            return orjson.loads(body)
+        except orjson.JSONDecodeError:
+            # Re-parse with the stdlib so error messages read exactly as before
+            return super().parse(io.BytesIO(body), media_type, parser_context)
+
+
+def to_columns(rows):
+    """Turn a list of row dicts into ``{"count": n, "columns": {field: [values]}}``."""
+    fields = list(rows[0]) if rows else []
+    return {"count": len(rows), "columns": {field: [row[field] for row in rows] for field in fields}}
+
+
+class ColumnarJSONRenderer(ORJSONRenderer):
+    """
+    Struct-of-arrays JSON for lists of rows. Paginated responses keep their
+    envelope with ``results`` in columnar form; anything else (errors,
+    aggregates) renders as plain JSON.
+    """
+
+    media_type = "application/vnd.carpark.columns+json"
+    format = "columns"
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if isinstance(data, list) and (not data or isinstance(data[0], dict)):
+            data = to_columns(data)
+        elif isinstance(data, dict) and isinstance(data.get("results"), list):
+            data = {**data, "results": to_columns(data["results"])}
+        return super().render(data, accepted_media_type, renderer_context)
+
+
+class MessagePackRenderer(BaseRenderer):
+    media_type = "application/msgpack"
+    format = "msgpack"
+    charset = None
+    render_style = "binary"
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b""
+        # Non-native types (datetimes, decimals, ...) encode as they do in JSON
+        return msgpack.packb(data, default=JSONRenderer.encoder_class().default)
+
+
+# Extra renderers offered by the carpark list endpoints, after the defaults
+BULK_RENDERER_CLASSES = [ColumnarJSONRenderer]
+if msgpack is not None:
+    BULK_RENDERER_CLASSES.append(MessagePackRenderer)
@@ -0,0 +1,306 @@
+"""
+Downsampled availability history: 15-minute, hourly and daily rollups of
+AvailabilitySample, retention per resolution, and range queries that read
+the cheapest resolution that still answers them.
+
+Each resolution is built from the one below it (raw -> 15m -> 1h -> 1d) with
+one aggregate query and one upsert per level, so a run costs the same however
+many car parks report. Rollups store ``samples`` and ``sum_available`` rather
+than an average, which makes a coarser bucket an exact sum of finer ones.
+Only buckets that have ended are written; each run re-aggregates from one
+bucket before the last one written, so late readings still land.
+
+Retention (AVAILABILITY_RETENTION_DAYS) deletes by time range on each level's
+``(resolution, bucket_start)`` / ``observed_at`` index, and never deletes
+what the next level up has not rolled up yet. Storage is thereby bounded by
+``rows per bucket x retained buckets`` per level instead of growing with
+time; the tables themselves stay unpartitioned so SQLite keeps working.
+
+``run()`` is what ``manage.py rollup_availability`` calls, from cron or as a
+long-running worker (``--interval``). With AVAILABILITY_AUTO_ROLLUP the
+ingest endpoint instead calls ``run_if_due()`` after each commit: the first
+ingest after a 15-minute bucket closes claims the bucket with ``cache.add``
+and rolls up inside its request, so with a shared cache (REDIS_URL) one
+process per bucket does the work; with the per-process default cache each
+worker does.
+"""
+import logging
+import threading
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Count, IntegerField, Max, Min, Sum
+from django.db.models.functions import Cast, ExtractMinute, TruncDay, TruncHour
+from django.utils import timezone
+from rest_framework import serializers
+
+from .models import AvailabilityRollup, AvailabilitySample
+
+BATCH_SIZE = 1000
+DEFAULT_MAX_POINTS = 500
+MAX_POINTS = 5000
+RAW = "raw"
+RUN_KEY = "carparks:availability-rollup"
+
+_EPOCH = datetime(1970, 1, 1, tzinfo=dt_timezone.utc)
+
+logger = logging.getLogger(__name__)
+
+# Same timestamp format as the car park serializer
+_format_time = serializers.DateTimeField().to_representation
+
+
+@dataclass(frozen=True)
+class Level:
+    name: str
+    width: timedelta
+    source: str  # level this one is aggregated from
+
+
+# Finest first
+LEVELS = [
+    Level(AvailabilityRollup.Resolution.QUARTER_HOUR, timedelta(minutes=15), RAW),
+    Level(AvailabilityRollup.Resolution.HOUR, timedelta(hours=1), AvailabilityRollup.Resolution.QUARTER_HOUR),
+    Level(AvailabilityRollup.Resolution.DAY, timedelta(days=1), AvailabilityRollup.Resolution.HOUR),
+]
+LEVELS_BY_NAME = {level.name: level for level in LEVELS}
+RESOLUTIONS = [RAW, *LEVELS_BY_NAME]
+
+
+def floor_time(moment, width):
+    """Start of the UTC-aligned bucket of ``width`` containing ``moment``."""
+    return _EPOCH + (moment - _EPOCH) // width * width
+
+
+def _grouped(queryset, time_field, width):
+    """``queryset`` grouped by car park, lot type and bucket of ``width``."""
+    if width >= timedelta(days=1):
+        base = TruncDay(time_field, tzinfo=dt_timezone.utc)
+    else:
+        base = TruncHour(time_field, tzinfo=dt_timezone.utc)
+    parts = {"base": base}
+    if width < timedelta(hours=1):
+        # Integer division of the minute picks the sub-hour bucket (Postgres
+        # EXTRACT returns numeric, hence the cast)
+        parts["part"] = Cast(ExtractMinute(time_field), IntegerField()) / (width // timedelta(minutes=1))
+    return queryset.order_by().values("carpark_id", "lot_type", **parts)
+
+
+def _aggregate(source, start, end, width, **filters):
+    """
+    Rows of ``{carpark_id, lot_type, bucket_start, samples, sum_available,
+    min_available, max_available, total_lots}`` for buckets of ``width``
+    built from ``source`` between ``start`` and ``end``.
+    """
+    if source == RAW:
+        queryset = _grouped(
+            AvailabilitySample.objects.filter(observed_at__gte=start, observed_at__lt=end, **filters),
+            "observed_at", width,
+        ).annotate(
+            samples=Count("id"),
+            sum_available=Sum("available_lots"),
+            min_available=Min("available_lots"),
+            max_available=Max("available_lots"),
+            total_lots=Max("total_lots"),
+        )
+    else:
+        queryset = _grouped(
+            AvailabilityRollup.objects.filter(
+                resolution=source, bucket_start__gte=start, bucket_start__lt=end, **filters),
+            "bucket_start", width,
+        ).annotate(
+            samples=Sum("samples"),
+            sum_available=Sum("sum_available"),
+            min_available=Min("min_available"),
+            max_available=Max("max_available"),
+            total_lots=Max("total_lots"),
+        )
+    rows = []
+    for row in queryset:
+        base = row.pop("base")
+        row["bucket_start"] = base + row.pop("part", 0) * width
+        rows.append(row)
+    return rows
+
+
+def watermark(resolution):
+    """Start of the newest stored bucket at ``resolution`` (None when empty)."""
+    return (AvailabilityRollup.objects.filter(resolution=resolution)
+            .order_by("-bucket_start").values_list("bucket_start", flat=True).first())
+
+
+def _oldest_source_time(source):
+    if source == RAW:
+        return AvailabilitySample.objects.order_by("observed_at").values_list("observed_at", flat=True).first()
+    return (AvailabilityRollup.objects.filter(resolution=source)
+            .order_by("bucket_start").values_list("bucket_start", flat=True).first())
+
+
+def roll_up(level, now=None):
+    """Write every ended bucket of ``level`` since its watermark; returns rows written."""
+    now = now or timezone.now()
+    last = watermark(level.name)
+    start = last - level.width if last is not None else _oldest_source_time(level.source)
+    if start is None:
+        return 0
+    start = floor_time(start, level.width)
+    end = floor_time(now, level.width)
+    if start >= end:
+        return 0
+    rows = [
+        AvailabilityRollup(resolution=level.name, **row)
+        for row in _aggregate(level.source, start, end, level.width)
+    ]
+    AvailabilityRollup.objects.bulk_create(
+        rows,
+        batch_size=BATCH_SIZE,
+        update_conflicts=True,
+        unique_fields=["carpark", "lot_type", "resolution", "bucket_start"],
+        update_fields=["samples", "sum_available", "min_available", "max_available", "total_lots"],
+    )
+    return len(rows)
+
+
+def prune(now=None):
+    """Apply AVAILABILITY_RETENTION_DAYS; returns {level name: rows deleted}."""
+    now = now or timezone.now()
+    deleted = {}
+    for name, above in zip(RESOLUTIONS, [*LEVELS_BY_NAME, None]):
+        days = settings.AVAILABILITY_RETENTION_DAYS.get(name)
+        if days is None:
+            continue
+        cutoff = now - timedelta(days=days)
+        if above is not None:
+            # Keep anything the next level has yet to (re-)aggregate
+            rolled_until = watermark(above)
+            if rolled_until is None:
+                continue
+            cutoff = min(cutoff, rolled_until - LEVELS_BY_NAME[above].width)
+        if name == RAW:
+            queryset = AvailabilitySample.objects.filter(observed_at__lt=cutoff)
+        else:
+            queryset = AvailabilityRollup.objects.filter(resolution=name, bucket_start__lt=cutoff)
+        deleted[name] = queryset.delete()[0]
+    return deleted
+
+
+def run(now=None, prune_expired=True):
+    """Roll every level up to ``now`` (and apply retention); returns {level name: rows written}."""
+    now = now or timezone.now()
+    written = {}
+    with transaction.atomic():
+        for level in LEVELS:
+            written[level.name] = roll_up(level, now)
+    if prune_expired:
+        prune(now)
+    return written
+
+
+_next_run = None
+_run_lock = threading.Lock()
+
+
+def run_if_due():
+    """
+    Run once per closed 15-minute bucket across every process sharing the
+    cache; concurrent callers and later ones in the same bucket skip.
+    """
+    global _next_run
+    now = timezone.now()
+    if _next_run is not None and now < _next_run:
+        return
+    if not _run_lock.acquire(blocking=False):
+        return
+    try:
+        width = LEVELS[0].width
+        bucket = floor_time(now, width)
+        key = f"{RUN_KEY}:{bucket.isoformat()}"
+        if cache.add(key, True, timeout=int(width.total_seconds())):
+            try:
+                run(now)
+            except Exception:
+                cache.delete(key)  # so the next ingest, in any process, retries
+                raise
+        _next_run = bucket + width
+    except Exception:  # a failed rollup must never fail the ingest; the next one retries
+        logger.exception("Failed to roll up availability")
+    finally:
+        _run_lock.release()
+
+
+def reset():
+    """Forget when this process last rolled up (used by tests)."""
+    global _next_run
+    _next_run = None
+
+
+def choose_resolution(start, end, max_points=DEFAULT_MAX_POINTS, now=None):
+    """
+    The finest resolution that covers ``start``..``end`` in at most
+    ``max_points`` buckets and is still retained back to ``start``; daily
+    when none is.
+    """
+    now = now or timezone.now()
+    for name in RESOLUTIONS:
+        days = settings.AVAILABILITY_RETENTION_DAYS.get(name)
+        if days is not None and start < now - timedelta(days=days):
+            continue
+        if point_count(start, end, name) <= max_points:
+            return name
+    return RESOLUTIONS[-1]
+
+
+def point_count(start, end, resolution):
+    """Points ``history`` returns for the range (raw: at the expected reading interval)."""
+    if resolution == RAW:
+        width = timedelta(seconds=settings.AVAILABILITY_SAMPLE_INTERVAL_SECONDS)
+    else:
+        width = LEVELS_BY_NAME[resolution].width
+    return (end - start) / width
+
+
+def _point(bucket_start, samples, sum_available, min_available, max_available, total_lots):
+    return {
+        "t": _format_time(bucket_start),
+        "avg_available": round(sum_available / samples, 2),
+        "min_available": min_available,
+        "max_available": max_available,
+        "total_lots": total_lots,
+        "samples": samples,
+    }
+
+
+def history(carpark_id, lot_type, start, end, resolution):
+    """
+    Points for one car park and lot type between ``start`` and ``end``.
+
+    Buckets after the resolution's watermark (not rolled up yet) are
+    aggregated from the raw samples at query time, so the newest data is
+    always included. Raw readings stop at MAX_POINTS, in case they come more
+    often than AVAILABILITY_SAMPLE_INTERVAL_SECONDS.
+    """
+    if resolution == RAW:
+        samples = AvailabilitySample.objects.filter(
+            carpark_id=carpark_id, lot_type=lot_type, observed_at__gte=start, observed_at__lt=end,
+        ).order_by("observed_at").values_list("observed_at", "available_lots", "total_lots")[:MAX_POINTS]
+        return [_point(observed_at, 1, available, available, available, total)
+                for observed_at, available, total in samples]
+
+    level = LEVELS_BY_NAME[resolution]
+    start = floor_time(start, level.width)
+    stored = list(AvailabilityRollup.objects.filter(
+        carpark_id=carpark_id, lot_type=lot_type, resolution=resolution,
+        bucket_start__gte=start, bucket_start__lt=end,
+    ).order_by("bucket_start").values_list(
+        "bucket_start", "samples", "sum_available", "min_available", "max_available", "total_lots"))
+    points = [_point(*row) for row in stored]
+    tail_start = stored[-1][0] + level.width if stored else start
+    if tail_start < end:
+        tail = _aggregate(RAW, tail_start, end, level.width, carpark_id=carpark_id, lot_type=lot_type)
+        points.extend(_point(row["bucket_start"], row["samples"], row["sum_available"], row["min_available"],
+                             row["max_available"], row["total_lots"])
+                      for row in sorted(tail, key=lambda row: row["bucket_start"]))
+    return points
@@ -1,5 +1,44 @@
+from django.utils import timezone
 from rest_framework import serializers
-from .models import CarPark
+from .categories import LOOKUP_MODELS, resolve
+from .models import CarPark, CarParkTombstone, CategoryLookup, ImportJob
+
+
+class CategoryField(serializers.RelatedField):
+    """
+    A categorical CarPark field, read and written by name. Validation only
+    checks the name; CarParkSerializer adds names not seen before to the
+    field's lookup table when it saves, so invalid requests add no lookup rows.
+    """
+
+    default_error_messages = {
+        "blank": "This field may not be blank.",
+        "invalid": "Not a valid string.",
+        "max_length": "Ensure this field has no more than {max_length} characters.",
+    }
+
+    def __init__(self, field_name, **kwargs):
+        self.lookup_field = field_name
+        self.max_length = LOOKUP_MODELS[field_name]._meta.get_field("name").max_length
+        super().__init__(queryset=LOOKUP_MODELS[field_name].objects.all(), **kwargs)
+
+    def to_representation(self, value):
+        return value.name
+
+    def to_internal_value(self, data):
+        if isinstance(data, CategoryLookup):
+            return data
+        if not isinstance(data, (str, int, float, bool)):
+            self.fail("invalid")
+        name = str(data).strip()
+        if not name:
+            self.fail("blank")
+        if len(name) > self.max_length:
+            self.fail("max_length", max_length=self.max_length)
+        current = getattr(getattr(self.parent, "instance", None), self.lookup_field, None)
+        if isinstance(current, CategoryLookup) and current.name == name:
+            return current  # unchanged on update: no lookup query
+        return name
 
 
 class CarParkSerializer(serializers.ModelSerializer):
@@ -9,12 +48,86 @@ class CarParkSerializer(serializers.ModelSerializer):
 
     has_free_parking = serializers.ReadOnlyField()
     location = serializers.ReadOnlyField()
+    car_park_type = CategoryField("car_park_type")
+    type_of_parking_system = CategoryField("type_of_parking_system")
+    short_term_parking = CategoryField("short_term_parking")
+    free_parking = CategoryField("free_parking")
+    town = serializers.SlugRelatedField(slug_field="name", read_only=True)
 
     class Meta:
         model = CarPark
-        fields = "__all__"
-        read_only_fields = ("created_at", "updated_at")
+        # Explicit so categories keep their place among the columns
+        fields = (
+            "id", "has_free_parking", "location", "car_park_no", "address", "block", "street", "town",
+            "x_coord", "y_coord", "car_park_type", "type_of_parking_system", "short_term_parking",
+            "free_parking", "night_parking", "car_park_decks", "gantry_height", "car_park_basement",
+            "created_at", "updated_at",
+        )
+        # block, street and town are parsed from address on save
+        read_only_fields = ("block", "street", "created_at", "updated_at")
         # Unique enforcement handled at the view layer (IntegrityError → 409)
         # to produce a consistent response whether the collision is on the DB
         # constraint or a race condition.
         validators = []
+
+    def _resolve_categories(self, validated_data):
+        for name in CarPark.CATEGORY_FIELDS:
+            if isinstance(validated_data.get(name), str):
+                validated_data[name] = resolve(name, validated_data[name])
+        return validated_data
+
+    def create(self, validated_data):
+        return super().create(self._resolve_categories(validated_data))
+
+    def update(self, instance, validated_data):
+        return super().update(instance, self._resolve_categories(validated_data))
+
+
+class CarParkTombstoneSerializer(serializers.ModelSerializer):
+    """
+    A deletion in the changes feed, keyed by the deleted car park's id.
+    """
+
+    id = serializers.IntegerField(source="carpark_id")
+
+    class Meta:
+        model = CarParkTombstone
+        fields = ("id", "car_park_no", "deleted_at")
+
+
+class ImportJobSerializer(serializers.ModelSerializer):
+    """
+    Status of a CSV import job, with its throughput and estimated time left
+    while it runs.
+    """
+
+    rows_per_second = serializers.SerializerMethodField()
+    percent_complete = serializers.SerializerMethodField()
+    eta_seconds = serializers.SerializerMethodField()
+
+    class Meta:
+        model = ImportJob
+        fields = (
+            "id", "status", "source", "size_bytes", "total_rows", "processed", "inserted", "duplicates",
+            "failed", "errors", "error", "attempts", "created_at", "started_at", "finished_at",
+            "rows_per_second", "percent_complete", "eta_seconds",
+        )
+
+    def get_rows_per_second(self, job):
+        if job.started_at is None:
+            return None
+        elapsed = ((job.finished_at or timezone.now()) - job.started_at).total_seconds()
+        return round(job.processed / elapsed, 1) if elapsed > 0 else None
+
+    def get_percent_complete(self, job):
+        if job.status == ImportJob.Status.SUCCEEDED:
+            return 100.0
+        if not job.total_rows:
+            return None
+        return round(100 * min(job.processed, job.total_rows) / job.total_rows, 1)
+
+    def get_eta_seconds(self, job):
+        rate = self.get_rows_per_second(job)
+        if job.status != ImportJob.Status.RUNNING or not rate or job.total_rows is None:
+            return None
+        return round(max(0, job.total_rows - job.processed) / rate, 1)
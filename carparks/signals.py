@@ -0,0 +1,56 @@
+import threading
+from contextlib import contextmanager
+
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from . import dataset, events
+from .models import CarPark, CarParkTombstone
+
+
+@receiver(post_save, sender=CarPark)
+@receiver(post_delete, sender=CarPark)
+def carpark_changed(sender, **kwargs):
+    dataset.mark_changed()
+
+
+@receiver(post_save, sender=CarPark)
+def publish_upsert(sender, instance, **kwargs):
+    events.publish_on_commit(lambda: events.upsert_event(instance))
+
+
+_batch = threading.local()
+
+
+def _publish_delete(tombstone):
+    events.publish_on_commit(lambda: events.delete_event(tombstone))
+
+
+@contextmanager
+def batched_tombstones():
+    """
+    Collect the tombstones of the CarPark deletes in the block and write them
+    with one ``bulk_create`` at its end, instead of an INSERT per row.
+    """
+    if getattr(_batch, "tombstones", None) is not None:  # already collecting
+        yield
+        return
+    _batch.tombstones = []
+    try:
+        yield
+        tombstones = CarParkTombstone.objects.bulk_create(_batch.tombstones)
+    finally:
+        _batch.tombstones = None
+    for tombstone in tombstones:
+        _publish_delete(tombstone)
+
+
+@receiver(post_delete, sender=CarPark)
+def record_tombstone(sender, instance, **kwargs):
+    tombstone = CarParkTombstone(carpark_id=instance.pk, car_park_no=instance.car_park_no)
+    pending = getattr(_batch, "tombstones", None)
+    if pending is not None:
+        pending.append(tombstone)
+        return
+    tombstone.save()
+    _publish_delete(tombstone)
@@ -0,0 +1,148 @@
+"""
+Single-flight computation of values derived from the CarPark table.
+
+When the dataset version moves (see ``carparks.dataset``) every cached list
+and aggregate is stale at once, and without coordination each concurrent
+request would recompute it. Here the first caller for a ``(name, version)``
+computes and everyone else shares its result:
+
+* Within a worker, concurrent threads wait on the leader's flight
+  (``coalesce``), for at most CARPARK_COALESCE_WAIT_SECONDS before computing
+  themselves.
+* Across workers (CARPARK_COALESCE_SHARED, on when REDIS_URL is set), the
+  leader also takes a short lock in the shared cache and publishes the value
+  there; leaders in other workers poll for it instead of recomputing. The
+  lock expires after CARPARK_COALESCE_LOCK_SECONDS, so a worker that dies
+  mid-computation holds nobody up for long.
+
+With stale-while-revalidate (CARPARK_STALE_WHILE_REVALIDATE) callers that
+find a computation already in flight get the previous version's value
+immediately instead of waiting; only the leader pays for the recompute.
+
+Values are kept per worker as well, so a hit costs a dict lookup and the
+dataset version check.
+"""
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+
+from . import dataset
+from .metrics import record_cache_access
+
+KEY_PREFIX = "carparks:singleflight"
+POLL_SECONDS = 0.02
+
+_NOTHING = object()
+
+
+class _Flight:
+    __slots__ = ("done", "value", "error")
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.value = None
+        self.error = None
+
+
+_flights = {}
+_flights_lock = threading.Lock()
+
+
+def coalesce(key, compute, stale=_NOTHING):
+    """
+    Return ``compute()``, sharing one call among concurrent callers with the
+    same ``key`` in this process. Callers that find a flight running get
+    ``stale`` at once when one is given, else wait for the leader's result
+    (or its exception).
+    """
+    with _flights_lock:
+        flight = _flights.get(key)
+        leader = flight is None
+        if leader:
+            flight = _flights[key] = _Flight()
+    if not leader:
+        if stale is not _NOTHING:
+            return stale
+        if not flight.done.wait(settings.CARPARK_COALESCE_WAIT_SECONDS):
+            return compute()  # leader is stuck; don't hold this request hostage
+        if flight.error is not None:
+            raise flight.error
+        return flight.value
+    try:
+        flight.value = compute()
+        return flight.value
+    except BaseException as exc:
+        flight.error = exc
+        raise
+    finally:
+        with _flights_lock:
+            _flights.pop(key, None)
+        flight.done.set()
+
+
+_values = {}  # name -> (version, value)
+
+
+def _shared_get(cache_key, version):
+    entry = cache.get(cache_key)
+    if entry is not None and entry[0] == version:
+        return entry[1]
+    return _NOTHING
+
+
+def _compute_shared(name, version, compute):
+    """Compute once across workers: lock in the shared cache, publish the value there."""
+    cache_key = f"{KEY_PREFIX}:{name}"
+    value = _shared_get(cache_key, version)
+    if value is not _NOTHING:
+        return value
+    lock_key = f"{cache_key}:lock"
+    locked = cache.add(lock_key, version, timeout=settings.CARPARK_COALESCE_LOCK_SECONDS)
+    deadline = time.monotonic() + settings.CARPARK_COALESCE_WAIT_SECONDS
+    while not locked and time.monotonic() < deadline:
+        time.sleep(POLL_SECONDS)
+        value = _shared_get(cache_key, version)
+        if value is not _NOTHING:
+            return value
+        locked = cache.add(lock_key, version, timeout=settings.CARPARK_COALESCE_LOCK_SECONDS)
+    try:
+        value = compute()
+        cache.set(cache_key, (version, value), timeout=settings.CARPARK_COALESCE_TTL)
+        return value
+    finally:
+        if locked:
+            cache.delete(lock_key)
+
+
+def get(name, compute):
+    """
+    ``compute()`` for the current dataset version, computed once per version
+    however many requests (threads or workers) ask at the same time. The
+    value must be picklable when CARPARK_COALESCE_SHARED is on.
+    """
+    version = dataset.current_version()
+    entry = _values.get(name)
+    if entry is not None and entry[0] == version:
+        record_cache_access("singleflight", True)
+        return entry[1]
+    record_cache_access("singleflight", False)
+
+    def fill():
+        if settings.CARPARK_COALESCE_SHARED:
+            value = _compute_shared(name, version, compute)
+        else:
+            value = compute()
+        _values[name] = (version, value)
+        return value
+
+    stale = entry[1] if entry is not None and settings.CARPARK_STALE_WHILE_REVALIDATE else _NOTHING
+    return coalesce((name, version), fill, stale)
+
+
+def reset():
+    """Drop every value held by this worker and in the shared cache (used by tests)."""
+    if settings.CARPARK_COALESCE_SHARED:
+        cache.delete_many([f"{KEY_PREFIX}:{name}" for name in _values])
+    _values.clear()
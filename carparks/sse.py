@@ -0,0 +1,133 @@
+"""
+Server-sent events stream of CarPark changes, as a raw ASGI application.
+
+``AdvancedWebDevelopment/asgi.py`` routes STREAM_PATH here ahead of Django,
+so a connection is one coroutine waiting on its subscription queue (see
+``carparks.events``): no thread, middleware or request/response cycle is held
+while it idles. The stream is therefore only available when the project runs
+under an ASGI server.
+
+Clients resuming with ``Last-Event-ID`` (or ``?last_event_id=`` on the first
+connect) are subscribed first and then replayed everything after that id
+from the changes feed, so nothing committed in between is lost; live events
+already sent by the replay are skipped. When a client is too far behind
+(replay longer than CARPARK_EVENTS_MAX_REPLAY, or more than
+CARPARK_EVENTS_MAX_QUEUED live events unsent) it gets a ``reset`` event and
+the stream closes; it should resync from the changes feed.
+"""
+import asyncio
+from urllib.parse import parse_qs
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import close_old_connections
+
+from . import changes, events
+
+STREAM_PATH = "/api/v1/carparks/stream/"
+
+HEADERS = [
+    (b"content-type", b"text/event-stream"),
+    (b"cache-control", b"no-cache"),
+    (b"x-accel-buffering", b"no"),  # stop nginx from buffering the stream
+]
+RETRY_MS = 3000
+RESET_FRAME = b"event: reset\ndata: {}\n\n"
+KEEPALIVE_FRAME = b": keepalive\n\n"
+
+
+def _last_event_id(scope):
+    for name, value in scope.get("headers", []):
+        if name == b"last-event-id":
+            return value.decode("latin-1").strip() or None
+    values = parse_qs(scope.get("query_string", b"").decode("latin-1")).get("last_event_id")
+    return values[0] if values else None
+
+
+async def _respond(send, status, body):
+    await send({"type": "http.response.start", "status": status,
+                "headers": [(b"content-type", b"application/json")]})
+    await send({"type": "http.response.body", "body": body})
+
+
+def _replay_page(token):
+    close_old_connections()
+    page = changes.changes_since(token, changes.MAX_LIMIT, settle_seconds=0)
+    ordered = sorted(
+        [(row.updated_at, row.pk, events.upsert_event(row)) for row in page.upserts]
+        + [(row.deleted_at, row.carpark_id, events.delete_event(row)) for row in page.deletes],
+        key=lambda change: change[:2],
+    )
+    return [event for _, _, event in ordered], page.next_token, page.has_more
+
+
+async def _replay(send, token):
+    """Send everything after ``token``; return the ids sent, or None if the client must resync."""
+    sent = set()
+    while True:
+        page_events, token, has_more = await sync_to_async(_replay_page)(token)
+        if len(sent) + len(page_events) > settings.CARPARK_EVENTS_MAX_REPLAY:
+            return None
+        for event in page_events:
+            await send({"type": "http.response.body", "body": event.encode(), "more_body": True})
+            sent.add(event.id)
+        if not has_more:
+            return sent
+
+
+async def _wait_for_disconnect(receive):
+    while (await receive())["type"] != "http.disconnect":
+        pass
+
+
+async def stream(scope, receive, send):
+    if scope["method"] not in ("GET", "HEAD"):
+        await _respond(send, 405, b'{"error": "Method not allowed"}')
+        return
+    last_event_id = _last_event_id(scope)
+    if last_event_id:
+        try:
+            changes.decode_token(last_event_id)
+        except changes.InvalidToken:
+            await _respond(send, 400, b'{"error": "Invalid Last-Event-ID"}')
+            return
+    await send({"type": "http.response.start", "status": 200, "headers": HEADERS})
+    if scope["method"] == "HEAD":
+        await send({"type": "http.response.body", "body": b""})
+        return
+
+    broker = events.get_broker()
+    subscription = broker.subscribe()
+    disconnect = asyncio.ensure_future(_wait_for_disconnect(receive))
+    getter = None
+    try:
+        await send({"type": "http.response.body", "body": b"retry: %d\n\n" % RETRY_MS, "more_body": True})
+        replayed = await _replay(send, last_event_id) if last_event_id else set()
+        if replayed is None:
+            await send({"type": "http.response.body", "body": RESET_FRAME})
+            return
+        while True:
+            if getter is None:
+                getter = asyncio.ensure_future(subscription.queue.get())
+            done, _ = await asyncio.wait(
+                {getter, disconnect},
+                timeout=settings.CARPARK_EVENTS_HEARTBEAT_SECONDS,
+                return_when=asyncio.FIRST_COMPLETED,
+            )
+            if disconnect in done:
+                return
+            if getter not in done:
+                await send({"type": "http.response.body", "body": KEEPALIVE_FRAME, "more_body": True})
+                continue
+            event, getter = getter.result(), None
+            if event is events.OVERFLOW:
+                await send({"type": "http.response.body", "body": RESET_FRAME})
+                return
+            if event.id in replayed:
+                continue
+            await send({"type": "http.response.body", "body": event.encode(), "more_body": True})
+    finally:
+        broker.unsubscribe(subscription)
+        for task in (getter, disconnect):
+            if task is not None:
+                task.cancel()
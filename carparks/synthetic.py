@@ -0,0 +1,89 @@
+"""
+Synthetic CarPark datasets shaped like dataset/HDBCarparkInformation.csv.
+
+Each synthetic row starts from a randomly chosen row of the real CSV, so the
+joint distribution of type, parking system, decks, gantry height and so on is
+preserved, then gets a unique car park number, a new block number on the
+same street and jittered coordinates. Generation is deterministic for a given
+seed, so benchmark runs on different commits see identical data.
+"""
+import csv
+import random
+import re
+from pathlib import Path
+
+from django.conf import settings
+from django.db import transaction
+
+from . import dataset
+from .categories import CategoryKeys
+from .importer import REQUIRED_COLUMNS, row_to_instance
+from .models import CarPark
+
+SOURCE_CSV = Path(settings.BASE_DIR) / "dataset" / "HDBCarparkInformation.csv"
+
+CSV_COLUMNS = REQUIRED_COLUMNS
+
+_BLOCK_PREFIX = re.compile(r"^BLK\s+\S+\s+")
+
+_templates = None
+
+
+def load_templates():
+    """Rows of the real dataset, with the street part of each address split out."""
+    global _templates
+    if _templates is None:
+        with open(SOURCE_CSV, newline="", encoding="utf-8") as fh:
+            rows = list(csv.DictReader(fh))
+        for row in rows:
+            row["street"] = _BLOCK_PREFIX.sub("", row["address"])
+        _templates = rows
+    return _templates
+
+
+def generate_rows(count, seed=0):
+    """Yield ``count`` CSV-shaped dicts (string values, as read from the CSV)."""
+    rng = random.Random(seed)
+    templates = load_templates()
+    for i in range(count):
+        template = rng.choice(templates)
+        block = f"{rng.randint(1, 999)}{rng.choice(('', '', '', 'A', 'B', 'C'))}"
+        yield {
+            "car_park_no": f"S{seed:02d}{i:07d}",
+            "address": f"BLK {block} {template['street']}",
+            "x_coord": f"{float(template['x_coord']) + rng.gauss(0, 150):.4f}",
+            "y_coord": f"{float(template['y_coord']) + rng.gauss(0, 150):.4f}",
+            "car_park_type": template["car_park_type"],
+            "type_of_parking_system": template["type_of_parking_system"],
+            "short_term_parking": template["short_term_parking"],
+            "free_parking": template["free_parking"],
+            "night_parking": template["night_parking"],
+            "car_park_decks": template["car_park_decks"],
+            "gantry_height": template["gantry_height"],
+            "car_park_basement": template["car_park_basement"],
+        }
+
+
+def write_csv(path, count, seed=0):
+    """Write a synthetic dataset with the same header as the HDB CSV."""
+    with open(path, "w", newline="", encoding="utf-8") as fh:
+        writer = csv.DictWriter(fh, fieldnames=CSV_COLUMNS)
+        writer.writeheader()
+        writer.writerows(generate_rows(count, seed))
+    return path
+
+
+def seed_database(count, seed=0, batch_size=5000):
+    """Insert ``count`` synthetic car parks with batched bulk_create."""
+    batch = []
+    keys = CategoryKeys()
+    with transaction.atomic():
+        for row in generate_rows(count, seed):
+            batch.append(row_to_instance(row, keys))
+            if len(batch) >= batch_size:
+                CarPark.objects.bulk_create(batch)
+                batch = []
+        if batch:
+            CarPark.objects.bulk_create(batch)
+    dataset.mark_changed()
+    return count
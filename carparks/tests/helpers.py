@@ -0,0 +1,53 @@
+"""
+Fixtures shared by the carparks test modules.
+"""
+import shutil
+import tempfile
+
+from django.contrib.auth.models import User
+from django.test import override_settings
+from rest_framework.test import APIClient
+
+from carparks.models import CarPark
+
+# A plain surface car park; tests override only the fields they care about
+CAR_PARK_DEFAULTS = {
+    "x_coord": 1.3,
+    "y_coord": 103.8,
+    "car_park_type": "SURFACE CAR PARK",
+    "type_of_parking_system": "ELECTRONIC PARKING",
+    "short_term_parking": "WHOLE DAY",
+    "free_parking": "NO",
+    "night_parking": True,
+    "car_park_decks": 0,
+    "gantry_height": 2.0,
+    "car_park_basement": False,
+}
+
+
+def create_car_park(car_park_no, address, **fields):
+    """Create a car park from category names, filling unspecified fields from CAR_PARK_DEFAULTS."""
+    return CarPark.objects.create_with_names(
+        car_park_no=car_park_no, address=address, **{**CAR_PARK_DEFAULTS, **fields}
+    )
+
+
+def staff_client():
+    """An API client authenticated as a staff user, without a session."""
+    client = APIClient()
+    client.force_authenticate(User(username="staff", is_staff=True))
+    return client
+
+
+def temporary_directory(test_case):
+    """Create a directory that is removed when ``test_case`` finishes, and return its path."""
+    directory = tempfile.mkdtemp()
+    test_case.addCleanup(shutil.rmtree, directory, ignore_errors=True)
+    return directory
+
+
+def enable_settings(test_case, **settings):
+    """Override ``settings`` until ``test_case`` finishes."""
+    overrides = override_settings(**settings)
+    overrides.enable()
+    test_case.addCleanup(overrides.disable)
@@ -0,0 +1,121 @@
+import csv
+import io
+from contextlib import redirect_stdout
+
+from django.core.management import call_command
+from django.test import TestCase
+from rest_framework.test import APIClient
+from rest_framework import status
+
+from carparks import dataset, importer, singleflight, synthetic
+from carparks.addresses import TOWNS, ParsedAddress, parse
+from carparks.bootstrap import DEFAULT_CSV
+from carparks.models import CarPark
+from scripts.fix_name_errors import fix_name_errors
+
+from .helpers import create_car_park
+
+
+class AddressComponentsTestCase(TestCase):
+    def setUp(self):
+        singleflight.reset()
+        self.addCleanup(singleflight.reset)
+
+    def test_parse(self):
+        """
+        Test that blocks, streets and towns are split out of the HDB address shapes.
+        """
+        cases = {
+            "BLK 98A ALJUNIED CRESCENT": ("98A", "ALJUNIED CRESCENT", "GEYLANG"),
+            "BLK 301-302,305-308 CLEMENTI AVENUE 4": ("301-302,305-308", "CLEMENTI AVENUE 4", "CLEMENTI"),
+            "BLK 1 TO 3 LORONG 7 TOA PAYOH": ("1 TO 3", "LORONG 7 TOA PAYOH", "TOA PAYOH"),
+            "BLK 85/A/B/C LORONG 4 TOA PAYOH": ("85/A/B/C", "LORONG 4 TOA PAYOH", "TOA PAYOH"),
+            "3 AND 7 DOVER ROAD": ("3 AND 7", "DOVER ROAD", "QUEENSTOWN"),
+            "BLK440 BUKIT BATOK WEST AVENUE 8": ("440", "BUKIT BATOK WEST AVENUE 8", "BUKIT BATOK"),
+            "blk 441/455  jurong west avenue 1/street 42": ("441/455", "JURONG WEST AVENUE 1/STREET 42", "JURONG WEST"),
+            "BLK 5/7 HAVELOCK ROAD": ("5/7", "HAVELOCK ROAD", "BUKIT MERAH"),
+            "BLK 150 BT BATOK WEST AVENUE 9": ("150", "BT BATOK WEST AVENUE 9", "BUKIT BATOK"),
+            "BLK 30 PINE CLOSE": ("30", "PINE CLOSE", None),
+            "BEDOK CENTRAL": ("", "BEDOK CENTRAL", "BEDOK"),
+            "#NAME?": ("", "#NAME?", None),
+        }
+        for address, expected in cases.items():
+            with self.subTest(address=address):
+                self.assertEqual(parse(address), ParsedAddress(*expected))
+
+    def test_bundled_dataset_lands_in_hdb_towns(self):
+        """
+        Test that the bundled CSV parses into HDB towns only, leaving unknown places without one.
+        """
+        with open(DEFAULT_CSV, newline="") as fh:
+            towns = [parse(row["address"]).town for row in csv.DictReader(fh)]
+        self.assertLessEqual(set(towns) - {None}, set(TOWNS))
+        self.assertEqual(len(set(towns) - {None}), 27)
+        self.assertLess(towns.count(None), 25)
+
+    def test_components_follow_the_address(self):
+        """
+        Test that saving parses the address and the API exposes the parts read-only.
+        """
+        client = APIClient()
+        car_park = create_car_park("A001", "BLK 227 ANG MO KIO STREET 23")
+        self.assertEqual((car_park.block, car_park.street, car_park.town.name),
+                         ("227", "ANG MO KIO STREET 23", "ANG MO KIO"))
+
+        response = client.patch(f"/api/v1/carparks/{car_park.pk}/",
+                                {"address": "BLK 81C LORONG 4 TOA PAYOH", "town": "YISHUN"}, format="json")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual((response.data["block"], response.data["street"], response.data["town"]),
+                         ("81C", "LORONG 4 TOA PAYOH", "TOA PAYOH"))
+
+    def test_town_filter_and_counts(self):
+        """
+        Test filtering the list and the query endpoint by town, and counting per town.
+        """
+        client = APIClient()
+        create_car_park("A001", "BLK 227 ANG MO KIO STREET 23")
+        create_car_park("A002", "BLK 605 ANG MO KIO AVENUE 4")
+        create_car_park("T001", "BLK 1 TO 3 LORONG 7 TOA PAYOH")
+
+        response = client.get("/api/v1/carparks/", {"town": "ang mo kio"})
+        self.assertEqual([row["car_park_no"] for row in response.json()], ["A001", "A002"])
+        response = client.get("/api/v1/carparks/query/", {"town": "Toa Payoh"})
+        self.assertEqual([row["car_park_no"] for row in response.data["results"]], ["T001"])
+        response = client.get("/api/v1/carparks/group-by-town/")
+        self.assertEqual(response.json(), [{"town": "ANG MO KIO", "total": 2}, {"town": "TOA PAYOH", "total": 1}])
+
+    def test_import_and_backfill(self):
+        """
+        Test that imports parse addresses, and the backfill fills rows saved without the parts.
+        """
+        rows = list(synthetic.generate_rows(5, seed=3))
+        importer.import_rows(rows)
+        for row, car_park in zip(rows, CarPark.objects.order_by("pk")):
+            self.assertTrue(row["address"].endswith(car_park.street))
+            self.assertIsNotNone(car_park.town)
+
+        CarPark.objects.update(block="", street="", town=None)
+        version = dataset.current_version()
+        out = io.StringIO()
+        call_command("backfill_addresses", batch_size=2, stdout=out)
+        self.assertIn("5 car parks", out.getvalue())
+        self.assertEqual(CarPark.objects.filter(street="").count(), 0)
+        self.assertEqual(CarPark.objects.filter(town=None).count(), 0)
+        self.assertNotEqual(dataset.current_version(), version)
+
+        call_command("backfill_addresses", stdout=out)
+        self.assertIn("0 car parks", out.getvalue())
+
+    def test_fixed_name_errors_are_parsed(self):
+        """
+        Test that repairing #NAME? addresses also refreshes the parsed street and town.
+        """
+        car_park = create_car_park("HE19", "#NAME?")
+        self.assertEqual((car_park.street, car_park.town), ("#NAME?", None))
+        version = dataset.current_version()
+        with redirect_stdout(io.StringIO()):
+            fix_name_errors()
+        car_park.refresh_from_db()
+        self.assertEqual((car_park.address, car_park.street, car_park.town.name),
+                         ("HENDERSON ROAD", "HENDERSON ROAD", "BUKIT MERAH"))
+        self.assertNotEqual(dataset.current_version(), version)
@@ -1,7 +1,8 @@
 from django.test import TestCase
 from rest_framework.test import APIClient
 from rest_framework import status
-from .models import CarPark
+
+from carparks.models import CarPark
 
 
 class CarParkAPITestCase(TestCase):
@@ -12,7 +13,7 @@ class CarParkAPITestCase(TestCase):
         self.client = APIClient()
 
         # Create sample car parks
-        CarPark.objects.create(
+        CarPark.objects.create_with_names(
             car_park_no="C001",
             address="BLK 308C ANG MO KIO AVENUE 1",
             x_coord=1.35735,
@@ -26,7 +27,7 @@ class CarParkAPITestCase(TestCase):
             gantry_height=2.1,
             car_park_basement=False,
         )
-        CarPark.objects.create(
+        CarPark.objects.create_with_names(
             car_park_no="C002",
             address="3 AND 7 DOVER ROAD",
             x_coord=1.30585,
@@ -139,3 +140,48 @@ class CarParkAPITestCase(TestCase):
         }
         response = self.client.post("/api/v1/carparks/create/", invalid_car_park, format="json")
         self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class CarParkQueryTestCase(TestCase):
+    setUp = CarParkAPITestCase.setUp
+
+    def test_combines_predicates(self):
+        """
+        Test that type, height, night parking, free parking and address combine.
+        """
+        response = self.client.get("/api/v1/carparks/query/", {
+            "type": "multi-storey car park",
+            "min_height": "2.0",
+            "night_parking": "true",
+            "free_parking": "true",
+            "address": "ang mo kio",
+        })
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["count"], 1)
+        self.assertEqual(response.data["results"][0]["car_park_no"], "C001")
+
+        response = self.client.get("/api/v1/carparks/query/", {"type": "MULTI-STOREY CAR PARK", "max_decks": "4"})
+        self.assertEqual(response.data["count"], 0)
+
+    def test_free_parking_false_and_basement(self):
+        """
+        Test negated boolean predicates.
+        """
+        response = self.client.get("/api/v1/carparks/query/", {"free_parking": "false", "car_park_basement": "false"})
+        self.assertEqual([row["car_park_no"] for row in response.data["results"]], ["C002"])
+
+    def test_pagination_and_ordering(self):
+        """
+        Test page size and ordering parameters.
+        """
+        response = self.client.get("/api/v1/carparks/query/", {"ordering": "-gantry_height", "page_size": 1})
+        self.assertEqual(response.data["count"], 2)
+        self.assertEqual(response.data["results"][0]["car_park_no"], "C001")
+        self.assertIsNotNone(response.data["next"])
+
+    def test_invalid_value_is_rejected(self):
+        """
+        Test that a malformed numeric filter returns 400.
+        """
+        response = self.client.get("/api/v1/carparks/query/", {"min_height": "tall"})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
@@ -0,0 +1,236 @@
+from datetime import timedelta
+from unittest import mock
+
+from django.core.cache import cache
+from django.test import TestCase
+from django.utils.dateparse import parse_datetime
+from rest_framework import status
+
+from carparks import availability, dataset, rollups, synthetic
+from carparks.models import AvailabilityRollup, AvailabilitySample, CarPark, CarParkAvailability
+
+from .helpers import create_car_park
+
+
+class AvailabilityTestCase(TestCase):
+    URL = "/api/v1/carparks/availability/"
+
+    @classmethod
+    def setUpTestData(cls):
+        synthetic.seed_database(50, seed=8)
+        cls.carparks = list(CarPark.objects.order_by("pk")[:3])
+
+    def setUp(self):
+        availability.reset()
+        self.addCleanup(availability.reset)
+
+    def _post(self, payload):
+        return self.client.post(self.URL, payload, content_type="application/json")
+
+    def _snapshot(self, observed_at, available):
+        return {"observed_at": observed_at, "items": [
+            {"car_park_no": carpark.car_park_no, "total_lots": 100, "available_lots": available + i}
+            for i, carpark in enumerate(self.carparks)
+        ]}
+
+    def test_ingest_snapshot_and_read_latest(self):
+        """
+        Test that a snapshot lands in the time series and the latest table.
+        """
+        response = self._post(self._snapshot("2024-05-01T08:00:00Z", 10))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.json(), {"received": 3, "stored": 3, "latest_updated": 3,
+                                           "unknown_car_parks": [], "rejected": []})
+        self._post(self._snapshot("2024-05-01T08:01:00Z", 20))
+        self.assertEqual(AvailabilitySample.objects.count(), 6)
+
+        latest = {row["id"]: row["availability"] for row in self.client.get(self.URL).json()}
+        self.assertEqual(latest[self.carparks[1].pk]["C"],
+                         {"total_lots": 100, "available_lots": 21, "observed_at": "2024-05-01T08:01:00Z"})
+
+    def test_late_and_repeated_readings(self):
+        """
+        Test that old readings don't regress the latest value and re-posts are no-ops.
+        """
+        self._post(self._snapshot("2024-05-01T08:05:00Z", 50))
+        late = self._post(self._snapshot("2024-05-01T08:00:00Z", 1)).json()
+        self.assertEqual((late["stored"], late["latest_updated"]), (3, 0))
+        repeated = self._post(self._snapshot("2024-05-01T08:05:00Z", 50)).json()
+        self.assertEqual((repeated["received"], repeated["stored"], repeated["latest_updated"]), (3, 0, 0))
+        self.assertEqual(AvailabilitySample.objects.count(), 6)
+        latest = {row["id"]: row["availability"] for row in self.client.get(self.URL).json()}
+        self.assertEqual(latest[self.carparks[0].pk]["C"]["available_lots"], 50)
+
+    def test_latest_compares_times_in_the_upsert(self):
+        """
+        Test that the upsert itself keeps the newer value, down to fractions of a second.
+        """
+        self._post(self._snapshot("2024-05-01T08:00:00.500000Z", 50))
+        # A stale snapshot that read nothing stored (as a concurrent ingest might) still loses
+        stale = availability.parse_snapshot(self._snapshot("2024-05-01T08:00:00Z", 1))[0]
+        self.assertEqual(availability.ingest(stale).latest_updated, 0)
+        self.assertEqual(set(CarParkAvailability.objects.values_list("available_lots", flat=True)), {50, 51, 52})
+        self.assertEqual(self._post(self._snapshot("2024-05-01T08:00:01Z", 5)).json()["latest_updated"], 3)
+
+    def test_shared_car_park_no_goes_to_the_oldest_row(self):
+        """
+        Test that a car_park_no used by several rows maps its readings to the lowest id.
+        """
+        first = self.carparks[0]
+        second = create_car_park(first.car_park_no, f"{first.address} ANNEX")
+        self._post(self._snapshot("2024-05-01T08:00:00Z", 10))
+        self.assertTrue(CarParkAvailability.objects.filter(carpark=first).exists())
+        self.assertFalse(CarParkAvailability.objects.filter(carpark=second).exists())
+
+    def test_unknown_and_invalid_items(self):
+        """
+        Test that bad items are reported without failing the rest of the snapshot.
+        """
+        body = self._post([
+            {"car_park_no": self.carparks[0].car_park_no, "lot_type": "Y", "total_lots": 20, "available_lots": 3},
+            {"car_park_no": "NOPE", "total_lots": 5, "available_lots": 1},
+            {"car_park_no": self.carparks[1].car_park_no, "total_lots": -1, "available_lots": 1},
+            {"car_park_no": self.carparks[1].car_park_no, "lot_type": "Z", "total_lots": 1, "available_lots": 1},
+        ]).json()
+        self.assertEqual((body["received"], body["stored"], body["unknown_car_parks"]), (4, 1, ["NOPE"]))
+        self.assertEqual([item["index"] for item in body["rejected"]], [2, 3])
+        self.assertEqual(self._post({"items": "nope"}).status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(self._post({"observed_at": "yesterday", "items": []}).status_code,
+                         status.HTTP_400_BAD_REQUEST)
+
+    def test_embedding_leaves_carpark_caches_alone(self):
+        """
+        Test ?include=availability on list endpoints, without touching CarPark rows.
+        """
+        version = dataset.current_version()
+        self._post(self._snapshot("2024-05-01T08:00:00Z", 10))
+        self.assertEqual(dataset.current_version(), version)
+
+        rows = self.client.get("/api/v1/carparks/", {"include": "availability"}).json()
+        by_id = {row["id"]: row["availability"] for row in rows}
+        self.assertEqual(by_id[self.carparks[2].pk]["C"]["available_lots"], 12)
+        self.assertEqual(sum(1 for lots in by_id.values() if lots), 3)
+        self.assertNotIn("availability", self.client.get("/api/v1/carparks/").json()[0])
+
+        page = self.client.get("/api/v1/carparks/query/", {"include": "availability", "ordering": "car_park_no"}).json()
+        self.assertIn("availability", page["results"][0])
+
+
+class AvailabilityRollupTestCase(TestCase):
+    START = "2024-05-01T00:00:00Z"
+
+    @classmethod
+    def setUpTestData(cls):
+        synthetic.seed_database(5, seed=9)
+        cls.carpark = CarPark.objects.order_by("pk").first()
+        cls.start = parse_datetime(cls.START)
+        # Two days of readings every 5 minutes: available_lots is the minute of the hour
+        cls.samples = [
+            AvailabilitySample(carpark=cls.carpark, lot_type="C", total_lots=100,
+                               available_lots=minute % 60, observed_at=cls.start + timedelta(minutes=minute))
+            for minute in range(0, 2 * 24 * 60, 5)
+        ]
+        AvailabilitySample.objects.bulk_create(cls.samples)
+
+    def _rollup(self, resolution, hours):
+        return AvailabilityRollup.objects.get(carpark=self.carpark, resolution=resolution,
+                                              bucket_start=self.start + timedelta(hours=hours))
+
+    def test_rollups_aggregate_each_level_from_the_one_below(self):
+        """
+        Test 15-minute, hourly and daily buckets, and that only ended buckets are written.
+        """
+        now = self.start + timedelta(days=1, hours=1, minutes=20)
+        written = rollups.run(now, prune_expired=False)
+        # 15m: every bucket up to 01:15 on day 2; 1h: up to 01:00; 1d: day 1 only
+        self.assertEqual(written, {"15m": 24 * 4 + 5, "1h": 25, "1d": 1})
+        quarter = self._rollup("15m", 0.25)  # 00:15-00:30 holds minutes 15, 20, 25
+        self.assertEqual((quarter.samples, quarter.sum_available, quarter.min_available, quarter.max_available),
+                         (3, 60, 15, 25))
+        day = self._rollup("1d", 0)
+        self.assertEqual((day.samples, day.sum_available, day.min_available, day.max_available, day.total_lots),
+                         (288, 24 * 330, 0, 55, 100))
+
+        # Re-running is idempotent and picks up from the watermark
+        rollups.run(now, prune_expired=False)
+        self.assertEqual(AvailabilityRollup.objects.filter(resolution="1d").count(), 1)
+        rollups.run(self.start + timedelta(days=3), prune_expired=False)
+        self.assertEqual(AvailabilityRollup.objects.filter(resolution="1d").count(), 2)
+        self.assertEqual(AvailabilityRollup.objects.filter(resolution="15m").count(), 2 * 24 * 4)
+
+    def test_retention_keeps_what_is_not_rolled_up(self):
+        """
+        Test that pruning respects retention and never outruns the next level's watermark.
+        """
+        retention = {"raw": 1, "15m": 1, "1h": 1, "1d": None}
+        with self.settings(AVAILABILITY_RETENTION_DAYS=retention):
+            # Nothing rolled up yet: nothing may go
+            self.assertEqual(rollups.prune(self.start + timedelta(days=30)), {})
+            rollups.run(self.start + timedelta(days=30))
+        self.assertEqual(AvailabilityRollup.objects.filter(resolution="1d").count(), 2)
+        # Everything below daily is past retention; each level keeps what the next
+        # run of the level above re-aggregates (its last two buckets)
+        self.assertEqual(AvailabilitySample.objects.count(), 6)
+        self.assertEqual(AvailabilityRollup.objects.filter(resolution="15m").count(), 8)
+        self.assertEqual(AvailabilityRollup.objects.filter(resolution="1h").count(), 48)
+
+    def test_run_if_due_once_per_bucket_across_processes(self):
+        """
+        Test that ingest-triggered rollups claim each bucket in the shared cache.
+        """
+        cache.clear()
+        self.addCleanup(cache.clear)
+        self.addCleanup(rollups.reset)
+        with mock.patch.object(rollups, "run", side_effect=[RuntimeError("db away"), {}]) as run:
+            with self.assertLogs("carparks.rollups", "ERROR"):
+                rollups.run_if_due()  # fails, releasing its claim
+            rollups.run_if_due()  # retries
+            rollups.reset()  # another process: no local memory of the run, but the claim is shared
+            rollups.run_if_due()
+        self.assertEqual(run.call_count, 2)
+
+    def test_choose_resolution(self):
+        """
+        Test that the finest resolution within max_points and retention is picked.
+        """
+        now = self.start + timedelta(days=100)
+        end = now
+        self.assertEqual(rollups.choose_resolution(end - timedelta(hours=2), end, 500, now), "raw")
+        self.assertEqual(rollups.choose_resolution(end - timedelta(days=1), end, 500, now), "15m")
+        self.assertEqual(rollups.choose_resolution(end - timedelta(days=14), end, 500, now), "1h")
+        self.assertEqual(rollups.choose_resolution(end - timedelta(days=90), end, 500, now), "1d")
+        # Raw would fit, but is no longer retained that far back
+        old = now - timedelta(days=30)
+        self.assertEqual(rollups.choose_resolution(old, old + timedelta(hours=2), 500, now), "15m")
+
+    def test_history_endpoint(self):
+        """
+        Test the history API, including buckets not rolled up yet.
+        """
+        url = f"/api/v1/carparks/{self.carpark.pk}/availability/"
+        # Roll up the first day only; the second is aggregated from raw samples at query time
+        rollups.run(self.start + timedelta(days=1), prune_expired=False)
+        with self.settings(AVAILABILITY_RETENTION_DAYS={"raw": 10000, "15m": 10000, "1h": 10000, "1d": None}):
+            body = self.client.get(url, {"start": self.START, "end": "2024-05-03T00:00:00Z"}).json()
+        self.assertEqual(body["resolution"], "15m")
+        self.assertEqual(len(body["points"]), 2 * 24 * 4)
+        self.assertEqual(body["points"][0], {"t": "2024-05-01T00:00:00Z", "avg_available": 5.0, "min_available": 0,
+                                             "max_available": 10, "total_lots": 100, "samples": 3})
+        self.assertEqual(body["points"][-1]["t"], "2024-05-02T23:45:00Z")
+
+        daily = self.client.get(url, {"start": self.START, "end": "2024-05-03T00:00:00Z",
+                                      "resolution": "1d"}).json()
+        self.assertEqual([point["avg_available"] for point in daily["points"]], [27.5, 27.5])
+        raw = self.client.get(url, {"start": self.START, "end": "2024-05-01T01:00:00Z", "resolution": "raw"}).json()
+        self.assertEqual(len(raw["points"]), 12)
+        # 5000 one-minute readings is under four days; explicit resolutions are bounded too
+        too_long = self.client.get(url, {"start": self.START, "end": "2024-05-05T00:00:00Z", "resolution": "raw"})
+        self.assertEqual(too_long.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn("5000 points", too_long.json()["error"])
+
+        for params in ({"start": "soon"}, {"lot_type": "Z"}, {"resolution": "5m"}, {"max_points": "x"},
+                       {"start": "2024-05-02T00:00:00Z", "end": self.START}):
+            with self.subTest(params=params):
+                self.assertEqual(self.client.get(url, params).status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(self.client.get("/api/v1/carparks/999999/availability/").status_code,
+                         status.HTTP_404_NOT_FOUND)
@@ -0,0 +1,196 @@
+import gzip
+import threading
+
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from rest_framework import status
+
+from carparks import dataset, prerender, singleflight, synthetic
+from carparks.models import CarPark
+
+from .helpers import create_car_park
+
+
+class PrerenderedResponseTestCase(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        synthetic.seed_database(200, seed=5)
+
+    def setUp(self):
+        prerender.reset()
+        self.addCleanup(prerender.reset)
+
+    def test_bytes_match_the_drf_rendering(self):
+        """
+        Test that pre-rendered bodies are exactly what DRF would render.
+        """
+        for path in ("/api/v1/carparks/", "/api/v1/carparks/types/"):
+            with self.subTest(path=path):
+                fast = self.client.get(path)
+                with override_settings(PRERENDER_ENABLED=False):
+                    slow = self.client.get(path)
+                self.assertEqual(fast.content, slow.content)
+                self.assertEqual(fast["Content-Type"], slow["Content-Type"])
+                self.assertEqual(fast["Content-Length"], str(len(fast.content)))
+                self.assertIn("ETag", fast)
+                self.assertNotIn("ETag", slow)
+
+    def test_compressed_variants(self):
+        """
+        Test that gzip and brotli are negotiated from Accept-Encoding.
+        """
+        plain = self.client.get("/api/v1/carparks/").content
+        response = self.client.get("/api/v1/carparks/", HTTP_ACCEPT_ENCODING="gzip, deflate")
+        self.assertEqual(response["Content-Encoding"], "gzip")
+        self.assertEqual(gzip.decompress(response.content), plain)
+        self.assertLess(len(response.content), len(plain))
+        self.assertIn("Accept-Encoding", response["Vary"])
+        response = self.client.get("/api/v1/carparks/", HTTP_ACCEPT_ENCODING="gzip;q=0")
+        self.assertNotIn("Content-Encoding", response)
+        if prerender.brotli is not None:
+            response = self.client.get("/api/v1/carparks/", HTTP_ACCEPT_ENCODING="gzip, br")
+            self.assertEqual(response["Content-Encoding"], "br")
+            self.assertEqual(prerender.brotli.decompress(response.content), plain)
+
+    def test_if_none_match_returns_304(self):
+        """
+        Test conditional requests against the current and a stale ETag.
+        """
+        etag = self.client.get("/api/v1/carparks/")["ETag"]
+        response = self.client.get("/api/v1/carparks/", HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.content, b"")
+        CarPark.objects.first().delete()
+        response = self.client.get("/api/v1/carparks/", HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(response["ETag"], etag)
+        self.assertEqual(len(response.json()), 199)
+
+    def test_warm_requests_skip_the_database(self):
+        """
+        Test that a warm payload is served without any SQL.
+        """
+        self.client.get("/api/v1/carparks/")
+        with self.assertNumQueries(0):
+            self.client.get("/api/v1/carparks/", HTTP_ACCEPT_ENCODING="gzip")
+
+    def test_browsable_api_and_filters_are_rendered_normally(self):
+        """
+        Test that only plain JSON requests without filters are pre-rendered.
+        """
+        response = self.client.get("/api/v1/carparks/", HTTP_ACCEPT="text/html")
+        self.assertNotIn("ETag", response)
+        self.assertIn("ETag", self.client.get("/api/v1/carparks/", {"format": "json"}))
+        self.assertNotIn("ETag", self.client.get("/api/v1/carparks/types/", {"unexpected": "1"}))
+
+
+class SingleFlightTestCase(TestCase):
+    def setUp(self):
+        singleflight.reset()
+        cache.clear()
+        self.addCleanup(singleflight.reset)
+
+    def _add_car_park(self, number):
+        create_car_park(f"SF{number}", f"BLK {number} FLIGHT ROAD")
+
+    def _race(self, threads, target):
+        workers = [threading.Thread(target=target) for _ in range(threads)]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+
+    def test_concurrent_callers_share_one_computation(self):
+        """
+        Test that threads asking for the same value while it is computed wait for it.
+        """
+        release, calls, results = threading.Event(), [], []
+
+        def compute():
+            calls.append(1)
+            release.wait(2)
+            return ["computed"]
+
+        def call():
+            results.append(singleflight.coalesce("key", compute))
+
+        threading.Timer(0.1, release.set).start()
+        self._race(8, call)
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(results, [["computed"]] * 8)
+
+    def test_values_are_computed_once_per_dataset_version(self):
+        """
+        Test that get() reuses a value until the dataset changes.
+        """
+        calls = []
+
+        def compute():
+            calls.append(1)
+            return len(calls)
+
+        self.assertEqual(singleflight.get("value", compute), 1)
+        self.assertEqual(singleflight.get("value", compute), 1)
+        self._add_car_park(1)
+        self.assertEqual(singleflight.get("value", compute), 2)
+
+    def test_stale_value_is_served_while_revalidating(self):
+        """
+        Test that with stale-while-revalidate only the leader waits for the recompute.
+        """
+        singleflight.get("value", lambda: "old")
+        self._add_car_park(2)
+        dataset.current_version()  # memoised for the leader thread, which can't see this transaction
+        started, release, results = threading.Event(), threading.Event(), []
+
+        def slow():
+            started.set()
+            release.wait(2)
+            return "new"
+
+        with override_settings(CARPARK_STALE_WHILE_REVALIDATE=True):
+            leader = threading.Thread(target=lambda: results.append(singleflight.get("value", slow)))
+            leader.start()
+            started.wait(2)
+            follower = singleflight.get("value", slow)
+            release.set()
+            leader.join()
+        self.assertEqual(follower, "old")
+        self.assertEqual(results, ["new"])
+        self.assertEqual(singleflight.get("value", slow), "new")
+
+    def test_shared_value_published_by_another_worker_is_reused(self):
+        """
+        Test that with CARPARK_COALESCE_SHARED a value already in the cache is not recomputed.
+        """
+        version = dataset.current_version()
+        cache.set(f"{singleflight.KEY_PREFIX}:value", (version, "from another worker"))
+        with override_settings(CARPARK_COALESCE_SHARED=True):
+            value = singleflight.get("value", lambda: self.fail("recomputed a shared value"))
+        self.assertEqual(value, "from another worker")
+
+    def test_shared_lock_holder_is_waited_for(self):
+        """
+        Test that a worker finding the shared lock taken polls for the published value.
+        """
+        version = dataset.current_version()
+        key = f"{singleflight.KEY_PREFIX}:value"
+        cache.add(f"{key}:lock", version)
+        threading.Timer(0.1, cache.set, args=(key, (version, "published"))).start()
+        with override_settings(CARPARK_COALESCE_SHARED=True):
+            value = singleflight.get("value", lambda: self.fail("computed while the lock was held"))
+        self.assertEqual(value, "published")
+
+    def test_aggregate_endpoints_are_coalesced(self):
+        """
+        Test that a burst of aggregate requests after a change runs the aggregate once.
+        """
+        self._add_car_park(3)
+        self.client.get("/api/v1/carparks/average-gantry-height/")
+        with CaptureQueriesContext(connection) as captured:
+            for _ in range(3):
+                response = self.client.get("/api/v1/carparks/average-gantry-height/")
+        self.assertEqual(response.data["average_height"], 2.0)
+        self.assertFalse([q for q in captured.captured_queries if "AVG" in q["sql"]])
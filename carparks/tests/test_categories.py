@@ -0,0 +1,96 @@
+from django.test import TestCase
+from rest_framework.test import APIClient
+from rest_framework import status
+
+from carparks import views
+from carparks.models import CarParkType, ParkingSystem
+from carparks.serializers import CarParkSerializer
+
+from .helpers import create_car_park
+
+
+class CategoryLookupTestCase(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.car_park = create_car_park("L001", "BLK 1 LOOKUP ROAD")
+
+    def test_api_reads_and_writes_names(self):
+        """
+        Test that the API still speaks in category names, adding lookup rows only for new ones.
+        """
+        detail = self.client.get(f"/api/v1/carparks/{self.car_park.pk}/").data
+        self.assertEqual(detail["car_park_type"], "SURFACE CAR PARK")
+        self.assertEqual(detail["free_parking"], "NO")
+
+        payload = {
+            "car_park_no": "L002",
+            "address": "BLK 2 LOOKUP ROAD",
+            "car_park_type": "MECHANISED CAR PARK",
+            "type_of_parking_system": "ELECTRONIC PARKING",
+            "short_term_parking": "WHOLE DAY",
+            "free_parking": "NO",
+            "gantry_height": 2.1,
+        }
+        response = self.client.post("/api/v1/carparks/create/", payload, format="json")
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.data["car_park_type"], "MECHANISED CAR PARK")
+        self.assertEqual(CarParkType.objects.count(), 2)
+
+        response = self.client.post(
+            "/api/v1/carparks/create/", dict(payload, car_park_no="L003"), format="json"
+        )
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(CarParkType.objects.count(), 2)
+
+        response = self.client.post(
+            "/api/v1/carparks/create/", dict(payload, car_park_no="L004", car_park_type=""), format="json"
+        )
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn("car_park_type", response.data)
+
+    def test_invalid_requests_add_no_lookup_rows(self):
+        """
+        Test that a request failing validation leaves the lookup tables alone.
+        """
+        serializer = CarParkSerializer(data={
+            "car_park_no": "L009", "address": "BLK 9 LOOKUP ROAD", "x_coord": 1.3, "y_coord": 103.8,
+            "car_park_type": "JUNK TYPE", "type_of_parking_system": "JUNK SYSTEM", "short_term_parking": "NO",
+            "free_parking": "NO", "gantry_height": "not a height",
+        })
+        self.assertFalse(serializer.is_valid())
+        response = self.client.patch(
+            f"/api/v1/carparks/{self.car_park.pk}/", {"car_park_type": "JUNK TYPE", "gantry_height": "x"},
+            format="json",
+        )
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertFalse(CarParkType.objects.filter(name="JUNK TYPE").exists())
+        self.assertFalse(ParkingSystem.objects.filter(name="JUNK SYSTEM").exists())
+
+        response = self.client.patch(
+            f"/api/v1/carparks/{self.car_park.pk}/", {"car_park_type": "BASEMENT CAR PARK"}, format="json"
+        )
+        self.assertEqual(response.data["car_park_type"], "BASEMENT CAR PARK")
+        self.assertTrue(CarParkType.objects.filter(name="BASEMENT CAR PARK").exists())
+
+    def test_types_skip_unused_lookups(self):
+        """
+        Test that a type no car park uses any more is left out of the types list.
+        """
+        second = create_car_park("L002", "BLK 2 LOOKUP ROAD", car_park_type="BASEMENT CAR PARK",
+                                 car_park_basement=True)
+        self.assertEqual(views._load_car_park_types(), ["BASEMENT CAR PARK", "SURFACE CAR PARK"])
+        second.delete()
+        self.assertEqual(views._load_car_park_types(), ["SURFACE CAR PARK"])
+
+    def test_filters_match_names_case_insensitively(self):
+        """
+        Test that type and free parking filters still match on the category names.
+        """
+        response = self.client.get("/api/v1/carparks/filter/", {"type": "surface car park"})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.data), 1)
+        response = self.client.get("/api/v1/carparks/query/", {"type": "Surface Car Park", "free_parking": "false"})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["count"], 1)
+        response = self.client.get("/api/v1/carparks/query/", {"free_parking": "true"})
+        self.assertEqual(response.data["count"], 0)
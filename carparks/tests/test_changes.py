@@ -0,0 +1,192 @@
+import json
+
+from asgiref.sync import async_to_sync, sync_to_async
+from asgiref.testing import ApplicationCommunicator
+from django.test import TestCase, override_settings
+from rest_framework import status
+
+from AdvancedWebDevelopment.asgi import application
+from carparks import events, synthetic
+from carparks.changes import encode_token
+from carparks.models import CarPark
+
+from .helpers import create_car_park
+
+
+@override_settings(CARPARK_CHANGES_SETTLE_SECONDS=0)
+class ChangesFeedTestCase(TestCase):
+    URL = "/api/v1/carparks/changes/"
+
+    @classmethod
+    def setUpTestData(cls):
+        synthetic.seed_database(120, seed=7)
+
+    def _sync(self, since=None, limit=50):
+        """Follow the feed to the end, returning (upserted ids, deleted ids, token, pages)."""
+        upserts, deletes, pages = [], [], 0
+        while True:
+            params = {"limit": limit, **({"since": since} if since else {})}
+            body = self.client.get(self.URL, params).json()
+            pages += 1
+            upserts += [row["id"] for row in body["upserts"]]
+            deletes += [row["id"] for row in body["deletes"]]
+            since = body["next"]
+            if not body["has_more"]:
+                return upserts, deletes, since, pages
+
+    def test_full_then_incremental_sync(self):
+        """
+        Test that a mirror built from the feed tracks creates, updates and deletes.
+        """
+        upserts, deletes, token, pages = self._sync()
+        self.assertEqual(sorted(upserts), sorted(CarPark.objects.values_list("pk", flat=True)))
+        self.assertEqual((deletes, pages), ([], 3))
+        self.assertEqual(self._sync(token)[:2], ([], []))
+
+        updated, deleted = CarPark.objects.order_by("pk")[:2]
+        updated.address = "BLK 1 CHANGED ROAD"
+        updated.save()
+        deleted_pk = deleted.pk
+        deleted.delete()
+        created = self.client.post("/api/v1/carparks/create/", {
+            "address": "BLK 2 NEW ROAD", "car_park_type": "SURFACE CAR PARK",
+        }).json()
+
+        body = self.client.get(self.URL, {"since": token}).json()
+        self.assertEqual([row["id"] for row in body["upserts"]], [updated.pk, created["id"]])
+        self.assertEqual(body["upserts"][0]["address"], "BLK 1 CHANGED ROAD")
+        self.assertEqual([(row["id"], row["car_park_no"]) for row in body["deletes"]],
+                         [(deleted_pk, deleted.car_park_no)])
+        self.assertFalse(body["has_more"])
+
+    def test_settle_window_holds_back_fresh_changes(self):
+        """
+        Test that changes newer than the settle window wait for the next pull.
+        """
+        token = self._sync()[2]
+        CarPark.objects.order_by("pk").first().save()
+        with override_settings(CARPARK_CHANGES_SETTLE_SECONDS=60):
+            body = self.client.get(self.URL, {"since": token}).json()
+        self.assertEqual((body["upserts"], body["next"]), ([], token))
+        self.assertEqual(len(self.client.get(self.URL, {"since": token}).json()["upserts"]), 1)
+
+    def test_invalid_parameters(self):
+        """
+        Test that malformed tokens and limits are rejected.
+        """
+        for params in ({"since": "not-a-token"}, {"limit": "many"}):
+            with self.subTest(params=params):
+                response = self.client.get(self.URL, params)
+                self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+                self.assertIn("error", response.json())
+
+
+class ServerSentEventsTestCase(TestCase):
+    def setUp(self):
+        events.reset()
+        self.addCleanup(events.reset)
+
+    def _scope(self, headers=(), method="GET"):
+        return {"type": "http", "method": method, "path": "/api/v1/carparks/stream/",
+                "headers": list(headers), "query_string": b""}
+
+    def _create(self, number):
+        with self.captureOnCommitCallbacks(execute=True):
+            return create_car_park(f"SSE{number}", f"BLK {number} STREAM ROAD")
+
+    def _delete(self, carpark):
+        with self.captureOnCommitCallbacks(execute=True):
+            carpark.delete()
+
+    def _stream(self, scope, scenario):
+        """Run ``scenario(communicator)`` against the ASGI app, then disconnect."""
+        async def run():
+            communicator = ApplicationCommunicator(application, scope)
+            await communicator.send_input({"type": "http.request"})
+            try:
+                return await scenario(communicator)
+            finally:
+                await communicator.send_input({"type": "http.disconnect"})
+                await communicator.wait(1)
+
+        return async_to_sync(run)()
+
+    @staticmethod
+    async def _frame(communicator):
+        return (await communicator.receive_output(2))["body"]
+
+    @staticmethod
+    def _parse(frame):
+        fields = dict(line.split(": ", 1) for line in frame.decode().strip().split("\n"))
+        fields["data"] = json.loads(fields["data"])
+        return fields
+
+    def test_live_create_update_delete(self):
+        """
+        Test that committed writes are pushed to a connected subscriber.
+        """
+        async def scenario(communicator):
+            start = await communicator.receive_output(2)
+            self.assertEqual(start["status"], 200)
+            self.assertIn((b"content-type", b"text/event-stream"), start["headers"])
+            self.assertEqual(await self._frame(communicator), b"retry: 3000\n\n")
+            carpark = await sync_to_async(self._create)(1)
+            created = self._parse(await self._frame(communicator))
+            await sync_to_async(self._delete)(carpark)
+            deleted = self._parse(await self._frame(communicator))
+            return created, deleted
+
+        created, deleted = self._stream(self._scope(), scenario)
+        self.assertEqual((created["event"], created["data"]["address"]), ("upsert", "BLK 1 STREAM ROAD"))
+        self.assertEqual((deleted["event"], deleted["data"]["car_park_no"]), ("delete", "SSE1"))
+        self.assertEqual(deleted["data"]["id"], created["data"]["id"])
+
+    def test_last_event_id_replays_missed_changes(self):
+        """
+        Test that a reconnecting client gets everything after its last event id.
+        """
+        seen = self._create(1)
+        missed = self._create(2)
+        gone = self._create(3)
+        gone_pk = gone.pk
+        self._delete(gone)
+        token = encode_token(seen.updated_at, seen.pk).encode()
+
+        async def scenario(communicator):
+            await communicator.receive_output(2)
+            await self._frame(communicator)
+            return [self._parse(await self._frame(communicator)) for _ in range(2)]
+
+        frames = self._stream(self._scope(headers=[(b"last-event-id", token)]), scenario)
+        self.assertEqual([(frame["event"], frame["data"]["id"]) for frame in frames],
+                         [("upsert", missed.pk), ("delete", gone_pk)])
+
+    @override_settings(CARPARK_EVENTS_HEARTBEAT_SECONDS=0.01, CARPARK_EVENTS_MAX_QUEUED=1)
+    def test_keepalive_and_slow_subscribers(self):
+        """
+        Test idle keepalives, and that a subscriber that falls behind is told to resync.
+        """
+        async def scenario(communicator):
+            await communicator.receive_output(2)
+            await self._frame(communicator)
+            keepalive = await self._frame(communicator)
+            broker = events.get_broker()
+            for number in range(3):
+                broker.publish(events.Event(f"t{number}", "upsert", b"{}"))
+            return keepalive, [await self._frame(communicator) for _ in range(2)]
+
+        keepalive, frames = self._stream(self._scope(), scenario)
+        self.assertEqual(keepalive, b": keepalive\n\n")
+        self.assertEqual(frames, [b"id: t0\nevent: upsert\ndata: {}\n\n", b"event: reset\ndata: {}\n\n"])
+        self.assertFalse(events.get_broker().wants_events())
+
+    def test_rejects_bad_requests_and_passes_other_paths_to_django(self):
+        """
+        Test invalid Last-Event-ID and methods, and that other paths still reach Django.
+        """
+        async def status_of(communicator):
+            return (await communicator.receive_output(2))["status"]
+
+        self.assertEqual(self._stream(self._scope(headers=[(b"last-event-id", b"!!")]), status_of), 400)
+        self.assertEqual(self._stream(self._scope(method="POST"), status_of), 405)
+        self.assertEqual(self._stream(dict(self._scope(), path="/healthz/"), status_of), 200)
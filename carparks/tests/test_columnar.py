@@ -0,0 +1,71 @@
+from django.test import TestCase, override_settings
+
+from carparks import columnar, synthetic
+from carparks.models import CarPark
+
+
+class ColumnarReadEngineTestCase(TestCase):
+    ENDPOINTS = [
+        ("/api/v1/carparks/", {}),
+        ("/api/v1/carparks/", {"town": "ang mo kio"}),
+        ("/api/v1/carparks/types/", {}),
+        ("/api/v1/carparks/filter/", {"type": "multi-storey car park"}),
+        ("/api/v1/carparks/free-parking/", {}),
+        ("/api/v1/carparks/height-range/", {"min_height": "1.9", "max_height": "2.15"}),
+        ("/api/v1/carparks/search/", {"address": "ang mo kio"}),
+        ("/api/v1/carparks/average-gantry-height/", {}),
+    ]
+
+    @classmethod
+    def setUpTestData(cls):
+        synthetic.seed_database(300, seed=4)
+
+    def setUp(self):
+        columnar.reset()
+        self.addCleanup(columnar.reset)
+
+    def _get(self, engine, path, params):
+        with override_settings(CARPARK_READ_ENGINE=engine):
+            return self.client.get(path, params).json()
+
+    def test_responses_match_the_orm(self):
+        """
+        Test that every snapshot-backed endpoint returns what the ORM returns.
+        """
+        for path, params in self.ENDPOINTS:
+            with self.subTest(path=path):
+                expected = self._get("orm", path, params)
+                actual = self._get("columnar", path, params)
+                if "average_height" in expected:
+                    self.assertAlmostEqual(actual["average_height"], expected["average_height"])
+                else:
+                    self.assertEqual(actual, expected)
+        key = "type_of_parking_system"
+        expected = sorted(self._get("orm", "/api/v1/carparks/group-by-system/", {}), key=lambda row: row[key])
+        self.assertEqual(self._get("columnar", "/api/v1/carparks/group-by-system/", {}), expected)
+        expected = self._get("orm", "/api/v1/carparks/group-by-town/", {})
+        self.assertEqual(self._get("columnar", "/api/v1/carparks/group-by-town/", {}), expected)
+
+    def test_snapshot_refreshes_after_writes(self):
+        """
+        Test that a write invalidates the snapshot and the next read sees it.
+        """
+        with override_settings(CARPARK_READ_ENGINE="columnar"):
+            first = columnar.get_snapshot()
+            self.assertIs(columnar.get_snapshot(), first)
+            CarPark.objects.filter(pk=CarPark.objects.first().pk).delete()
+            second = columnar.get_snapshot()
+        self.assertIsNot(second, first)
+        self.assertEqual(len(second), len(first) - 1)
+
+    def test_stale_snapshot_falls_back_to_the_orm(self):
+        """
+        Test that requests are served by the ORM while another thread rebuilds.
+        """
+        with override_settings(CARPARK_READ_ENGINE="columnar"):
+            columnar.get_snapshot()
+            CarPark.objects.first().delete()
+            with columnar._build_lock:
+                self.assertIsNone(columnar.get_snapshot())
+                response = self.client.get("/api/v1/carparks/")
+        self.assertEqual(len(response.json()), 299)
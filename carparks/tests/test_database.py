@@ -0,0 +1,107 @@
+import time
+from pathlib import Path
+from unittest import mock
+
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connection
+from django.db.backends.sqlite3.base import DatabaseWrapper
+from django.http import HttpResponse
+from django.test import RequestFactory, SimpleTestCase, TestCase, override_settings
+from rest_framework import status
+
+from AdvancedWebDevelopment import db, health
+from AdvancedWebDevelopment import settings as project_settings
+from carparks.models import CarPark
+
+from .helpers import temporary_directory
+
+
+class DatabasePoolSettingsTestCase(TestCase):
+    def test_pool_options_applied_to_postgres_url(self):
+        """
+        Test that DB_POOL swaps persistent connections for a psycopg3 pool.
+        """
+        with mock.patch.object(project_settings, "DB_POOL_ENABLED", True):
+            config = project_settings._database_from_url("postgresql://u:p@localhost:5432/db")
+        self.assertEqual(config["CONN_MAX_AGE"], 0)
+        self.assertEqual(config["OPTIONS"]["pool"], project_settings.DB_POOL_OPTIONS)
+        self.assertTrue(config["CONN_HEALTH_CHECKS"])
+
+        with mock.patch.object(project_settings, "DB_POOL_ENABLED", False):
+            config = project_settings._database_from_url("postgresql://u:p@localhost:5432/db")
+        self.assertNotIn("pool", config.get("OPTIONS", {}))
+        self.assertEqual(config["CONN_MAX_AGE"], project_settings.DB_CONN_MAX_AGE)
+
+    def test_sqlite_performance_profile(self):
+        """
+        Test that the tuned SQLite options apply WAL, the pragmas and BEGIN IMMEDIATE.
+        """
+        tuned = DatabaseWrapper({
+            **connection.settings_dict,
+            "NAME": str(Path(temporary_directory(self)) / "tuned.sqlite3"),
+            "OPTIONS": dict(project_settings.SQLITE_TUNED_OPTIONS),
+        }, alias="tuned")
+        self.addCleanup(tuned.close)
+        with tuned.cursor() as cursor:
+            pragmas = {}
+            for name in ("journal_mode", "synchronous", "busy_timeout", "cache_size", "temp_store"):
+                cursor.execute(f"PRAGMA {name}")
+                pragmas[name] = cursor.fetchone()[0]
+        self.assertEqual(pragmas, {"journal_mode": "wal", "synchronous": 1, "busy_timeout": 5000,
+                                   "cache_size": -64 * 1024, "temp_store": 2})
+        self.assertEqual(tuned.transaction_mode, "IMMEDIATE")
+
+    def test_health_reports_pool_stats(self):
+        """
+        Test that the health endpoint exposes pool statistics (null without a pool).
+        """
+        health.reset_cache()
+        response = self.client.get("/health/")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertIn("pool", response.json()["checks"]["database"])
+        self.assertIsNone(response.json()["checks"]["database"]["pool"])
+
+
+@override_settings(DATABASE_REPLICA_ALIASES=["replica_1", "replica_2"], DATABASE_PIN_SECONDS=5)
+class ReplicaRoutingTestCase(SimpleTestCase):
+    def test_router_sends_reads_to_replicas(self):
+        """
+        Test that reads go to a replica unless pinned, and writes and migrations stay on default.
+        """
+        router = db.PrimaryReplicaRouter()
+        self.assertIn(router.db_for_read(CarPark), {"replica_1", "replica_2"})
+        self.assertEqual(router.db_for_write(CarPark), "default")
+        with db.use_primary():
+            self.assertEqual(router.db_for_read(CarPark), "default")
+        self.assertTrue(router.allow_migrate("default", "carparks"))
+        self.assertFalse(router.allow_migrate("replica_1", "carparks"))
+        with self.settings(DATABASE_REPLICA_ALIASES=[]):
+            self.assertEqual(router.db_for_read(CarPark), "default")
+
+    def test_clients_are_pinned_after_a_write(self):
+        """
+        Test read-your-writes: writes run on the primary and pin the client for a while.
+        """
+        seen = []
+
+        def view(request):
+            seen.append(db._pinned.get())
+            return HttpResponse(status=int(request.GET.get("status", 200)))
+
+        middleware = db.ReadYourWritesMiddleware(view)
+        factory = RequestFactory()
+        self.assertNotIn(db.PIN_COOKIE, middleware(factory.get("/")).cookies)
+        response = middleware(factory.post("/"))
+        self.assertEqual(response.cookies[db.PIN_COOKIE]["max-age"], 5)
+        self.assertNotIn(db.PIN_COOKIE, middleware(factory.post("/?status=400")).cookies)
+
+        pinned = factory.get("/")
+        pinned.COOKIES[db.PIN_COOKIE] = response.cookies[db.PIN_COOKIE].value
+        middleware(pinned)
+        expired = factory.get("/")
+        expired.COOKIES[db.PIN_COOKIE] = str(time.time() - 1)
+        middleware(expired)
+        self.assertEqual(seen, [False, True, True, True, False])
+
+        with self.settings(DATABASE_REPLICA_ALIASES=[]), self.assertRaises(MiddlewareNotUsed):
+            db.ReadYourWritesMiddleware(view)
@@ -0,0 +1,96 @@
+from django.db.models import Count
+from django.test import TestCase, override_settings
+from rest_framework import status
+
+from carparks import columnar, dataset, singleflight, synthetic
+from carparks.facets import HEIGHT_BUCKETS
+from carparks.models import CarPark
+
+
+class FacetCountsTestCase(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        synthetic.seed_database(300, seed=5)
+
+    def setUp(self):
+        columnar.reset()
+        self.addCleanup(columnar.reset)
+
+    def _facets(self, params, engine="orm"):
+        singleflight.reset()
+        with override_settings(CARPARK_READ_ENGINE=engine):
+            response = self.client.get("/api/v1/carparks/query/", params)
+        self.assertEqual(response.status_code, 200)
+        return response.json()["facets"]
+
+    def test_each_facet_ignores_its_own_filter(self):
+        """
+        Test that a facet counts what picking each of its values would return.
+        """
+        chosen = CarPark.objects.values_list("car_park_type__name", flat=True).first()
+        facets = self._facets({"type": chosen, "night_parking": "true", "facets": "car_park_type,night_parking"})
+
+        expected = {
+            row["car_park_type__name"]: row["total"]
+            for row in CarPark.objects.filter(night_parking=True).order_by()
+            .values("car_park_type__name").annotate(total=Count("pk"))
+        }
+        self.assertEqual({row["value"]: row["count"] for row in facets["car_park_type"]}, expected)
+        in_type = CarPark.objects.filter(car_park_type__name=chosen)
+        self.assertEqual(facets["night_parking"], [
+            {"value": True, "count": in_type.filter(night_parking=True).count()},
+            {"value": False, "count": in_type.filter(night_parking=False).count()},
+        ])
+
+    def test_height_buckets(self):
+        """
+        Test that gantry heights are counted in half-open buckets covering every row.
+        """
+        buckets = self._facets({"facets": "gantry_height"})["gantry_height"]
+        self.assertEqual([(row["min"], row["max"]) for row in buckets], list(HEIGHT_BUCKETS))
+        self.assertEqual(sum(row["count"] for row in buckets), CarPark.objects.count())
+        self.assertEqual(buckets[1]["count"], CarPark.objects.filter(gantry_height__gte=1.8, gantry_height__lt=2.0).count())
+
+    def test_unfiltered_counts_are_cached(self):
+        """
+        Test that counts without filters are computed once per dataset version.
+        """
+        first = self._facets({"facets": "car_park_type"})
+        with self.assertNumQueries(2):  # count and page
+            response = self.client.get("/api/v1/carparks/query/", {"facets": "car_park_type", "page_size": 1})
+        self.assertEqual(response.json()["facets"], first)
+        with self.assertNumQueries(3):  # filtered counts are never cached
+            self.client.get("/api/v1/carparks/query/", {"facets": "car_park_type", "night_parking": "true",
+                                                        "page_size": 1})
+
+        dataset.mark_changed()
+        with self.assertNumQueries(3):
+            self.client.get("/api/v1/carparks/query/", {"facets": "car_park_type", "page_size": 1})
+
+    def test_snapshot_counts_match_the_orm(self):
+        """
+        Test that the columnar engine computes the same facets as the grouped query.
+        """
+        for params in (
+            {"facets": "all"},
+            {"facets": "all", "type": "surface car park", "free_parking": "false", "min_height": "2.0"},
+            {"facets": "all", "address": "avenue", "max_decks": "3", "car_park_basement": "false"},
+        ):
+            with self.subTest(params=params):
+                self.assertEqual(self._facets(params, "columnar"), self._facets(params))
+
+    def test_filter_endpoint_and_errors(self):
+        """
+        Test the opt-in envelope of the type filter and the error for unknown facets.
+        """
+        response = self.client.get("/api/v1/carparks/filter/", {"type": "surface car park"})
+        self.assertIsInstance(response.json(), list)
+        response = self.client.get("/api/v1/carparks/filter/", {"type": "surface car park", "facets": "car_park_type"})
+        data = response.json()
+        self.assertEqual(data["count"], len(data["results"]))
+        self.assertEqual(sum(row["count"] for row in data["facets"]["car_park_type"]), CarPark.objects.count())
+
+        for path in ("/api/v1/carparks/filter/", "/api/v1/carparks/query/"):
+            with self.subTest(path=path):
+                response = self.client.get(path, {"type": "surface car park", "facets": "colour"})
+                self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
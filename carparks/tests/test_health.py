@@ -0,0 +1,54 @@
+from unittest import mock
+
+from django.test import TestCase
+from rest_framework import status
+
+from AdvancedWebDevelopment import health
+
+
+class HealthCheckTestCase(TestCase):
+    def setUp(self):
+        health.reset_cache()
+        self.addCleanup(health.reset_cache)
+
+    def test_liveness_touches_no_io(self):
+        """
+        Test that the liveness probe runs no SQL.
+        """
+        with self.assertNumQueries(0):
+            response = self.client.get("/healthz/")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.json()["status"], "alive")
+
+    def test_readiness_reports_dependency_breakdown(self):
+        """
+        Test that the readiness probe reports latency, migrations and row count.
+        """
+        response = self.client.get("/health/")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        body = response.json()
+        self.assertEqual(body["status"], "healthy")
+        self.assertIn("query_ms", body["checks"]["database"])
+        self.assertEqual(body["checks"]["migrations"]["pending"], [])
+        self.assertEqual(body["checks"]["dataset"]["rows"], 0)
+        self.assertEqual(body["checks"]["cache"]["status"], "ok")
+
+    def test_readiness_result_is_cached(self):
+        """
+        Test that repeated probes within the TTL reuse the previous result.
+        """
+        self.client.get("/health/")
+        with self.assertNumQueries(0):
+            response = self.client.get("/health/")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_readiness_degraded_returns_503(self):
+        """
+        Test that a failing dependency turns the probe into a 503.
+        """
+        with mock.patch("django.core.cache.cache.get", side_effect=ConnectionError), \
+                self.assertLogs("AdvancedWebDevelopment.health", "ERROR"):
+            response = self.client.get("/health/")
+        self.assertEqual(response.status_code, status.HTTP_503_SERVICE_UNAVAILABLE)
+        self.assertEqual(response.json()["status"], "degraded")
+        self.assertEqual(response.json()["checks"]["cache"]["error"], "ConnectionError")
@@ -0,0 +1,194 @@
+import os
+from datetime import timedelta
+from io import StringIO
+from pathlib import Path
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import CommandError, call_command
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from carparks import bootstrap, importer, jobs, synthetic
+from carparks.models import CarPark, DatasetLoad, ImportJob
+
+from .helpers import enable_settings, staff_client, temporary_directory
+
+
+class SyntheticDatasetTestCase(TestCase):
+    def test_generation_is_deterministic_and_csv_shaped(self):
+        """
+        Test that synthetic rows are reproducible and use the HDB CSV columns.
+        """
+        first = list(synthetic.generate_rows(50, seed=3))
+        self.assertEqual(first, list(synthetic.generate_rows(50, seed=3)))
+        self.assertEqual(list(first[0]), synthetic.CSV_COLUMNS)
+        self.assertEqual(len({row["car_park_no"] for row in first}), 50)
+
+        synthetic.seed_database(50, seed=3, batch_size=20)
+        self.assertEqual(CarPark.objects.count(), 50)
+
+
+class DatasetBootstrapTestCase(TestCase):
+    def setUp(self):
+        self.path = Path(temporary_directory(self)) / "carparks.csv"
+        synthetic.write_csv(self.path, 40, seed=11)
+
+    def test_unchanged_dataset_is_skipped(self):
+        """
+        Test that a second bootstrap of the same file only checks the fingerprint.
+        """
+        first = bootstrap.bootstrap(self.path)
+        self.assertFalse(first.skipped)
+        self.assertEqual((first.method, first.import_result.inserted), ("batched", 40))
+        self.assertEqual(CarPark.objects.count(), 40)
+        load = DatasetLoad.objects.get(source="carparks.csv")
+        self.assertEqual((load.sha256, load.row_count, load.inserted), (first.fingerprint.sha256, 40, 40))
+
+        with self.assertNumQueries(2):
+            self.assertTrue(bootstrap.bootstrap(self.path).skipped)
+        forced = bootstrap.bootstrap(self.path, force=True)
+        self.assertEqual((forced.import_result.inserted, forced.import_result.duplicates), (0, 40))
+
+    def test_changed_or_missing_data_is_loaded(self):
+        """
+        Test that a changed file, or an emptied table, triggers a load.
+        """
+        bootstrap.bootstrap(self.path)
+        synthetic.write_csv(self.path, 45, seed=11)
+        changed = bootstrap.bootstrap(self.path)
+        self.assertFalse(changed.skipped)
+        self.assertEqual((changed.import_result.inserted, changed.import_result.duplicates), (5, 40))
+
+        CarPark.objects.all().delete()
+        self.assertEqual(bootstrap.bootstrap(self.path).import_result.inserted, 45)
+
+    def test_command(self):
+        """
+        Test the bootstrap_dataset management command.
+        """
+        out = StringIO()
+        call_command("bootstrap_dataset", str(self.path), stdout=out)
+        call_command("bootstrap_dataset", str(self.path), stdout=out)
+        self.assertIn("40 inserted", out.getvalue())
+        self.assertIn("skipping load", out.getvalue())
+        with self.assertRaises(CommandError):
+            call_command("bootstrap_dataset", str(self.path) + ".missing")
+
+
+class ImportJobTestCase(TestCase):
+    HEADER = ("car_park_no,address,x_coord,y_coord,car_park_type,type_of_parking_system,short_term_parking,"
+              "free_parking,night_parking,car_park_decks,gantry_height,car_park_basement\n")
+
+    def setUp(self):
+        self.client = staff_client()
+        self.upload_dir = temporary_directory(self)
+        enable_settings(self, IMPORT_UPLOAD_DIR=self.upload_dir, IMPORT_JOB_BATCH_SIZE=2)
+
+    def _csv(self, rows, bad_rows=0):
+        lines = [self.HEADER]
+        for i in range(rows):
+            lines.append(f"Q{i},BLK {i} QUEUE ROAD,1.0,2.0,SURFACE CAR PARK,ELECTRONIC PARKING,"
+                         f"WHOLE DAY,NO,YES,0,2.0,N\n")
+        for i in range(bad_rows):
+            lines.append(f"B{i},BLK {i} BAD ROAD,not-a-number,2.0,SURFACE CAR PARK,ELECTRONIC PARKING,"
+                         f"WHOLE DAY,NO,YES,0,2.0,N\n")
+        return "".join(lines).encode()
+
+    def _upload(self, content, name="upload.csv"):
+        return self.client.post("/api/v1/carparks/imports/", {"file": SimpleUploadedFile(name, content)})
+
+    def test_upload_queues_and_worker_imports(self):
+        """
+        Test that an upload is only queued, and the worker loads it and reports progress.
+        """
+        response = self._upload(self._csv(5, bad_rows=1))
+        self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED)
+        self.assertEqual(response.data["status"], "queued")
+        self.assertEqual(response["Location"], f"/api/v1/carparks/imports/{response.data['id']}/")
+        self.assertFalse(CarPark.objects.exists())
+        job = ImportJob.objects.get()
+        self.assertTrue(os.path.exists(job.path))
+
+        jobs.run_worker(once=True)
+        self.assertEqual(CarPark.objects.count(), 5)
+        self.assertFalse(os.path.exists(job.path))
+
+        data = self.client.get(response["Location"]).data
+        self.assertEqual(data["status"], "succeeded")
+        self.assertEqual((data["total_rows"], data["processed"], data["inserted"], data["failed"]), (6, 6, 5, 1))
+        self.assertEqual(data["errors"][0]["line"], 7)
+        self.assertEqual(data["percent_complete"], 100.0)
+        self.assertIsNotNone(data["rows_per_second"])
+        self.assertEqual(self.client.get("/api/v1/carparks/imports/").data[0]["id"], job.pk)
+
+    def test_progress_is_recorded_after_each_batch(self):
+        """
+        Test that a running job's counts and heartbeat move batch by batch.
+        """
+        self._upload(self._csv(5))
+        job = jobs.claim("test-worker")
+        seen = []
+        original = importer.import_rows
+
+        def import_rows(rows, batch_size, progress):
+            def spy(result):
+                progress(result)
+                seen.append(ImportJob.objects.values_list("status", "processed").get(pk=job.pk))
+            return original(rows, batch_size=batch_size, progress=spy)
+
+        with mock.patch.object(importer, "import_rows", import_rows):
+            jobs.process(job)
+        self.assertEqual(seen, [("running", 2), ("running", 4), ("running", 5)])
+
+    def test_invalid_uploads(self):
+        """
+        Test that a missing file is refused and a CSV without the columns fails its job.
+        """
+        self.assertEqual(self.client.post("/api/v1/carparks/imports/", {}).status_code,
+                         status.HTTP_400_BAD_REQUEST)
+        with override_settings(IMPORT_UPLOAD_MAX_BYTES=10):
+            self.assertEqual(self._upload(self._csv(1)).status_code, status.HTTP_413_REQUEST_ENTITY_TOO_LARGE)
+
+        response = self._upload(b"car_park_no,address\nA1,SOMEWHERE\n")
+        with self.assertLogs("carparks.jobs", "ERROR"):
+            jobs.run_worker(once=True)
+        data = self.client.get(response["Location"]).data
+        self.assertEqual(data["status"], "failed")
+        self.assertIn("Missing required columns", data["error"])
+
+    def test_imports_are_staff_only(self):
+        """
+        Test that anonymous and non-staff users can neither upload nor read jobs.
+        """
+        job = ImportJob.objects.create(source="x.csv", path="x.csv")
+        for user in (None, User(username="visitor")):
+            client = APIClient()
+            client.force_authenticate(user)
+            with self.subTest(user=user):
+                response = client.post("/api/v1/carparks/imports/", {"file": self._csv(1)})
+                self.assertIn(response.status_code, (status.HTTP_401_UNAUTHORIZED, status.HTTP_403_FORBIDDEN))
+                self.assertIn(client.get("/api/v1/carparks/imports/").status_code, (401, 403))
+                self.assertIn(client.get(f"/api/v1/carparks/imports/{job.pk}/").status_code, (401, 403))
+        self.assertEqual(ImportJob.objects.count(), 1)
+        self.assertEqual(os.listdir(self.upload_dir), [])
+
+    def test_claim_is_exclusive_and_stale_jobs_are_retried(self):
+        """
+        Test that a job is claimed once, and re-queued when its worker stops heartbeating.
+        """
+        self._upload(self._csv(1))
+        first = jobs.claim("worker-a")
+        self.assertEqual((first.status, first.worker, first.attempts), ("running", "worker-a", 1))
+        self.assertIsNone(jobs.claim("worker-b"))
+
+        later = timezone.now() + timedelta(seconds=301)
+        again = jobs.claim("worker-b", now=later)
+        self.assertEqual((again.pk, again.worker, again.attempts), (first.pk, "worker-b", 2))
+
+        ImportJob.objects.filter(pk=first.pk).update(attempts=3)
+        self.assertIsNone(jobs.claim("worker-c", now=later + timedelta(seconds=301)))
+        self.assertEqual(ImportJob.objects.get(pk=first.pk).status, "failed")
@@ -0,0 +1,88 @@
+import json
+import os
+
+from django.test import TestCase, override_settings
+from rest_framework import status
+
+from AdvancedWebDevelopment import health
+from carparks import metrics
+from carparks import urls as carpark_urls
+
+from .helpers import create_car_park, temporary_directory
+
+
+class RequestTimingMiddlewareTestCase(TestCase):
+    def setUp(self):
+        create_car_park("T001", "BLK 1 TEST STREET")
+
+    def test_server_timing_header_when_enabled(self):
+        """
+        Test that API responses carry SQL/view/render timings when enabled.
+        """
+        with override_settings(PERF_INSTRUMENTATION_ENABLED=True), \
+                self.assertLogs("carparks.perf", "INFO") as logs:
+            response = self.client.get("/api/v1/carparks/")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        header = response["Server-Timing"]
+        self.assertIn('sql;dur=', header)
+        # dataset version fingerprint + the rows that get pre-rendered
+        self.assertIn('desc="2 queries"', header)
+        self.assertIn("render;dur=", header)
+        self.assertIn('"view":"CarParkListView"', logs.output[0])
+
+    def test_non_api_views_and_disabled_mode_are_untouched(self):
+        """
+        Test that no header is added outside carparks.views or when disabled.
+        """
+        with override_settings(PERF_INSTRUMENTATION_ENABLED=True):
+            self.assertNotIn("Server-Timing", self.client.get("/healthz/"))
+        self.client = self.client_class()
+        with override_settings(PERF_INSTRUMENTATION_ENABLED=False):
+            self.assertNotIn("Server-Timing", self.client.get("/api/v1/carparks/"))
+
+
+class MetricsTestCase(TestCase):
+    def setUp(self):
+        metrics.reset()
+        self.car_park = create_car_park("M001", "BLK 2 METRICS ROAD")
+
+    def test_every_carparks_route_is_measured(self):
+        """
+        Test that each route in carparks/urls.py shows up in /metrics.
+        """
+        routes = [str(pattern.pattern) for pattern in carpark_urls.urlpatterns]
+        for route in routes:
+            self.client.get("/" + route.replace("<int:pk>", str(self.car_park.pk)))
+        body = self.client.get("/metrics").content.decode()
+        for route in routes:
+            self.assertIn(f'carpark_http_requests_total{{route="{route}",method="GET"', body)
+        self.assertIn('carpark_http_request_duration_seconds_bucket{route="api/v1/carparks/",method="GET",le="+Inf"} 1', body)
+        self.assertIn('carpark_db_queries_per_request_sum{route="api/v1/carparks/"} 2', body)
+        self.assertIn('carpark_http_response_size_bytes_count{route="api/v1/carparks/"} 1', body)
+
+    def test_multiprocess_snapshots_are_summed(self):
+        """
+        Test that snapshot files from other workers are aggregated on scrape.
+        """
+        directory = temporary_directory(self)
+        with override_settings(METRICS_MULTIPROC_DIR=directory):
+            metrics.inc("carpark_http_requests_total", (("route", "x"), ("method", "GET"), ("status", "200")), 2)
+            other_worker = {
+                "counters": [["carpark_http_requests_total", [["route", "x"], ["method", "GET"], ["status", "200"]], 3]],
+                "histograms": [],
+            }
+            with open(os.path.join(directory, "metrics-999999-deadbeef.json"), "w") as fh:
+                json.dump(other_worker, fh)
+            counters, _ = metrics.collect()
+        self.assertEqual(counters[("carpark_http_requests_total", (("route", "x"), ("method", "GET"), ("status", "200")))], 5)
+
+    def test_cache_hit_ratio_is_recorded(self):
+        """
+        Test that cache lookups are counted as hits and misses.
+        """
+        health.reset_cache()
+        self.client.get("/health/")
+        self.client.get("/health/")
+        body = self.client.get("/metrics").content.decode()
+        self.assertIn('carpark_cache_requests_total{cache="health",result="hit"} 1', body)
+        self.assertIn('carpark_cache_requests_total{cache="health",result="miss"} 1', body)
@@ -0,0 +1,106 @@
+import base64
+import json
+import os
+import pstats
+import time
+
+from django.contrib.auth.models import User
+from django.test import TestCase, override_settings
+from rest_framework import status
+
+from carparks import prerender, profiling, singleflight
+from carparks.views import CarParkTypesView
+
+from .helpers import enable_settings, temporary_directory
+
+
+@override_settings(PASSWORD_HASHERS=["django.contrib.auth.hashers.MD5PasswordHasher"])
+class ProfilingMiddlewareTestCase(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        User.objects.create_user("staff", password="secret", is_staff=True)
+        User.objects.create_user("visitor", password="secret")
+
+    def setUp(self):
+        prerender.reset()
+        singleflight.reset()
+        self.profile_dir = temporary_directory(self)
+        enable_settings(self, PROFILE_DIR=self.profile_dir)
+
+    def _profiled_get(self, path, **extra):
+        with self.assertLogs("carparks.perf", "INFO") as logs:
+            response = self.client.get(path, **extra)
+        self.assertIn(response["X-Profile-Id"], logs.output[0])
+        return response
+
+    def _auth(self, username):
+        token = base64.b64encode(f"{username}:secret".encode()).decode()
+        return {"HTTP_AUTHORIZATION": f"Basic {token}"}
+
+    def test_staff_get_collapsed_stacks_and_sql(self):
+        """
+        Test that a staff request can profile itself and get the profile back.
+        """
+        response = self._profiled_get(
+            "/api/v1/carparks/types/?_profile=all&_profile_format=collapsed", **self._auth("staff")
+        )
+        self.assertEqual(response["Content-Type"], "text/plain; charset=utf-8")
+        profile_id = response["X-Profile-Id"]
+        with open(f"{self.profile_dir}/{profile_id}.json") as fh:
+            summary = json.load(fh)
+        self.assertEqual(summary["request"]["path"], "/api/v1/carparks/types/")
+        self.assertEqual(summary["request"]["status"], status.HTTP_200_OK)
+        self.assertTrue(any("carparks_carpark" in query["sql"] for query in summary["sql"]))
+        self.assertTrue(os.path.exists(f"{self.profile_dir}/{profile_id}.pstats"))
+
+    def test_pstats_header_trigger_keeps_the_response(self):
+        """
+        Test that the X-Profile header profiles without changing the response body.
+        """
+        response = self._profiled_get("/api/v1/carparks/types/", HTTP_X_PROFILE="cprofile", **self._auth("staff"))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.json(), [])
+        stats = pstats.Stats(f"{self.profile_dir}/{response['X-Profile-Id']}.pstats")
+        code = CarParkTypesView.get.__code__
+        # pstats keys are (file, first line, name); the name is unqualified before Python 3.12
+        self.assertIn((code.co_filename, code.co_firstlineno), {func[:2] for func in stats.stats})
+
+    def test_non_staff_and_plain_requests_are_not_profiled(self):
+        """
+        Test that only staff can trigger a profile and nothing is written otherwise.
+        """
+        for headers in ({}, self._auth("visitor")):
+            response = self.client.get("/api/v1/carparks/types/?_profile=all", **headers)
+            self.assertNotIn("X-Profile-Id", response)
+        self.assertEqual(os.listdir(self.profile_dir), [])
+
+    def test_sample_rate_profiles_requests_automatically(self):
+        """
+        Test that PROFILE_SAMPLE_RATE profiles requests with the sampling profiler.
+        """
+        with override_settings(PROFILE_SAMPLE_RATE=1.0):
+            response = self._profiled_get("/api/v1/carparks/types/")
+        profile_id = response["X-Profile-Id"]
+        self.assertEqual(response.json(), [])
+        self.assertEqual(sorted(os.listdir(self.profile_dir)), [f"{profile_id}.collapsed", f"{profile_id}.json"])
+
+    def test_sampler_collapses_stacks_below_the_root(self):
+        """
+        Test that the stack sampler emits flamegraph lines without the caller's frames.
+        """
+        def busy():
+            deadline = time.perf_counter() + 0.05
+            while time.perf_counter() < deadline:
+                pass
+
+        def root():
+            busy()
+
+        with profiling.StackSampler(0.001, root_code=root.__code__) as sampler:
+            root()
+        lines = sampler.collapsed().splitlines()
+        self.assertTrue(lines)
+        stack, count = lines[0].rsplit(" ", 1)
+        self.assertTrue(stack.endswith(".busy"), stack)
+        self.assertNotIn(";", stack)  # root() and everything above it are cut off
+        self.assertGreater(int(count), 0)
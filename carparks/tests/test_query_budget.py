@@ -0,0 +1,197 @@
+import io
+import re
+from collections import Counter
+from contextlib import contextmanager, redirect_stdout
+from unittest import mock
+
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+
+from carparks import addresses, availability, dataset, importer, prerender, singleflight, synthetic
+from carparks import urls as carpark_urls
+from carparks.models import CarPark, CarParkTombstone, ImportJob, Town
+from carparks.serializers import CarParkSerializer
+from scripts import remove_duplicates
+
+from .helpers import staff_client
+
+
+class QueryBudgetTestCase(TestCase):
+    """
+    Pin the exact SQL budget of every route against a realistically sized
+    dataset, so an N+1 or a stray .exists() fails loudly with the captured SQL.
+    """
+
+    DATASET_ROWS = 2244  # size of dataset/HDBCarparkInformation.csv
+
+    # (method, route) -> (query string / body, expected number of queries)
+    BUDGETS = {
+        # dataset version fingerprint + rows to pre-render (cold; warm requests run none)
+        ("GET", "api/v1/carparks/"): ({}, 2),
+        ("GET", "api/v1/carparks/types/"): ({}, 2),
+        ("GET", "api/v1/carparks/<int:pk>/"): ({}, 1),
+        # the address stays in the car park's town (the first seeded row, on
+        # CLEMENTI AVENUE 4), so the parsed town costs no lookup
+        ("PATCH", "api/v1/carparks/<int:pk>/"): ({"address": "BLK 1 CLEMENTI AVENUE 4"}, 2),
+        ("PUT", "api/v1/carparks/<int:pk>/"): (None, 2),
+        ("GET", "api/v1/carparks/height-range/"): ({"min_height": "1.8", "max_height": "2.1"}, 1),
+        ("GET", "api/v1/carparks/filter/"): ({"type": "MULTI-STOREY CAR PARK"}, 1),
+        ("GET", "api/v1/carparks/free-parking/"): ({}, 1),
+        # dataset version probe + the aggregate, computed once per version
+        ("GET", "api/v1/carparks/group-by-system/"): ({}, 2),
+        ("GET", "api/v1/carparks/group-by-town/"): ({}, 2),
+        ("GET", "api/v1/carparks/average-gantry-height/"): ({}, 2),
+        # one lookup per category name and one for the parsed town, then the insert
+        ("POST", "api/v1/carparks/create/"): ({"address": "BLK 2 CLEMENTI AVENUE 4",
+                                               "car_park_type": "SURFACE CAR PARK"}, 6),
+        ("GET", "api/v1/carparks/search/"): ({"address": "ANG MO KIO"}, 1),
+        # COUNT for pagination + one page of rows
+        ("GET", "api/v1/carparks/query/"): ({"type": "multi-storey car park", "min_height": "2.1",
+                                             "night_parking": "true", "free_parking": "true",
+                                             "address": "AVENUE", "min_decks": "2", "ordering": "-gantry_height"}, 2),
+        # one keyset page of upserts + one of tombstones
+        ("GET", "api/v1/carparks/changes/"): ({"limit": "100"}, 2),
+        ("GET", "api/v1/carparks/availability/"): ({}, 1),
+        # version fingerprint, car_park_no -> id map, savepoint, samples insert,
+        # latest upsert, release savepoint
+        ("POST", "api/v1/carparks/availability/"): ({"items": [
+            {"car_park_no": "S010000000", "total_lots": 120, "available_lots": 37},  # first seeded row
+            {"car_park_no": "S010000001", "lot_type": "Y", "total_lots": 30, "available_lots": 4},
+        ]}, 6),
+        # car park exists, stored rollups, raw tail not rolled up yet
+        ("GET", "api/v1/carparks/<int:pk>/availability/"): ({}, 3),
+        # the job row only; the import itself runs in the worker
+        ("POST", "api/v1/carparks/imports/"): ({"file": b"car_park_no,address\n"}, 1),
+        ("GET", "api/v1/carparks/imports/"): ({}, 1),
+        ("GET", "api/v1/carparks/imports/<int:pk>/"): ({}, 1),
+    }
+    # HTML pages and redirects render without touching the database
+    NO_QUERY_ROUTES = (
+        "", "carparks/", "carparks/list/", "carparks/create/", "carparks/filter-by-type/",
+        "carparks/filter-free-parking/", "carparks/group-by-system/", "carparks/average-height/",
+        "carparks/search/", "home/", "list/", "create/", "search/", "average-height/",
+        "group-by-system/", "filter-by-type/", "filter-free-parking/",
+    )
+
+    @classmethod
+    def setUpTestData(cls):
+        synthetic.seed_database(cls.DATASET_ROWS, seed=1)
+        cls.car_park = CarPark.objects.order_by("pk").first()
+        # Routes share one <int:pk>; give the import job the car park's id
+        ImportJob.objects.create(pk=cls.car_park.pk, source="budget.csv", path="budget.csv")
+
+    def assertQueryBudget(self, expected, label):
+        """Like assertNumQueries, but fails with the numbered SQL and repeated statement shapes."""
+        @contextmanager
+        def budget():
+            with CaptureQueriesContext(connection) as captured:
+                yield captured
+            executed = [query["sql"] for query in captured.captured_queries]
+            if len(executed) == expected:
+                return
+            shapes = Counter(re.sub(r"'[^']*'|\b\d+(\.\d+)?\b", "?", sql) for sql in executed)
+            lines = [f"{label}: expected {expected} queries, executed {len(executed)}"]
+            lines += [f"  {i}. {sql}" for i, sql in enumerate(executed, start=1)]
+            repeated = [f"  x{count}  {shape}" for shape, count in shapes.items() if count > 1]
+            if repeated:
+                lines += ["Repeated statements (possible N+1):"] + repeated
+            self.fail("\n".join(lines))
+
+        return budget()
+
+    def _request(self, method, route, data):
+        path = "/" + route.replace("<int:pk>", str(self.car_park.pk))
+        client = self.client
+        if route.startswith("api/v1/carparks/imports/"):
+            # Staff only; authenticated without a session, so no auth queries are counted
+            client = staff_client()
+        if method == "GET":
+            return client.get(path, data)
+        if data is not None and isinstance(data.get("file"), bytes):
+            return client.post(path, {"file": SimpleUploadedFile("budget.csv", data["file"])})
+        if data is None:
+            data = CarParkSerializer(self.car_park).data
+        return getattr(self.client, method.lower())(path, data, content_type="application/json")
+
+    def test_every_route_has_a_budget(self):
+        """
+        Test that new routes in carparks/urls.py cannot ship without a budget.
+        """
+        budgeted = {route for _, route in self.BUDGETS} | set(self.NO_QUERY_ROUTES)
+        for pattern in carpark_urls.urlpatterns:
+            self.assertIn(str(pattern.pattern), budgeted)
+
+    def test_api_routes_stay_within_budget(self):
+        """
+        Test the exact SQL query count of each API route.
+        """
+        for (method, route), (data, expected) in self.BUDGETS.items():
+            with self.subTest(method=method, route=route):
+                prerender.reset()
+                singleflight.reset()
+                dataset.mark_changed()
+                availability.reset()
+                with self.assertQueryBudget(expected, f"{method} /{route}"):
+                    response = self._request(method, route, data)
+                self.assertLess(response.status_code, 400, response.content[:200])
+
+    def test_html_routes_run_no_queries(self):
+        """
+        Test that template pages and redirects never hit the database.
+        """
+        for route in self.NO_QUERY_ROUTES:
+            with self.subTest(route=route), self.assertQueryBudget(0, f"GET /{route}"):
+                self.client.get("/" + route)
+
+    def test_importer_queries_scale_with_batches_not_rows(self):
+        """
+        Test that the CSV importer runs a fixed number of queries per batch.
+        """
+        rows = list(synthetic.generate_rows(500, seed=2))
+        # towns this sample adds cost a get_or_create each: select, savepoint, insert, release
+        new_towns = {addresses.parse(row["address"]).town for row in rows} - {None} - set(
+            Town.objects.values_list("name", flat=True)
+        )
+        # the five lookup tables once, then per batch: duplicate-key
+        # lookup, savepoint, bulk insert, release savepoint
+        with self.assertQueryBudget(5 + 4 * len(new_towns) + 10 * 4, "import 500 rows in batches of 50"):
+            result = importer.import_rows(rows, batch_size=50)
+        self.assertEqual(result.inserted, 500)
+        with self.assertQueryBudget(5 + 10 * 1, "re-import 500 duplicate rows"):
+            result = importer.import_rows(rows, batch_size=50)
+        self.assertEqual(result.duplicates, 500)
+
+    def test_facets_cost_one_grouped_query(self):
+        """
+        Test that facet counts add a single grouped query to the query endpoint.
+        """
+        params = {"type": "multi-storey car park", "night_parking": "true", "min_decks": "2", "facets": "all"}
+        # COUNT for pagination + one page of rows + the grouped facet query
+        with self.assertQueryBudget(3, "GET /api/v1/carparks/query/?facets=all"):
+            response = self.client.get("/api/v1/carparks/query/", params)
+        self.assertEqual(response.status_code, 200)
+
+    def test_cleanup_scripts_query_per_batch(self):
+        """
+        Test that the duplicate cleanup reads the table in one pass.
+        """
+        with self.assertQueryBudget(1, "remove_duplicates on a clean table"), redirect_stdout(io.StringIO()):
+            self.assertEqual(remove_duplicates.remove_duplicates(), 0)
+
+    def test_deleting_duplicates_queries_per_batch(self):
+        """
+        Test that deleting duplicates, tombstones included, costs a fixed number of queries per batch.
+        """
+        # The unique constraint keeps real duplicates out; keying on the type alone makes most rows one
+        key = ("car_park_type",)
+        expected = CarPark.objects.count() - CarPark.objects.values("car_park_type").distinct().count()
+        # Batches of 100 fit one DELETE and one tombstone INSERT on every backend
+        batches = -(-expected // 100)
+        # the key read, then per batch: rows to delete, availability samples,
+        # latest values, rollups, the DELETE and the tombstone INSERT
+        with mock.patch.object(remove_duplicates, "KEY_COLUMNS", key), redirect_stdout(io.StringIO()), \
+                self.assertQueryBudget(1 + 6 * batches, f"remove_duplicates deleting {expected} rows"):
+            self.assertEqual(remove_duplicates.remove_duplicates(batch_size=100), expected)
+        self.assertEqual(CarParkTombstone.objects.count(), expected)
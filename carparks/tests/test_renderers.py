@@ -0,0 +1,127 @@
+import datetime
+import decimal
+import io
+import json
+import uuid
+
+from django.test import TestCase
+from django.utils.translation import gettext_lazy
+from rest_framework import status
+from rest_framework.exceptions import ParseError
+from rest_framework.renderers import JSONRenderer
+
+from carparks import prerender, renderers, synthetic
+from carparks.models import CarPark
+from carparks.renderers import ORJSONParser, ORJSONRenderer
+from carparks.serializers import CarParkSerializer
+
+from .helpers import create_car_park
+
+
+class ORJSONRendererTestCase(TestCase):
+    def _sample(self):
+        return {
+            "aware": datetime.datetime(2024, 5, 1, 8, 30, 15, 123456, tzinfo=datetime.timezone.utc),
+            "naive": datetime.datetime(2024, 5, 1, 8, 30),
+            "date": datetime.date(2024, 5, 1),
+            "time": datetime.time(23, 59, 1, 500),
+            "duration": datetime.timedelta(hours=1, seconds=3),
+            "decimal": decimal.Decimal("2.15"),
+            "uuid": uuid.UUID("12345678-1234-5678-1234-567812345678"),
+            "lazy": gettext_lazy("Car park"),
+            "text": "BLK 1 \u00e9 \u2028 \u2029 \u6f22",
+            "floats": [2.1, 1.8, 0.0, -1.5, 30314.7936, 103.851],
+            "nested": {1: [True, False, None], "tuple": (1, 2), "empty": []},
+            "generator": (i for i in range(3)),
+        }
+
+    def test_output_matches_the_stock_renderer(self):
+        """
+        Test byte-for-byte parity with DRF's JSONRenderer, compact and indented.
+        """
+        for media_type in ("application/json", "application/json; indent=2", "application/json; indent=4"):
+            with self.subTest(media_type=media_type):
+                expected = JSONRenderer().render(self._sample(), media_type)
+                self.assertEqual(ORJSONRenderer().render(self._sample(), media_type), expected)
+        self.assertEqual(ORJSONRenderer().render(None), b"")
+
+    def test_exponents_and_wide_integers(self):
+        """
+        Test that exponent floats parse to the same values and wide integers still render.
+        """
+        floats = [1e16, -1.5e-07, 1.7976931348623157e308]
+        self.assertEqual(json.loads(ORJSONRenderer().render(floats)), json.loads(JSONRenderer().render(floats)))
+        wide = {"id": 2 ** 70}
+        self.assertEqual(ORJSONRenderer().render(wide), JSONRenderer().render(wide))
+
+    def test_api_responses_are_unchanged(self):
+        """
+        Test that a serialised list renders exactly as before.
+        """
+        create_car_park("R1", "BLK 1 RENDER ROAD", x_coord=30314.7936, y_coord=31490.4942, gantry_height=2.15)
+        response = self.client.get("/api/v1/carparks/", {"format": "json", "page": "1"})
+        expected = JSONRenderer().render(CarParkSerializer(CarPark.objects.all(), many=True).data)
+        self.assertEqual(response.content, expected)
+
+    def test_parser(self):
+        """
+        Test parsing and error reporting.
+        """
+        parser = ORJSONParser()
+        self.assertEqual(parser.parse(io.BytesIO('{"a": [1, 2.5, "é"]}'.encode())), {"a": [1, 2.5, "é"]})
+        with self.assertRaisesMessage(ParseError, "JSON parse error"):
+            parser.parse(io.BytesIO(b'{"a": NaN}'))
+        response = self.client.post("/api/v1/carparks/create/", '{"address": "BLK 9 PARSER ROAD"',
+                                    content_type="application/json")
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class BulkFormatTestCase(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        synthetic.seed_database(150, seed=6)
+
+    def setUp(self):
+        prerender.reset()
+        self.addCleanup(prerender.reset)
+
+    def test_columnar_json(self):
+        """
+        Test the struct-of-arrays layout on plain and paginated lists.
+        """
+        rows = self.client.get("/api/v1/carparks/").json()
+        response = self.client.get("/api/v1/carparks/", HTTP_ACCEPT="application/vnd.carpark.columns+json")
+        self.assertEqual(response["Content-Type"], "application/vnd.carpark.columns+json")
+        body = response.json()
+        self.assertEqual(body["count"], 150)
+        self.assertEqual(body["columns"]["address"], [row["address"] for row in rows])
+        self.assertEqual(set(body["columns"]), set(rows[0]))
+        self.assertLess(len(response.content), len(self.client.get("/api/v1/carparks/").content))
+
+        page = self.client.get("/api/v1/carparks/query/", {"format": "columns", "page_size": 10}).json()
+        self.assertEqual(page["count"], 150)
+        self.assertEqual(page["results"]["count"], 10)
+        self.assertEqual(len(page["results"]["columns"]["id"]), 10)
+
+    def test_messagepack(self):
+        """
+        Test MessagePack negotiation by Accept header and ?format=.
+        """
+        if renderers.msgpack is None:
+            self.skipTest("msgpack is not installed")
+        expected = self.client.get("/api/v1/carparks/search/", {"address": "road"}).json()
+        response = self.client.get("/api/v1/carparks/search/", {"address": "road"}, HTTP_ACCEPT="application/msgpack")
+        self.assertEqual(response["Content-Type"], "application/msgpack")
+        self.assertEqual(renderers.msgpack.unpackb(response.content), expected)
+
+        response = self.client.get("/api/v1/carparks/", {"format": "msgpack"}, HTTP_ACCEPT_ENCODING="gzip")
+        self.assertIn("ETag", response)
+        self.assertEqual(response["Content-Encoding"], "gzip")
+
+    def test_default_json_and_other_views_unchanged(self):
+        """
+        Test that JSON stays the default and non-list views don't offer bulk formats.
+        """
+        self.assertEqual(self.client.get("/api/v1/carparks/free-parking/")["Content-Type"], "application/json")
+        response = self.client.get("/api/v1/carparks/types/", HTTP_ACCEPT="application/vnd.carpark.columns+json")
+        self.assertEqual(response.status_code, status.HTTP_406_NOT_ACCEPTABLE)
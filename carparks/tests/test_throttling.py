@@ -0,0 +1,73 @@
+import time
+
+from django.test import TestCase, override_settings
+from rest_framework import status
+
+from carparks import synthetic, throttling
+from carparks.models import CarPark
+
+
+@override_settings(API_THROTTLE_ENABLED=True, API_THROTTLE_RATES={"read": "10/min", "write": "2/min"},
+                   API_THROTTLE_COSTS={"unpaginated": 5})
+class ThrottleTestCase(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        synthetic.seed_database(3, seed=12)
+        cls.car_park = CarPark.objects.order_by("pk").first()
+
+    def setUp(self):
+        throttling.reset()
+        self.addCleanup(throttling.reset)
+
+    def test_token_bucket(self):
+        """
+        Test GCRA admission, weighted costs and refill.
+        """
+        now = 1000.0
+        results = [throttling.consume("bucket", "10/min", now=now) for _ in range(11)]
+        self.assertEqual([r.remaining for r in results[:10]], list(range(9, -1, -1)))
+        self.assertEqual(results[9].retry_after, 0)
+        self.assertAlmostEqual(results[10].retry_after, 6.0)
+        self.assertAlmostEqual(results[10].reset, 60.0)
+        # One token refills every 6 seconds
+        self.assertFalse(throttling.consume("bucket", "10/min", now=now + 5.9).retry_after == 0)
+        self.assertEqual(throttling.consume("bucket", "10/min", now=now + 6).retry_after, 0)
+        # A cost-5 request needs five tokens
+        self.assertEqual(throttling.consume("heavy", "10/min", cost=5, now=now).remaining, 5)
+        self.assertEqual(throttling.consume("heavy", "10/min", cost=5, now=now).remaining, 0)
+        self.assertAlmostEqual(throttling.consume("heavy", "10/min", cost=5, now=now).retry_after, 30.0)
+
+    def test_api_headers_and_429(self):
+        """
+        Test RateLimit headers, per-client buckets, cost weights and Retry-After.
+        """
+        detail = f"/api/v1/carparks/{self.car_park.pk}/"
+        responses = [self.client.get(detail) for _ in range(10)]
+        self.assertEqual([r["RateLimit-Remaining"] for r in responses], [str(n) for n in range(9, -1, -1)])
+        self.assertEqual(responses[0]["RateLimit-Policy"], "10;w=60")
+        throttled = self.client.get(detail)
+        self.assertEqual(throttled.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+        self.assertEqual(throttled["Retry-After"], "6")
+
+        # Another client has its own bucket, and unpaginated lists cost 5
+        other = {"REMOTE_ADDR": "10.0.0.2"}
+        self.assertEqual(self.client.get("/api/v1/carparks/", **other)["RateLimit-Remaining"], "5")
+        self.assertEqual(self.client.get("/api/v1/carparks/search/", {"address": "A"}, **other).status_code,
+                         status.HTTP_200_OK)
+        self.assertEqual(self.client.get("/api/v1/carparks/", **other).status_code,
+                         status.HTTP_429_TOO_MANY_REQUESTS)
+        # Writes draw from their own bucket
+        self.assertEqual(self.client.patch(detail, {"address": "BLK 1 THROTTLE ROAD"},
+                                           content_type="application/json", **other).status_code,
+                         status.HTTP_200_OK)
+        # Pages without DRF views are never throttled
+        self.assertNotIn("RateLimit-Limit", self.client.get("/healthz/"))
+
+    def test_check_is_cheap(self):
+        """
+        Test that a throttle check stays far below a millisecond.
+        """
+        start = time.perf_counter()
+        for i in range(2000):
+            throttling.consume(f"client-{i % 50}", "1000000/min")
+        self.assertLess((time.perf_counter() - start) / 2000, 0.0002)
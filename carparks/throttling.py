@@ -0,0 +1,165 @@
+"""
+Per-client rate limiting for the API: a cost-weighted token bucket kept as
+one number per client and scope (GCRA, the "generic cell rate algorithm").
+
+A bucket of ``N`` requests per ``period`` is stored as its theoretical
+arrival time (TAT): each request of cost ``c`` moves the TAT ``c * period / N``
+into the future, and is refused while the TAT would end up more than one
+period ahead of now. Admission is a single compare-and-set of that number, so
+with REDIS_URL it runs as one Lua script (atomic on the server, no locks, one
+round trip) and every worker shares the same buckets. Without Redis each
+process keeps its own buckets in memory, so a client spread over N worker
+processes gets up to N times the configured rate.
+
+Scopes and rates come from API_THROTTLE_RATES ("read" for safe methods,
+"write" otherwise, or a view's ``throttle_scope``). A view's
+``throttle_cost_class`` picks its cost from API_THROTTLE_COSTS, so the
+unpaginated list and search endpoints drain a bucket faster than a detail
+lookup. Allowed and refused requests both get ``RateLimit-*`` headers (see
+``RateLimitHeadersMiddleware``); refused ones get 429 with ``Retry-After``.
+
+A failing Redis lets requests through rather than failing them.
+"""
+import logging
+import math
+import threading
+import time
+from dataclasses import dataclass
+
+from django.conf import settings
+from rest_framework.throttling import BaseThrottle
+
+logger = logging.getLogger(__name__)
+
+SAFE_METHODS = frozenset({"GET", "HEAD", "OPTIONS"})
+PERIODS = {"s": 1, "m": 60, "h": 3600, "d": 86400}
+KEY_PREFIX = "throttle"
+
+# KEYS[1] bucket; ARGV now, cost in seconds of TAT, period. Returns {allowed, tat}.
+GCRA_SCRIPT = """
+local now = tonumber(ARGV[1])
+local increment = tonumber(ARGV[2])
+local period = tonumber(ARGV[3])
+local tat = tonumber(redis.call('GET', KEYS[1]) or ARGV[1])
+if tat < now then tat = now end
+local new_tat = tat + increment
+if new_tat - period > now then
+    return {0, tostring(tat)}
+end
+redis.call('SET', KEYS[1], tostring(new_tat), 'PX', math.ceil((new_tat - now) * 1000))
+return {1, tostring(new_tat)}
+"""
+
+
+def parse_rate(rate):
+    """``"600/min"`` -> (600, 60)."""
+    count, _, period = rate.partition("/")
+    return int(count), PERIODS[period.strip()[0]]
+
+
+@dataclass(frozen=True)
+class RateLimit:
+    limit: int
+    period: int
+    remaining: int
+    reset: float  # seconds until the bucket is full again
+    retry_after: float = 0.0  # 0 when allowed
+
+    def headers(self):
+        return {
+            "RateLimit-Limit": str(self.limit),
+            "RateLimit-Remaining": str(self.remaining),
+            "RateLimit-Reset": str(math.ceil(self.reset)),
+            "RateLimit-Policy": f"{self.limit};w={self.period}",
+        }
+
+
+class LocalStore:
+    """
+    Per-process buckets for deployments without Redis. The limit applies per
+    worker process, not per client across the deployment.
+    """
+
+    MAX_KEYS = 100_000
+
+    def __init__(self):
+        self._tats = {}
+        self._lock = threading.Lock()
+
+    def acquire(self, key, now, increment, period):
+        with self._lock:
+            tat = max(self._tats.get(key, now), now)
+            new_tat = tat + increment
+            if new_tat - period > now:
+                return False, tat
+            if len(self._tats) >= self.MAX_KEYS:
+                self._tats = {k: v for k, v in self._tats.items() if v > now}
+            self._tats[key] = new_tat
+            return True, new_tat
+
+
+class RedisStore:
+    def __init__(self, url):
+        import redis
+
+        self._client = redis.Redis.from_url(url)
+        self._script = self._client.register_script(GCRA_SCRIPT)
+
+    def acquire(self, key, now, increment, period):
+        allowed, tat = self._script(keys=[key], args=[repr(now), repr(increment), period])
+        return bool(allowed), float(tat)
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_store():
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                _store = RedisStore(settings.REDIS_URL) if settings.REDIS_URL else LocalStore()
+    return _store
+
+
+def reset():
+    """Forget every bucket (used by tests)."""
+    global _store
+    _store = None
+
+
+def consume(key, rate, cost=1, now=None):
+    """Take ``cost`` tokens from bucket ``key``; returns the resulting RateLimit."""
+    limit, period = parse_rate(rate)
+    interval = period / limit
+    cost = min(cost, limit)
+    now = time.time() if now is None else now
+    try:
+        allowed, tat = get_store().acquire(key, now, cost * interval, period)
+    except Exception:  # the limiter must never take the API down with it
+        logger.exception("Rate limit store unavailable; allowing request")
+        return RateLimit(limit, period, limit, 0.0)
+    remaining = max(0, math.floor((period - (tat - now)) / interval))
+    if allowed:
+        return RateLimit(limit, period, remaining, tat - now)
+    return RateLimit(limit, period, remaining, tat - now, retry_after=tat + cost * interval - period - now)
+
+
+class TokenBucketThrottle(BaseThrottle):
+    def allow_request(self, request, view):
+        if not settings.API_THROTTLE_ENABLED:
+            return True
+        scope = getattr(view, "throttle_scope", None) or ("read" if request.method in SAFE_METHODS else "write")
+        rate = settings.API_THROTTLE_RATES.get(scope)
+        if rate is None:
+            return True
+        user = getattr(request, "user", None)
+        ident = f"user:{user.pk}" if user is not None and user.is_authenticated else self.get_ident(request)
+        cost = settings.API_THROTTLE_COSTS.get(getattr(view, "throttle_cost_class", None), 1)
+        self.ratelimit = consume(f"{KEY_PREFIX}:{scope}:{ident}", rate, cost)
+        request._request.ratelimit = self.ratelimit  # picked up by RateLimitHeadersMiddleware
+        return not self.ratelimit.retry_after
+
+    def wait(self):
+        return self.ratelimit.retry_after
@@ -6,12 +6,19 @@ from carparks.views import (
     FilteredCarParksView,
     FreeParkingView,
     GroupByParkingSystemView,
+    GroupByTownView,
     AverageGantryHeightView,
     CarParkCreateView,
     SearchCarParksByAddressView,
     CarParkTypesView,
     CarParkDetailView,
     HeightRangeCarParksView,
+    CarParkQueryView,
+    CarParkChangesView,
+    AvailabilityView,
+    AvailabilityHistoryView,
+    ImportJobListView,
+    ImportJobDetailView,
 )
 
 
@@ -44,9 +51,17 @@ urlpatterns = [
     path("api/v1/carparks/filter/", FilteredCarParksView.as_view(), name="filtered-carparks"),
     path("api/v1/carparks/free-parking/", FreeParkingView.as_view(), name="free-parking"),
     path("api/v1/carparks/group-by-system/", GroupByParkingSystemView.as_view(), name="group-by-parking-system"),
+    path("api/v1/carparks/group-by-town/", GroupByTownView.as_view(), name="group-by-town"),
     path("api/v1/carparks/average-gantry-height/", AverageGantryHeightView.as_view(), name="average-gantry-height"),
     path("api/v1/carparks/create/", CarParkCreateView.as_view(), name="create-carpark-api"),
     path("api/v1/carparks/search/", SearchCarParksByAddressView.as_view(), name="search-carparks"),
+    path("api/v1/carparks/query/", CarParkQueryView.as_view(), name="query-carparks"),
+    path("api/v1/carparks/changes/", CarParkChangesView.as_view(), name="carpark-changes"),
+    path("api/v1/carparks/availability/", AvailabilityView.as_view(), name="carpark-availability"),
+    path("api/v1/carparks/<int:pk>/availability/", AvailabilityHistoryView.as_view(),
+         name="carpark-availability-history"),
+    path("api/v1/carparks/imports/", ImportJobListView.as_view(), name="import-jobs"),
+    path("api/v1/carparks/imports/<int:pk>/", ImportJobDetailView.as_view(), name="import-job-detail"),
 
     # HTML Views
     path("home/", TemplateView.as_view(template_name="carparks/home.html"), name="home"),
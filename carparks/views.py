@@ -1,55 +1,202 @@
 from rest_framework.views import APIView
 from rest_framework.response import Response
-from rest_framework import status
-from django.db.models import Avg, Count
-from .models import CarPark
-from .serializers import CarParkSerializer
+from rest_framework import generics, status
+from rest_framework.pagination import PageNumberPagination
+from rest_framework.permissions import IsAdminUser
+from rest_framework.settings import api_settings
+from django.db.models import Avg, Count, Exists, F, OuterRef
+from django_filters.rest_framework import DjangoFilterBackend
+from . import availability, changes, columnar, facets, jobs, prerender, rollups, singleflight
+from .renderers import BULK_RENDERER_CLASSES
+from .filters import CarParkFilter
+from .models import CarPark, CarParkType, ImportJob, LotType, ParkingSystem, Town
+from .serializers import CarParkSerializer, CarParkTombstoneSerializer, ImportJobSerializer
 from uuid import uuid4
+from django.conf import settings
 from django.shortcuts import get_object_or_404
+from django.urls import reverse
 from django.db import IntegrityError
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from datetime import timedelta, timezone as dt_timezone
 
 _BOOL_TO_TEXT = {True: "TRUE", False: "FALSE"}
 
+# Views returning lists of carparks also speak MessagePack and columnar JSON
+LIST_RENDERER_CLASSES = [*api_settings.DEFAULT_RENDERER_CLASSES, *BULK_RENDERER_CLASSES]
+
 
 def _to_text(val):
     """Convert Python booleans to 'TRUE'/'FALSE', pass everything else through."""
     return _BOOL_TO_TEXT.get(val, val)
 
+
+def _prerendered(request, name, build_data):
+    """Serve a pre-rendered payload when the request qualifies, else None."""
+    if prerender.can_serve(request):
+        payload = prerender.get_payload(name, build_data, request.accepted_renderer)
+        if payload is not None:
+            return payload.as_response(request)
+    return None
+
+
+# Whole-table lists and aggregates are computed once per dataset version, and
+# concurrent requests after a change share that one computation (singleflight)
+
+def _load_all_car_parks():
+    snapshot = columnar.get_snapshot()
+    if snapshot is not None:
+        return snapshot.rows
+    return CarParkSerializer(CarPark.objects.all(), many=True).data
+
+
+def _load_car_park_types():
+    snapshot = columnar.get_snapshot()
+    if snapshot is not None:
+        return snapshot.distinct("car_park_type")
+    # Straight from the lookup table, skipping types no car park uses any more
+    in_use = CarPark.objects.filter(car_park_type=OuterRef("pk"))
+    return list(CarParkType.objects.filter(Exists(in_use)).order_by("name").values_list("name", flat=True))
+
+
+def _load_parking_system_counts():
+    snapshot = columnar.get_snapshot()
+    if snapshot is not None:
+        return snapshot.group_counts("type_of_parking_system")
+    return list(
+        ParkingSystem.objects.annotate(type_of_parking_system=F("name"), total=Count("car_parks"))
+        .filter(total__gt=0)
+        .order_by("name")
+        .values("type_of_parking_system", "total")
+    )
+
+
+def _load_town_counts():
+    snapshot = columnar.get_snapshot()
+    if snapshot is not None:
+        return snapshot.group_counts("town")
+    return list(
+        Town.objects.annotate(town=F("name"), total=Count("car_parks"))
+        .filter(total__gt=0)
+        .order_by("name")
+        .values("town", "total")
+    )
+
+
+def _load_average_gantry_height():
+    snapshot = columnar.get_snapshot()
+    if snapshot is not None:
+        return {"average_height": snapshot.mean("gantry_height")}
+    return CarPark.objects.aggregate(average_height=Avg('gantry_height'))
+
+
+def _all_car_parks():
+    return singleflight.get("carpark-list", _load_all_car_parks)
+
+
+def _car_park_types():
+    return singleflight.get("carpark-types", _load_car_park_types)
+
+
+def _requested_facets(request):
+    """Facet names asked for with ``?facets=``; raises ValueError for unknown ones."""
+    return facets.requested(request.query_params.get("facets"))
+
+
+def _facet_counts(params, names, request=None):
+    filterset = CarParkFilter(params, queryset=CarPark.objects.all(), request=request)
+    filterset.is_valid()  # already validated by the caller's filtering
+    return facets.counts(filterset, names)
+
+
+class IncludeAvailabilityMixin:
+    """``?include=availability`` adds the latest lot availability to every row."""
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        include = request.query_params.get("include", "").split(",")
+        if "availability" in include and isinstance(response, Response) and response.status_code == 200:
+            data = response.data
+            if isinstance(data, dict) and isinstance(data.get("results"), list):
+                response.data = {**data, "results": availability.embed(data["results"])}
+            elif isinstance(data, list):
+                response.data = availability.embed(data)
+        return super().finalize_response(request, response, *args, **kwargs)
+
 # Feature 1: View All Car Parks
-class CarParkListView(APIView):
+class CarParkListView(IncludeAvailabilityMixin, APIView):
+    renderer_classes = LIST_RENDERER_CLASSES
+    throttle_cost_class = "unpaginated"
+
     def get(self, request):
-        car_parks = CarPark.objects.all()
-        serializer = CarParkSerializer(car_parks, many=True)
-        return Response(serializer.data, status=status.HTTP_200_OK)
+        town = request.query_params.get("town")
+        if town:
+            snapshot = columnar.get_snapshot()
+            if snapshot is not None:
+                return Response(snapshot.rows_where(snapshot.category_mask("town", [town])), status=status.HTTP_200_OK)
+            # Town ids first, so the car parks are found through the town_id index
+            car_parks = CarPark.objects.filter(town__in=Town.objects.filter(name__iexact=town))
+            return Response(CarParkSerializer(car_parks, many=True).data, status=status.HTTP_200_OK)
+        response = _prerendered(request, "carpark-list", _all_car_parks)
+        if response is not None:
+            return response
+        return Response(_all_car_parks(), status=status.HTTP_200_OK)
 
 # Feature 2: Filter by Car Park Type
-class FilteredCarParksView(APIView):
+class FilteredCarParksView(IncludeAvailabilityMixin, APIView):
+    renderer_classes = LIST_RENDERER_CLASSES
+    throttle_cost_class = "unpaginated"
+
     def get(self, request):
         car_park_type = request.query_params.get('type', None)
+        try:
+            wanted = _requested_facets(request)
+        except ValueError as exc:
+            return Response({"error": str(exc)}, status=status.HTTP_400_BAD_REQUEST)
         if car_park_type:
-            car_parks = CarPark.objects.filter(car_park_type__iexact=car_park_type)
-            serializer = CarParkSerializer(car_parks, many=True)
-            return Response(serializer.data, status=status.HTTP_200_OK)
+            snapshot = columnar.get_snapshot()
+            if snapshot is not None:
+                rows = snapshot.rows_where(snapshot.category_mask("car_park_type", [car_park_type]))
+            else:
+                car_parks = CarPark.objects.filter(car_park_type__name__iexact=car_park_type)
+                rows = CarParkSerializer(car_parks, many=True).data
+            if wanted:
+                # Results and their facet counts in one round trip (see carparks.facets)
+                return Response({
+                    "count": len(rows),
+                    "results": rows,
+                    "facets": _facet_counts({"type": car_park_type}, wanted, request),
+                }, status=status.HTTP_200_OK)
+            return Response(rows, status=status.HTTP_200_OK)
         return Response({"error": "Car park type not specified"}, status=status.HTTP_400_BAD_REQUEST)
 
 # Feature 3: Filter Free Parking
-class FreeParkingView(APIView):
+class FreeParkingView(IncludeAvailabilityMixin, APIView):
+    renderer_classes = LIST_RENDERER_CLASSES
+    throttle_cost_class = "unpaginated"
+
     def get(self, request):
         # Treat explicit 'NO' or 'FALSE' as not free; everything else is free
-        car_parks = CarPark.objects.exclude(free_parking__iexact="NO").exclude(free_parking__iexact="FALSE")
+        snapshot = columnar.get_snapshot()
+        if snapshot is not None:
+            return Response(snapshot.rows_where(snapshot.free_parking_mask()), status=status.HTTP_200_OK)
+        car_parks = CarPark.objects.exclude(free_parking__name__iexact="NO").exclude(free_parking__name__iexact="FALSE")
         serializer = CarParkSerializer(car_parks, many=True)
         return Response(serializer.data, status=status.HTTP_200_OK)
 
 # Feature 4: Group by Parking System
 class GroupByParkingSystemView(APIView):
     def get(self, request):
-        grouped_data = CarPark.objects.values('type_of_parking_system').annotate(total=Count('id'))
+        grouped_data = singleflight.get("parking-system-counts", _load_parking_system_counts)
         return Response(grouped_data, status=status.HTTP_200_OK)
 
+class GroupByTownView(APIView):
+    def get(self, request):
+        return Response(singleflight.get("town-counts", _load_town_counts), status=status.HTTP_200_OK)
+
 # Feature 5: Average Gantry Height
 class AverageGantryHeightView(APIView):
     def get(self, request):
-        average_height = CarPark.objects.aggregate(average_height=Avg('gantry_height'))
+        average_height = singleflight.get("average-gantry-height", _load_average_gantry_height)
         return Response(average_height, status=status.HTTP_200_OK)
 
 # Feature 6: Add New Car Park
@@ -61,7 +208,7 @@ class CarParkCreateView(APIView):
         payload.setdefault("y_coord", 0)
         payload.setdefault("type_of_parking_system", "ELECTRONIC PARKING")
 
-        # Normalize booleans for CharFields
+        # Normalize booleans to the category names they were stored as
         payload["short_term_parking"] = _to_text(payload.get("short_term_parking", "NO"))
         payload["free_parking"] = _to_text(payload.get("free_parking", "NO"))
         payload.setdefault("night_parking", False)
@@ -80,7 +227,10 @@ class CarParkCreateView(APIView):
         return Response(serializer.data, status=status.HTTP_201_CREATED)
 
 # New: filter by gantry height range
-class HeightRangeCarParksView(APIView):
+class HeightRangeCarParksView(IncludeAvailabilityMixin, APIView):
+    renderer_classes = LIST_RENDERER_CLASSES
+    throttle_cost_class = "unpaginated"
+
     def get(self, request):
         min_h = request.query_params.get("min_height")
         max_h = request.query_params.get("max_height")
@@ -91,14 +241,24 @@ class HeightRangeCarParksView(APIView):
             max_v = float(max_h)
         except ValueError:
             return Response({"error": "Invalid height values"}, status=status.HTTP_400_BAD_REQUEST)
+        snapshot = columnar.get_snapshot()
+        if snapshot is not None:
+            rows = snapshot.rows_where(snapshot.range_mask("gantry_height", min_v, max_v))
+            return Response(rows, status=status.HTTP_200_OK)
         car_parks = CarPark.objects.filter(gantry_height__gte=min_v, gantry_height__lte=max_v)
         return Response(CarParkSerializer(car_parks, many=True).data, status=status.HTTP_200_OK)
 
 # Feature 7: Search Car Parks by Address
-class SearchCarParksByAddressView(APIView):
+class SearchCarParksByAddressView(IncludeAvailabilityMixin, APIView):
+    renderer_classes = LIST_RENDERER_CLASSES
+    throttle_cost_class = "unpaginated"
+
     def get(self, request):
         address_query = request.query_params.get('address', None)
         if address_query:
+            snapshot = columnar.get_snapshot()
+            if snapshot is not None:
+                return Response(snapshot.rows_where(snapshot.address_mask(address_query)), status=status.HTTP_200_OK)
             car_parks = CarPark.objects.filter(address__icontains=address_query)
             serializer = CarParkSerializer(car_parks, many=True)
             return Response(serializer.data, status=status.HTTP_200_OK)
@@ -108,10 +268,10 @@ class SearchCarParksByAddressView(APIView):
 # New: distinct car park types API for populating dropdowns
 class CarParkTypesView(APIView):
     def get(self, request):
-        types = list(
-            CarPark.objects.values_list("car_park_type", flat=True).distinct().order_by("car_park_type")
-        )
-        return Response(types, status=status.HTTP_200_OK)
+        response = _prerendered(request, "carpark-types", _car_park_types)
+        if response is not None:
+            return response
+        return Response(_car_park_types(), status=status.HTTP_200_OK)
 
 # New: retrieve/update/delete a single car park
 class CarParkDetailView(APIView):
@@ -134,3 +294,161 @@ class CarParkDetailView(APIView):
             serializer.save()
             return Response(serializer.data, status=status.HTTP_200_OK)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+
+class CarParkPagination(PageNumberPagination):
+    page_size = 50
+    page_size_query_param = "page_size"
+    max_page_size = 1000
+
+
+# New: one endpoint combining every filter predicate, paginated and ordered
+class CarParkQueryView(IncludeAvailabilityMixin, generics.ListAPIView):
+    queryset = CarPark.objects.all()
+    serializer_class = CarParkSerializer
+    filter_backends = [DjangoFilterBackend]
+    filterset_class = CarParkFilter
+    pagination_class = CarParkPagination
+    renderer_classes = LIST_RENDERER_CLASSES
+
+    def list(self, request, *args, **kwargs):
+        try:
+            wanted = _requested_facets(request)
+        except ValueError as exc:
+            return Response({"error": str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+        response = super().list(request, *args, **kwargs)
+        if wanted:
+            response.data["facets"] = _facet_counts(request.query_params, wanted, request)
+        return response
+
+
+# New: incremental sync of created/updated/deleted car parks since a change token
+class CarParkChangesView(APIView):
+    def get(self, request):
+        try:
+            limit = int(request.query_params.get("limit", changes.DEFAULT_LIMIT))
+        except ValueError:
+            return Response({"error": "Invalid limit"}, status=status.HTTP_400_BAD_REQUEST)
+        limit = max(1, min(limit, changes.MAX_LIMIT))
+        since = request.query_params.get("since") or None
+        try:
+            page = changes.changes_since(since, limit)
+        except changes.InvalidToken as exc:
+            return Response({"error": str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+        return Response({
+            "since": since,
+            "next": page.next_token,
+            "has_more": page.has_more,
+            "upserts": CarParkSerializer(page.upserts, many=True).data,
+            "deletes": CarParkTombstoneSerializer(page.deletes, many=True).data,
+        }, status=status.HTTP_200_OK)
+
+
+# New: latest lot availability, and bulk ingestion of a whole availability snapshot
+class AvailabilityView(APIView):
+    throttle_cost_class = "unpaginated"
+
+    def get(self, request):
+        latest = availability.latest_by_carpark()
+        data = [{"id": carpark_id, "availability": lots} for carpark_id, lots in latest.items()]
+        return Response(data, status=status.HTTP_200_OK)
+
+    def post(self, request):
+        try:
+            readings, rejected = availability.parse_snapshot(request.data)
+        except ValueError as exc:
+            return Response({"error": str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+        result = availability.ingest(readings, rejected)
+        return Response({
+            "received": result.received,
+            "stored": result.stored,
+            "latest_updated": result.latest_updated,
+            "unknown_car_parks": result.unknown_car_parks,
+            "rejected": [{"index": index, "error": message} for index, message in result.rejected],
+        }, status=status.HTTP_200_OK)
+
+
+def _parse_time_param(params, name, default):
+    value = params.get(name)
+    if not value:
+        return default
+    parsed = parse_datetime(value)
+    if parsed is None:
+        raise ValueError(f"Invalid {name}")
+    return parsed if timezone.is_aware(parsed) else timezone.make_aware(parsed, dt_timezone.utc)
+
+
+# New: availability history of one car park at the coarsest resolution the range needs
+class AvailabilityHistoryView(APIView):
+    def get(self, request, pk):
+        params = request.query_params
+        now = timezone.now()
+        try:
+            end = _parse_time_param(params, "end", now)
+            start = _parse_time_param(params, "start", end - timedelta(days=1))
+        except ValueError as exc:
+            return Response({"error": str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            max_points = int(params.get("max_points", rollups.DEFAULT_MAX_POINTS))
+        except ValueError:
+            return Response({"error": "Invalid max_points"}, status=status.HTTP_400_BAD_REQUEST)
+        if start >= end:
+            return Response({"error": "start must be before end"}, status=status.HTTP_400_BAD_REQUEST)
+        lot_type = params.get("lot_type", LotType.CAR)
+        if lot_type not in LotType.values:
+            return Response({"error": "Invalid lot_type"}, status=status.HTTP_400_BAD_REQUEST)
+        resolution = params.get("resolution")
+        if resolution is None:
+            max_points = max(1, min(max_points, rollups.MAX_POINTS))
+            resolution = rollups.choose_resolution(start, end, max_points, now)
+        elif resolution not in rollups.RESOLUTIONS:
+            return Response({"error": "Invalid resolution"}, status=status.HTTP_400_BAD_REQUEST)
+        elif rollups.point_count(start, end, resolution) > rollups.MAX_POINTS:
+            return Response(
+                {"error": f"Range exceeds {rollups.MAX_POINTS} points at resolution {resolution}; "
+                          f"shorten it or choose a coarser resolution"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        get_object_or_404(CarPark.objects.select_related(None).only("pk"), pk=pk)
+        return Response({
+            "id": pk,
+            "lot_type": lot_type,
+            "resolution": resolution,
+            "start": start,
+            "end": end,
+            "points": rollups.history(pk, lot_type, start, end, resolution),
+        }, status=status.HTTP_200_OK)
+
+
+# New: CSV uploads are stored and queued; `manage.py process_imports` loads them.
+# Staff only: an upload writes to disk and the main table, and jobs list rejected rows.
+class ImportJobListView(APIView):
+    permission_classes = [IsAdminUser]
+
+    def get(self, request):
+        recent = ImportJob.objects.order_by("-created_at", "-pk")[:settings.IMPORT_JOB_LIST_LIMIT]
+        return Response(ImportJobSerializer(recent, many=True).data, status=status.HTTP_200_OK)
+
+    def post(self, request):
+        upload = request.FILES.get("file")
+        if upload is None:
+            return Response({"error": "Upload a CSV file in the 'file' field"}, status=status.HTTP_400_BAD_REQUEST)
+        if upload.size > settings.IMPORT_UPLOAD_MAX_BYTES:
+            return Response(
+                {"error": f"File exceeds {settings.IMPORT_UPLOAD_MAX_BYTES} bytes"},
+                status=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            )
+        job = jobs.enqueue(upload)
+        return Response(
+            ImportJobSerializer(job).data,
+            status=status.HTTP_202_ACCEPTED,
+            headers={"Location": reverse("import-job-detail", args=[job.pk])},
+        )
+
+
+class ImportJobDetailView(APIView):
+    permission_classes = [IsAdminUser]
+
+    def get(self, request, pk):
+        job = get_object_or_404(ImportJob, pk=pk)
+        return Response(ImportJobSerializer(job).data, status=status.HTTP_200_OK)
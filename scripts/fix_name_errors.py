@@ -12,7 +12,11 @@ sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 os.environ.setdefault("DJANGO_SETTINGS_MODULE", "AdvancedWebDevelopment.settings")
 django.setup()
 
-from carparks.models import CarPark
+from django.utils import timezone  # noqa: E402
+
+from carparks import dataset  # noqa: E402
+from carparks.categories import CategoryKeys  # noqa: E402
+from carparks.models import CarPark  # noqa: E402
 
 def fix_name_errors():
     """Fix or remove records with #NAME? addresses"""
@@ -35,18 +39,26 @@ def fix_name_errors():
     }
     
     print("\nFixing records...")
-    fixed_count = 0
+    fixed = []
+    now = timezone.now()
+    keys = CategoryKeys()
     
     for record in bad_records:
         if record.car_park_no in known_mappings:
             new_address = known_mappings[record.car_park_no]
             print(f"  Updating {record.car_park_no}: #NAME? → {new_address}")
             record.address = new_address
-            record.save()
-            fixed_count += 1
+            record.parse_address(keys)  # bulk_update bypasses save(), which re-parses it
+            record.updated_at = now  # bulk_update bypasses auto_now
+            fixed.append(record)
         else:
             print(f"  No mapping found for {record.car_park_no}")
     
+    # One batched UPDATE instead of a save() per record
+    CarPark.objects.bulk_update(fixed, ["address", "block", "street", "town", "updated_at"], batch_size=500)
+    if fixed:
+        dataset.mark_changed()  # bulk_update sends no post_save
+    fixed_count = len(fixed)
     print(f"\nFixed {fixed_count} records.")
     
     # Option 2: Remove unfixable records (optional)
@@ -1,7 +1,6 @@
 import os
 import sys
 import django
-import pandas as pd
 
 # Add the project directory to the Python path
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -10,7 +9,7 @@ sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 os.environ.setdefault("DJANGO_SETTINGS_MODULE", "AdvancedWebDevelopment.settings")
 django.setup()
 
-from carparks.models import CarPark  # Import the CarPark model
+from carparks.importer import import_csv  # Batched importer shared with the app
 
 def load_data_from_csv(file_path):
     """
@@ -21,71 +20,23 @@ def load_data_from_csv(file_path):
         print(f"Error: File not found at {file_path}")
         return
 
-    # Load the CSV file
+    # Rows are streamed and inserted in batches (one duplicate lookup and one
+    # bulk insert per batch) instead of two queries per row
     try:
-        data = pd.read_csv(file_path)
+        result = import_csv(file_path)
+    except ValueError as e:
+        print(f"Error: {e}")
+        return
     except Exception as e:
         print(f"Error loading CSV file: {e}")
         return
 
-    # Required columns
-    # Align with CSV headers
-    required_columns = [
-        "car_park_no",
-        "address",
-        "x_coord",
-        "y_coord",
-        "car_park_type",
-        "type_of_parking_system",
-        "short_term_parking",
-        "free_parking",
-        "night_parking",
-        "car_park_decks",
-        "gantry_height",
-        "car_park_basement",
-    ]
-
-    # Check for missing columns
-    missing_columns = [col for col in required_columns if col not in data.columns]
-    if missing_columns:
-        print(f"Error: Missing required columns in CSV: {', '.join(missing_columns)}")
-        return
-
-    duplicates_count = 0
-    inserted_count = 0
-
-    for _, row in data.iterrows():
-        # Check if the record already exists
-        if CarPark.objects.filter(
-            car_park_no=row["car_park_no"],
-            address=row["address"],
-            car_park_type=row["car_park_type"],
-            gantry_height=float(row["gantry_height"]),
-            type_of_parking_system=row["type_of_parking_system"],
-        ).exists():
-            duplicates_count += 1
-            continue
-
-        # Insert new record
-        CarPark.objects.create(
-            car_park_no=row["car_park_no"],
-            address=row["address"],
-            x_coord=float(row["x_coord"]),
-            y_coord=float(row["y_coord"]),
-            car_park_type=row["car_park_type"],
-            type_of_parking_system=row["type_of_parking_system"],
-            short_term_parking=row["short_term_parking"],
-            free_parking=row["free_parking"],
-            night_parking=True if str(row["night_parking"]).strip().upper() in ["Y", "YES", "TRUE", "T", "1"] else False,
-            car_park_decks=int(row["car_park_decks"]),
-            gantry_height=float(row["gantry_height"]),
-            car_park_basement=True if str(row["car_park_basement"]).strip().upper() in ["Y", "YES", "TRUE", "T", "1"] else False,
-        )
-        inserted_count += 1
-
+    for line, message in result.errors:
+        print(f"Skipped line {line}: {message}")
     print(
-        f"Data loading completed. {inserted_count} records inserted, {duplicates_count} duplicates skipped."
+        f"Data loading completed. {result.inserted} records inserted, {result.duplicates} duplicates skipped."
     )
+    return result
 
 
 if __name__ == "__main__":
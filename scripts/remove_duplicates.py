@@ -11,29 +11,39 @@ django.setup()
 
 from carparks.models import CarPark  # Assuming a new model for CarPark
 
-def remove_duplicates():
+BATCH_SIZE = 2000
+# Columns that identify a car park (CarPark.Meta.unique_together)
+KEY_COLUMNS = ("car_park_no", "address", "car_park_type", "gantry_height", "type_of_parking_system")
+
+def remove_duplicates(batch_size=BATCH_SIZE):
     """
     Identify and remove duplicate entries in the CarPark table.
+
+    Only the key columns are read (in primary-key order, chunked) and
+    duplicates are deleted in batches, tombstones included (see
+    ``CarParkQuerySet.delete``), so the query count grows with the number of
+    batches rather than the number of rows.
     """
     seen = set()
     duplicates = []
 
-    for park in CarPark.objects.all():
-        unique_identifier = (
-            park.car_park_no,
-            park.address,
-            park.car_park_type,
-            park.gantry_height,
-            park.type_of_parking_system,
-        )
+    rows = (
+        CarPark.objects.order_by("id")
+        .values_list("id", *KEY_COLUMNS)
+        .iterator(chunk_size=batch_size)
+    )
+    for park_id, *unique_identifier in rows:
+        unique_identifier = tuple(unique_identifier)
         if unique_identifier in seen:
-            duplicates.append(park.id)
+            duplicates.append(park_id)
         else:
             seen.add(unique_identifier)
 
     # Delete duplicates
-    CarPark.objects.filter(id__in=duplicates).delete()
+    for start in range(0, len(duplicates), batch_size):
+        CarPark.objects.filter(id__in=duplicates[start:start + batch_size]).delete()
     print(f"Removed {len(duplicates)} duplicate entries.")
+    return len(duplicates)
 
 
 if __name__ == "__main__":